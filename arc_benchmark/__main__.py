@@ -3,18 +3,30 @@ import os
 from elasticsearch import Elasticsearch
 from elasticsearch.helpers import bulk
 from arc_benchmark.file_utils import load_json, store_json
+from arc_benchmark.sharding import get_shard, get_shard_directory, merge_shard_results
 from arc_benchmark.config_loader import load_config, override_config
 from arc_benchmark.benchmark_set_creator import create_test_sets
 from arc_benchmark.article_archiver import load_and_store_articles, load_and_store_tqa_articles
+from arc_benchmark.question_index import get_question_index_directory
+from arc_benchmark.tqa_dataset import TqaDataset
 from arc_benchmark.arc_runner import evaluate_articles, evaluate_arc_index
 from arc_benchmark.results_analysis import analyze_results, analyze_questions
 from arc_benchmark.constants import ARC_BENCHMARK_DIRECTORY, ARC_RESULTS_FILE, ARC_SOLVER_DIRECTORY, \
-    ARTICLE_DIRECTORY, BENCHMARK_CONFIG_YAML, BENCHMARK_SET_DIRECTORY, CHECKPOINT_DIRECTORY, CONFIG_FILE, \
-    ENV_DIRECTORY, FINAL_RESULTS_FILE, HOST, HTMLCOV_DIRECTORY, PORT, QUESTION_DIRECTORY, TESTS_DIRECTORY
+    ARTICLE_DIRECTORY, BENCHMARK_CONFIG_YAML, BENCHMARK_SET_DIRECTORY, CHECKPOINT_DIRECTORY, COMMAND, CONFIG_FILE, \
+    ENV_DIRECTORY, FINAL_RESULTS_FILE, HOST, HTMLCOV_DIRECTORY, MERGE, PORT, QUESTION_ANSWER_COUNTS_FILE, \
+    QUESTION_DIRECTORY, ROUGE, RUN, SHARD, TESTS_DIRECTORY, WORKER_COUNT
 
 parser = argparse.ArgumentParser(
     description='Benchmarks generated articles against question sets using the ARC QA system'
 )
+parser.add_argument(
+    COMMAND,
+    nargs='?',
+    default=RUN,
+    choices=[RUN, MERGE, ROUGE],
+    help=f'{RUN} the benchmark, the default, {MERGE} the results of every shard of a sharded run and analyze them, '
+         f'or score the articles against the TQA chapters with {ROUGE}'
+)
 parser.add_argument(
     '-c',
     f'--{CONFIG_FILE}',
@@ -36,9 +48,22 @@ parser.add_argument(
     default=None,
     help='a filepath to the top-level directory of the ARC Solver system'
 )
+parser.add_argument(
+    f'--{WORKER_COUNT}',
+    default=None,
+    type=int,
+    help='the number of ARC Solver runs to execute concurrently, each in its own copy of the ARC data directory'
+)
+parser.add_argument(
+    f'--{SHARD}',
+    default=None,
+    help='i/N, only run the question sets of shard i (counting from 0) of N, for spreading a benchmark across '
+         'machines. Each shard keeps its own checkpoints, merge them once every shard has finished'
+)
 
 
-def run_arc_benchmark(config_file, article_directory, question_directory, arc_solver_directory):
+def run_arc_benchmark(config_file, article_directory, question_directory, arc_solver_directory, worker_count=None,
+                      shard=None):
     """ Runs the ARC-Solver QA system to perform a benchmark on a set of articles with a set of questions.
 
         Args:
@@ -48,8 +73,12 @@ def run_arc_benchmark(config_file, article_directory, question_directory, arc_so
             question_directory (str): the filepath to a singular, or directory of, JSON question files to evaluate
                 the articles with
             arc_solver_directory (str): the filepath to the directory ARC-Solvers will look to, to run predictions on
+            worker_count (int): optional, the number of ARC-Solver runs to execute concurrently
+            shard (str): optional, i/N to only run the question sets of shard i of N
     """
     config = load_config(config_file)
+    config[WORKER_COUNT] = override_config(WORKER_COUNT, worker_count, config)
+    config[SHARD] = override_config(SHARD, shard, config)
 
     article_filepath = override_config(ARTICLE_DIRECTORY, article_directory, config)
     question_filepath = override_config(QUESTION_DIRECTORY, question_directory, config)
@@ -68,13 +97,28 @@ def run_arc_benchmark(config_file, article_directory, question_directory, arc_so
         print(f'ERROR: {BENCHMARK_SET_DIRECTORY} either is not a string or is not defined via the config file. '
            f'Do not set {BENCHMARK_SET_DIRECTORY} to any critical or already used directories.')
     else:
+        try:
+            shard = get_shard(config)
+        except ValueError as error:
+            print(f'ERROR: {error}')
+            return
+        if shard is not None:
+            config[CHECKPOINT_DIRECTORY] = get_shard_directory(config[CHECKPOINT_DIRECTORY], shard)
+            os.makedirs(config[CHECKPOINT_DIRECTORY], exist_ok=True)
         benchmark_results = load_json(config[ARC_RESULTS_FILE], config)
 
         es = Elasticsearch(hosts=[{HOST: config[HOST], PORT: config[PORT]}], retries=3, timeout=60)
         print('Connection to Elasticsearch cluster established')
         print('Storing Articles In Elasticsearch...')
         question_set_indices, index_files = load_and_store_articles(article_filepath, es, bulk, config)
-        question_set_indices, tqa_index = load_and_store_tqa_articles(question_set_indices, es, bulk, config)
+        tqa_dataset = TqaDataset(question_filepath, question_set_indices.keys(), get_question_index_directory(config))
+        question_set_indices, tqa_index = load_and_store_tqa_articles(
+            question_set_indices,
+            es,
+            bulk,
+            config,
+            tqa_dataset
+        )
         print('Results Successfully stored')
 
         index_files = {
@@ -84,7 +128,8 @@ def run_arc_benchmark(config_file, article_directory, question_directory, arc_so
         benchmark_set_filepaths, question_answer_counts = create_test_sets(
             question_filepath,
             question_set_indices.keys(),
-            config
+            config,
+            tqa_dataset
         )
         if not benchmark_results:
             print('Evaluating Articles...')
@@ -105,6 +150,11 @@ def run_arc_benchmark(config_file, article_directory, question_directory, arc_so
             print('Articles Evaluated')
             store_json(benchmark_results, config[ARC_RESULTS_FILE], config)
 
+        if shard is not None:
+            store_json(question_answer_counts, QUESTION_ANSWER_COUNTS_FILE, config)
+            print(f'Shard {config[SHARD]} complete, analyze the results with the {MERGE} command once every shard is')
+            return
+
         if not os.path.isfile(f'{config[CHECKPOINT_DIRECTORY]}/{config[FINAL_RESULTS_FILE]}'):
             analyze_results(benchmark_results, question_answer_counts, config)
             print('analysis complete')
@@ -113,6 +163,58 @@ def run_arc_benchmark(config_file, article_directory, question_directory, arc_so
         analyze_questions(benchmark_results, config)
 
 
+def merge_arc_benchmark(config_file):
+    """ Combines the results of every shard of a sharded benchmark and analyzes them like an unsharded run
+
+        Args:
+            config_file (str): the filepath to a yaml configuration file, defaults to benchmarkConfig.yaml
+    """
+    config = load_config(config_file)
+    try:
+        benchmark_results, question_answer_counts = merge_shard_results(config)
+    except ValueError as error:
+        print(f'ERROR: {error}')
+        return
+    store_json(benchmark_results, config[ARC_RESULTS_FILE], config)
+    print(f'Shard results merged into {config[CHECKPOINT_DIRECTORY]}/{config[ARC_RESULTS_FILE]}')
+    analyze_results(benchmark_results, question_answer_counts, config)
+    print('analysis complete')
+    print(question_answer_counts)
+    analyze_questions(benchmark_results, config)
+
+
+def rouge_arc_benchmark(config_file, article_directory, question_directory):
+    """ Calculates the ROUGE statistics of every algorithm run's articles versus the TQA chapters they were written for
+
+        Args:
+            config_file (str): the filepath to a yaml configuration file, defaults to benchmarkConfig.yaml
+            article_directory (str): the filepath to a singular, or directory of, JSONL article files, one file per
+                algorithm run
+            question_directory (str): the filepath to the TQA json file the reference chapters are taken from
+    """
+    # imported here so run and merge do not pay for loading nltk and scipy
+    from arc_benchmark.calculate_rouge import calculate_rouge
+    config = load_config(config_file)
+    article_filepath = override_config(ARTICLE_DIRECTORY, article_directory, config)
+    question_filepath = override_config(QUESTION_DIRECTORY, question_directory, config)
+    try:
+        calculate_rouge(article_filepath, question_filepath, config)
+    except LookupError as error:
+        print(f'ERROR: {error}')
+
+
 args = parser.parse_args()
 
-run_arc_benchmark(args.config_file, args.article_directory, args.question_directory, args.arc_solver_directory)
+if args.command == MERGE:
+    merge_arc_benchmark(args.config_file)
+elif args.command == ROUGE:
+    rouge_arc_benchmark(args.config_file, args.article_directory, args.question_directory)
+else:
+    run_arc_benchmark(
+        args.config_file,
+        args.article_directory,
+        args.question_directory,
+        args.arc_solver_directory,
+        args.worker_count,
+        args.shard
+    )
@@ -1,94 +1,524 @@
 import json
 import os
 import shutil
-import subprocess
-import time
-from arc_benchmark.file_utils import create_or_load_arc_checkpoint
-from arc_benchmark.constants import ADDENDUM_RESULTS, ARC_CHALLENGE_TEST, ARC_CORPUS_INDEX, \
-    ARC_DATA_FULL_WIPE_KEEP_FILES, ARC_DATA_SMALL_WIPE_KEEP_FILES, ARC_DATA_SUBDIRECTORY, ARC_MODEL_SUBDIRECTORY, \
-    CONDA_ENVIRONMENT_NAME, CORRECT, EVALUATE_SOLVER_FILEPATH, INCORRECT, INDEX, INDIVIDUAL_RESULTS, METRICS, \
-    QUESTION_SET, RESULTS, UNANSWERED
+from arc_benchmark.checkpoint_store import open_checkpoint_store
+from arc_benchmark.retry_policy import JobFailedError, record_dead_letter, report_dead_letters, run_with_retries
+from arc_benchmark.solver_client import JobTimeoutError, SolverRunError, SolverServerError, get_cache_options, \
+    get_retrieval_batch_size, get_retrieval_concurrency, get_retrieval_options, run_solver_command, \
+    start_solver_clients, stop_solver_clients, use_entailment_cache, use_retrieval_cache, use_retrieval_options
+from arc_benchmark.worker_pool import create_worker_directories, get_worker_count, remove_worker_directories, \
+    run_in_worker_pool
+from arc_benchmark.constants import ARC_CHALLENGE_TEST, ARC_CORPUS_INDEX, ARC_DATA_FULL_WIPE_KEEP_FILES, \
+    ARC_DATA_SMALL_WIPE_KEEP_FILES, ARC_DATA_SUBDIRECTORY, ARC_MODEL_SUBDIRECTORY, BATCH_INDEX_MARKER, BATCH_INDICES, \
+    CHECKPOINT_DIRECTORY, CONDA_ENVIRONMENT_NAME, CORRECT, ENTAILMENT_CACHE_FILE, EVALUATE_SOLVER_FILEPATH, \
+    EXAM_SOLVER_FILEPATH, INCORRECT, INDEX, INDIVIDUAL_RESULTS, QUESTION_SET, RESULT_MARKER, RESULTS, \
+    RETRIEVAL_CACHE_FILE, SOLVER_SERVER_LOG_FILE, UNANSWERED
 
 
-def clean_checkpoints(arc_solver_directory, config, full_reset=False):
+def clean_checkpoints(arc_solver_directory, config, full_reset=False, data_subdirectory=None):
     """ Cleans out files from the data directory, including the test set if it is a full reset
 
         Args:
             arc_solver_directory (str): the directory to the ARC-Solver project
             config (dict): config file specified properties to use in running the benchmark
             full_reset (bool): optional, whether or not the test set should be cleaned out with the other surplus files
+            data_subdirectory (str): optional, the data subdirectory to clean, defaults to the configured
+                arc_data_subdirectory, workers pass their private copy
     """
-    for filename in sorted(os.listdir(f'{arc_solver_directory}/{config[ARC_DATA_SUBDIRECTORY]}')):
+    data_subdirectory = data_subdirectory or config[ARC_DATA_SUBDIRECTORY]
+    for filename in sorted(os.listdir(f'{arc_solver_directory}/{data_subdirectory}')):
         if full_reset and filename not in ARC_DATA_FULL_WIPE_KEEP_FILES:
-            os.remove(f'{arc_solver_directory}/{config[ARC_DATA_SUBDIRECTORY]}/{filename}')
+            os.remove(f'{arc_solver_directory}/{data_subdirectory}/{filename}')
         elif filename not in ARC_DATA_SMALL_WIPE_KEEP_FILES:
-            os.remove(f'{arc_solver_directory}/{config[ARC_DATA_SUBDIRECTORY]}/{filename}')
+            os.remove(f'{arc_solver_directory}/{data_subdirectory}/{filename}')
 
     if full_reset:
         print('Full clean complete')
 
 
-def copy_test_set(arc_solver_directory, question_set_filepath, config):
+def copy_test_set(arc_solver_directory, question_set_filepath, config, data_subdirectory=None):
     """ Copies a test set from the benchmark project to the ARC-Solver project
 
         Args:
             arc_solver_directory (str): the directory to the ARC-Solver project
             question_set_filepath (str): the directory to the test sets in the benchmark project
             config (dict): config file specified properties to use in running the benchmark
+            data_subdirectory (str): optional, the data subdirectory to copy the test set into, defaults to the
+                configured arc_data_subdirectory
     """
+    data_subdirectory = data_subdirectory or config[ARC_DATA_SUBDIRECTORY]
     shutil.copyfile(
         question_set_filepath,
-        f'{arc_solver_directory}/{config[ARC_DATA_SUBDIRECTORY]}/{ARC_CHALLENGE_TEST}'
+        f'{arc_solver_directory}/{data_subdirectory}/{ARC_CHALLENGE_TEST}'
     )
 
 
-def run_arc_on_index(index, config):
+def parse_solver_output(output):
+    """ Extracts the results from the result document the scoring step of the ARC-Solver prints on a single line
+
+        Args:
+            output (list): the lines printed by the ARC-Solver run
+
+        Returns:
+            dict: a python object containing the number of correct, incorrect, and unanswered questions, empty if the
+                run did not print any results
+            dict: a python object containing the individual result by question id
+    """
+    for line in output:
+        if line.startswith(RESULT_MARKER):
+            result = json.loads(line[len(RESULT_MARKER):])
+            return {
+                CORRECT: result[CORRECT],
+                INCORRECT: result[INCORRECT],
+                UNANSWERED: result[UNANSWERED]
+            }, result[INDIVIDUAL_RESULTS]
+    return {}, {}
+
+
+def run_arc_on_index(index, config, data_subdirectory=None, solver_client=None):
     """ Runs the ARC-Solver on a questions set with a particular index
 
         Args:
             index (str): the Elasticsearch index that has an article designed for the question set
             config (dict): config file specified properties to use in running the benchmark
+            data_subdirectory (str): optional, the data subdirectory holding the test set to run on, defaults to the
+                configured arc_data_subdirectory
+            solver_client (SolverClient): optional, a running solver server to send the job to instead of starting
+                a new ARC-Solver process for the index
 
         Returns:
             dict: a python object containing the number of correct, incorrect, and unanswered questions the ARC-Solver
                 run produced for a given set of questions and article
             dict: a python object containing the individual result by question id
+
+        Raises:
+            SolverRunError: if the run did not print any results, along with its return code and error output
     """
-    run_results = subprocess.run(
-        [
+    data_subdirectory = data_subdirectory or config[ARC_DATA_SUBDIRECTORY]
+    if solver_client is not None:
+        output = solver_client.run(f'{data_subdirectory}/{ARC_CHALLENGE_TEST}', index)
+        results, individual_results = parse_solver_output(output)
+        if CORRECT not in results.keys():
+            raise SolverRunError(None, '\n'.join(output))
+        return results, individual_results
+
+    command = [
+        'conda',
+        'run',
+        '-n',
+        f'{config[CONDA_ENVIRONMENT_NAME]}',
+        'sh',
+        f'{EVALUATE_SOLVER_FILEPATH}',
+        f'{data_subdirectory}/{ARC_CHALLENGE_TEST}',
+        f'{config[ARC_MODEL_SUBDIRECTORY]}',
+        f'{index}'
+    ]
+    # evaluate_solver.sh takes the cache files and then the retrieval batch size and concurrency as optional positional
+    # arguments, where "none" disables a cache
+    if use_retrieval_cache(config) or use_entailment_cache(config) or use_retrieval_options(config):
+        command += [
+            f'{config[RETRIEVAL_CACHE_FILE]}' if use_retrieval_cache(config) else 'none',
+            f'{config[ENTAILMENT_CACHE_FILE]}' if use_entailment_cache(config) else 'none'
+        ]
+    if use_retrieval_options(config):
+        command += [f'{get_retrieval_batch_size(config)}', f'{get_retrieval_concurrency(config)}']
+    run_results = run_solver_command(command, config)
+    results, individual_results = parse_solver_output(run_results.stdout.split('\n'))
+    if CORRECT not in results.keys():
+        raise SolverRunError(run_results.returncode, run_results.stderr)
+    return results, individual_results
+
+
+def use_batched_runs(config):
+    """ Whether every index waiting on a question set should be answered by a single ARC-Solver run
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            bool: True if batched runs are enabled in the config
+    """
+    return BATCH_INDICES in config and bool(config[BATCH_INDICES])
+
+
+def split_batch_output(output):
+    """ Splits the output of a batched ARC-Solver run into the output of each index
+
+        Args:
+            output (list): the lines printed by the batched ARC-Solver run
+
+        Returns:
+            dict: the lines printed for each index, by index
+    """
+    index_output = {}
+    current_index = None
+    for line in output:
+        if line.startswith(BATCH_INDEX_MARKER):
+            current_index = line[len(BATCH_INDEX_MARKER):].strip()
+            index_output[current_index] = []
+        elif current_index is not None:
+            index_output[current_index].append(line)
+    return index_output
+
+
+def run_arc_on_indices(indices, config, data_subdirectory=None, solver_client=None):
+    """ Runs the ARC-Solver once on a question set for several indices, so the question set is only prepared and the
+        model only loaded once for all of them
+
+        Args:
+            indices (list): the Elasticsearch indices that have articles designed for the question set
+            config (dict): config file specified properties to use in running the benchmark
+            data_subdirectory (str): optional, the data subdirectory holding the test set to run on, defaults to the
+                configured arc_data_subdirectory
+            solver_client (SolverClient): optional, a running solver server to send the batch to
+
+        Returns:
+            dict: the results and individual results of each index the run produced output for, by index
+    """
+    data_subdirectory = data_subdirectory or config[ARC_DATA_SUBDIRECTORY]
+    if solver_client is not None:
+        index_output = solver_client.run_batch(f'{data_subdirectory}/{ARC_CHALLENGE_TEST}', indices)
+    else:
+        command = [
             'conda',
             'run',
             '-n',
             f'{config[CONDA_ENVIRONMENT_NAME]}',
-            'sh',
-            f'{EVALUATE_SOLVER_FILEPATH}',
-            f'{config[ARC_DATA_SUBDIRECTORY]}/{ARC_CHALLENGE_TEST}',
+            'python3.6',
+            f'{EXAM_SOLVER_FILEPATH}',
             f'{config[ARC_MODEL_SUBDIRECTORY]}',
-            f'{index}'
-        ],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        universal_newlines=True
-    )
-    output = run_results.stdout.split('\n')
-    results = {}
-    individual_results = {}
-    for line_index in range(len(output)):
-        if METRICS in output[line_index]:
-            results = {
-                CORRECT: int(output[line_index + 4].split(':')[1].strip()),
-                INCORRECT: int(output[line_index + 5].split(':')[1].strip()),
-                UNANSWERED: int(output[line_index + 6].split(':')[1].strip())
-            }
-        if ADDENDUM_RESULTS in output[line_index]:
-            individual_results = json.loads(output[line_index + 1])
-    #if len(results.keys()) == 0:
-    #    print('************')
-    #    print(run_results.stdout)
-    #    print('************')
-    #    print(run_results.stderr)
-    #    print('************')
-    return results, individual_results
+            '--batch',
+            f'{data_subdirectory}/{ARC_CHALLENGE_TEST}',
+            *indices
+        ]
+        run_results = run_solver_command(command + get_cache_options(config) + get_retrieval_options(config), config,
+                                         len(indices))
+        index_output = split_batch_output(run_results.stdout.split('\n'))
+
+    return {index: parse_solver_output(output) for index, output in index_output.items()}
+
+
+def run_arc_batch(indices, config, data_subdirectory=None, solver_client=None):
+    """ Runs a batched ARC-Solver run, treating a failed batch as one that produced no results so every index falls
+        back to being run on its own
+
+        Args:
+            indices (list): the Elasticsearch indices that have articles designed for the question set
+            config (dict): config file specified properties to use in running the benchmark
+            data_subdirectory (str): optional, the data subdirectory holding the test set to run on
+            solver_client (SolverClient): optional, a running solver server to send the batch to
+
+        Returns:
+            dict: the results and individual results of each index the run produced output for, by index
+    """
+    try:
+        return run_arc_on_indices(indices, config, data_subdirectory, solver_client)
+    except (SolverRunError, SolverServerError, JobTimeoutError, OSError, ValueError) as error:
+        print(f'batched arc run failure, {error}, running the indices one at a time')
+        return {}
+
+
+def run_arc_with_retries(index, config, data_subdirectory=None, solver_client=None, question_set_id=None):
+    """ Runs the ARC-Solver on an index, retrying the run with a growing delay when it fails in a way that might not
+        happen again. A run that fails for good is recorded in the dead-letter file, if one is configured
+
+        Args:
+            index (str): the Elasticsearch index that has an article designed for the question set
+            config (dict): config file specified properties to use in running the benchmark
+            data_subdirectory (str): optional, the data subdirectory holding the test set to run on, defaults to the
+                configured arc_data_subdirectory
+            solver_client (SolverClient): optional, a running solver server to send the runs to
+            question_set_id (str): optional, the id of the question set being run, recorded with a failed run
+
+        Returns:
+            dict: the number of correct, incorrect, and unanswered questions, empty if the run failed for good
+            dict: a python object containing the individual result by question id
+    """
+    try:
+        return run_with_retries(lambda: run_arc_on_index(index, config, data_subdirectory, solver_client), config)
+    except JobFailedError as job_failure:
+        print(f'arc run of {index} failed, {job_failure}, please rerun EXAM to ensure all results are obtained')
+        record_dead_letter(index, question_set_id, job_failure, config)
+        return {}, {}
+
+
+def create_results_entry(index, question_set_id, results, individual_results):
+    """ Builds the entry stored in the checkpoint file and the benchmark results for a single ARC-Solver run
+
+        Args:
+            index (str): the Elasticsearch index the ARC-Solver was run on
+            question_set_id (str): the id of the question set the ARC-Solver answered
+            results (dict): the number of correct, incorrect, and unanswered questions
+            individual_results (dict): the individual result by question id
+
+        Returns:
+            dict: the results entry for the run
+    """
+    return {
+        INDEX: index,
+        QUESTION_SET: question_set_id,
+        RESULTS: results,
+        INDIVIDUAL_RESULTS: individual_results
+    }
+
+
+def group_jobs(jobs, config):
+    """ Groups jobs into the units handed to a worker, all jobs of a question set when runs are batched and a job
+        apiece otherwise
+
+        Args:
+            jobs (list): (index, question set id, absolute question set filepath) tuples to run
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            list: lists of jobs that share a question set
+    """
+    if not use_batched_runs(config):
+        return [[job] for job in jobs]
+
+    question_set_jobs = {}
+    for job in jobs:
+        if job[1] not in question_set_jobs:
+            question_set_jobs[job[1]] = []
+        question_set_jobs[job[1]].append(job)
+    return list(question_set_jobs.values())
+
+
+def get_job_costs(pool_jobs):
+    """ Estimates how long each unit of jobs handed to a worker takes to run, by the number of questions it answers
+
+        Args:
+            pool_jobs (list): lists of (index, question set id, absolute question set filepath) jobs that share a
+                question set
+
+        Returns:
+            list: the number of questions answered by each list of jobs
+    """
+    question_counts = {}
+    job_costs = []
+    for jobs in pool_jobs:
+        question_set_filepath = jobs[0][2]
+        if question_set_filepath not in question_counts:
+            with open(question_set_filepath) as question_set_file:
+                question_counts[question_set_filepath] = sum(1 for line in question_set_file if line.strip())
+        job_costs.append(question_counts[question_set_filepath] * len(jobs))
+    return job_costs
+
+
+def run_arc_jobs(jobs, worker_subdirectory, arc_solver_directory, config, solver_client=None):
+    """ Runs (index, question set id, question set filepath) jobs that share a question set inside a worker's private
+        data subdirectory, batching them into one ARC-Solver run when batched runs are enabled
+
+        Args:
+            jobs (list): the jobs to run, all for the same question set
+            worker_subdirectory (str): the data subdirectory owned by the worker running the jobs
+            arc_solver_directory (str): the directory of the ARC-Solver project
+            config (dict): config file specified properties to use in running the benchmark
+            solver_client (SolverClient): optional, the solver server owned by the worker running the jobs
+
+        Returns:
+            list: (job, (results, individual results)) tuples, results are empty for jobs where every attempt failed
+    """
+    copy_test_set(arc_solver_directory, jobs[0][2], config, worker_subdirectory)
+    try:
+        batch_results = {}
+        if use_batched_runs(config):
+            batch_results = run_arc_batch([job[0] for job in jobs], config, worker_subdirectory, solver_client)
+
+        job_results = []
+        for job in jobs:
+            if job[0] in batch_results and CORRECT in batch_results[job[0]][0].keys():
+                job_results.append((job, batch_results[job[0]]))
+            else:
+                job_results.append(
+                    (job, run_arc_with_retries(job[0], config, worker_subdirectory, solver_client, job[1]))
+                )
+        return job_results
+    finally:
+        clean_checkpoints(arc_solver_directory, config, data_subdirectory=worker_subdirectory)
+
+
+def record_job_results(pool_job_results, checkpoint_store, job_results):
+    """ Keeps a checkpoint of every successful run of a unit of jobs and adds its results entry to the job results
+
+        Args:
+            pool_job_results (list): (job, (results, individual results)) tuples, as returned by run_arc_jobs
+            checkpoint_store (object): the checkpoint store to record successful runs in
+            job_results (dict): the results entries of the successful runs by job, updated in place
+    """
+    for job, (results, individual_results) in pool_job_results:
+        if CORRECT in results.keys():
+            results_entry = create_results_entry(job[0], job[1], results, individual_results)
+            checkpoint_store.write(results_entry)
+            job_results[job] = results_entry
+
+
+def evaluate_question_set_jobs(jobs, arc_solver_directory, checkpoint_store, config, solver_client=None):
+    """ Runs the jobs of one question set in the configured ARC data subdirectory, the way a worker runs them in its
+        own copy, and keeps checkpoints of every successful run
+
+        Args:
+            jobs (list): (index, question set id, absolute question set filepath) tuples to run, all for the same
+                question set
+            arc_solver_directory (str): the directory of the ARC-Solver project
+            checkpoint_store (object): the checkpoint store to record successful runs in
+            config (dict): config file specified properties to use in running the benchmark
+            solver_client (SolverClient): optional, a running solver server to send the runs to
+
+        Returns:
+            dict: the results entries of the successful runs by job
+    """
+    job_results = {}
+    if jobs:
+        record_job_results(
+            run_arc_jobs(jobs, config[ARC_DATA_SUBDIRECTORY], arc_solver_directory, config, solver_client),
+            checkpoint_store,
+            job_results
+        )
+    return job_results
+
+
+def evaluate_jobs_in_parallel(jobs, arc_solver_directory, checkpoint_store, solver_log_filepath, config):
+    """ Runs ARC-Solver jobs across a pool of workers, each with its own copy of the ARC data subdirectory, and keeps
+        checkpoints of every successful run
+
+        Jobs are run longest first, by the number of questions they answer, so a large question set never ends up
+        running alone at the end of the run
+
+        Args:
+            jobs (list): (index, question set id, absolute question set filepath) tuples to run
+            arc_solver_directory (str): the directory of the ARC-Solver project
+            checkpoint_store (object): the checkpoint store to record successful runs in
+            solver_log_filepath (str): the file solver servers write their own output to, if they are enabled
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            dict: the results entries of the successful runs by job
+    """
+    worker_subdirectories = create_worker_directories(arc_solver_directory, get_worker_count(config), config)
+    solver_clients = {}
+    job_results = {}
+    pool_jobs = group_jobs(jobs, config)
+    try:
+        solver_clients = start_solver_clients(arc_solver_directory, worker_subdirectories, solver_log_filepath, config)
+        for _, pool_job_results in run_in_worker_pool(
+            pool_jobs,
+            lambda pool_jobs, worker_subdirectory: run_arc_jobs(
+                pool_jobs,
+                worker_subdirectory,
+                arc_solver_directory,
+                config,
+                solver_clients.get(worker_subdirectory)
+            ),
+            worker_subdirectories,
+            get_job_costs(pool_jobs)
+        ):
+            record_job_results(pool_job_results, checkpoint_store, job_results)
+    finally:
+        stop_solver_clients(solver_clients)
+        remove_worker_directories(arc_solver_directory, worker_subdirectories)
+    return job_results
+
+
+def get_question_set_jobs(question_set_id, indices, benchmark_set_filepaths, benchmark_dir, checkpoint_store):
+    """ Splits the indices of a question set into the jobs that still have to run and the results already checkpointed
+
+        Args:
+            question_set_id (str): the question set the indices are run on
+            indices (list): the indices to run on the question set
+            benchmark_set_filepaths (dict): a dictionary used to connect question sets to particular files
+            benchmark_dir (str): the directory the question set filepaths are relative to
+            checkpoint_store (object): the checkpoint store of earlier successful runs
+
+        Returns:
+            list: (index, question set id, absolute question set filepath) tuples to run, empty if the question set has
+                no file
+            dict: the checkpointed results entries by index and question set id
+    """
+    if question_set_id not in benchmark_set_filepaths \
+            or not os.path.isfile(f'{benchmark_dir}{benchmark_set_filepaths[question_set_id]}'):
+        print(f'no question set found for {question_set_id}')
+        return [], {}
+    question_set_filepath = f'{benchmark_dir}{benchmark_set_filepaths[question_set_id]}'
+    jobs = []
+    checkpointed_entries = {}
+    for index in indices:
+        if (index, question_set_id) in checkpoint_store:
+            checkpointed_entries[index, question_set_id] = checkpoint_store[index, question_set_id]
+        else:
+            jobs.append((index, question_set_id, question_set_filepath))
+    return jobs, checkpointed_entries
+
+
+def evaluate_question_sets(question_set_indices, benchmark_set_filepaths, arc_solver_directory, config):
+    """ Runs every index on its question sets from the ARC-Solver directory, across a pool of workers when there is more
+        than one, and keeps checkpoints of every successful run
+
+        Args:
+            question_set_indices (dict): a dictionary used to connect question sets to indices
+            benchmark_set_filepaths (dict): a dictionary used to connect question sets to particular files
+            arc_solver_directory (str): the directory of the ARC-Solver project
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            list: (index, results entry) tuples of every index run on a question set that has a file, by question set
+                and then index, the results entry is None if every attempt to run it failed
+    """
+    checkpoint_store = open_checkpoint_store(config)
+    benchmark_dir = os.getcwd()
+    jobs = []
+    checkpointed_entries = {}
+    job_results = {}
+    try:
+        report_dead_letters(checkpoint_store, config)
+        solver_log_filepath = os.path.join(benchmark_dir, config[CHECKPOINT_DIRECTORY], SOLVER_SERVER_LOG_FILE)
+        # failed runs are recorded while running from the ARC-Solver directory, so they need the full checkpoint path
+        config = {**config, CHECKPOINT_DIRECTORY: os.path.join(benchmark_dir, config[CHECKPOINT_DIRECTORY])}
+        os.chdir(arc_solver_directory)
+        if get_worker_count(config) > 1:
+            for question_set_id, indices in question_set_indices.items():
+                question_set_jobs, question_set_entries = get_question_set_jobs(
+                    question_set_id, indices, benchmark_set_filepaths, benchmark_dir, checkpoint_store
+                )
+                jobs += question_set_jobs
+                checkpointed_entries.update(question_set_entries)
+            job_results = evaluate_jobs_in_parallel(jobs, arc_solver_directory, checkpoint_store,
+                                                    solver_log_filepath, config)
+        else:
+            solver_clients = {}
+            try:
+                solver_clients = start_solver_clients(
+                    arc_solver_directory,
+                    [config[ARC_DATA_SUBDIRECTORY]],
+                    solver_log_filepath,
+                    config
+                )
+                for question_set_id, indices in question_set_indices.items():
+                    clean_checkpoints(arc_solver_directory, config, full_reset=True)
+                    question_set_jobs, question_set_entries = get_question_set_jobs(
+                        question_set_id, indices, benchmark_set_filepaths, benchmark_dir, checkpoint_store
+                    )
+                    jobs += question_set_jobs
+                    checkpointed_entries.update(question_set_entries)
+                    job_results.update(evaluate_question_set_jobs(
+                        question_set_jobs,
+                        arc_solver_directory,
+                        checkpoint_store,
+                        config,
+                        solver_clients.get(config[ARC_DATA_SUBDIRECTORY])
+                    ))
+            finally:
+                stop_solver_clients(solver_clients)
+    finally:
+        checkpoint_store.close()
+        os.chdir(benchmark_dir)
+    entries = {**checkpointed_entries, **{job[:2]: job_results.get(job) for job in jobs}}
+    return [
+        (index, entries[index, question_set_id])
+        for question_set_id, indices in question_set_indices.items()
+        for index in indices
+        if (index, question_set_id) in entries
+    ]
 
 
 def evaluate_articles(index_files, question_set_indices, benchmark_set_filepaths, arc_solver_directory, config):
@@ -106,64 +536,11 @@ def evaluate_articles(index_files, question_set_indices, benchmark_set_filepaths
     """
     benchmark_results = {}
     print('##########################')
-    checkpoint_file, completed_entries = create_or_load_arc_checkpoint(config)
-    benchmark_dir = os.getcwd()
-    os.chdir(arc_solver_directory)
-    for question_set_id in question_set_indices.keys():
-        clean_checkpoints(arc_solver_directory, config, full_reset=True)
-        if question_set_id not in benchmark_set_filepaths \
-                or not os.path.isfile(f'{benchmark_dir}{benchmark_set_filepaths[question_set_id]}'):
-            print(f'no question set found for {question_set_id}')
-            continue
-        copy_test_set(arc_solver_directory, f'{benchmark_dir}{benchmark_set_filepaths[question_set_id]}', config)
-        for index in question_set_indices[question_set_id]:
-            if not index_files[index] in benchmark_results:
-                benchmark_results[index_files[index]] = []
-
-            if (index, question_set_id) in completed_entries.keys():
-                benchmark_results[index_files[index]].append(completed_entries[(index, question_set_id)])
-            else:
-                results = {}
-                try:
-                    results, individual_results = run_arc_on_index(index, config)
-                except:
-                    print('arc run failure, attempting to retry')
-
-                # Running this script can sometimes cause error due to system overload implementing the below logic
-                # to let it retry and get it set up correctly, if it fails 10 times, move on, allowing a rerun later
-                if CORRECT not in results.keys():
-                    retry = 0
-                    while retry < 10 and CORRECT not in results.keys():
-                        time.sleep(10)
-                        try:
-                            results, individual_results = run_arc_on_index(index, config)
-                        except:
-                            print('failure')
-                        retry += 1
-                        print(f'retry attempt #{retry}')
-
-                if CORRECT not in results.keys():
-                    print('Retry attempts failed, please rerun EXAM to ensure all results are obtained')
-                else:
-                    results_entry = {
-                        INDEX: index,
-                        QUESTION_SET: question_set_id,
-                        RESULTS: results,
-                        INDIVIDUAL_RESULTS: individual_results
-                    }
-                    checkpoint_file.write(json.dumps(results_entry) + '\n')
-                    checkpoint_file.flush()
-
-                    benchmark_results[index_files[index]].append({
-                        INDEX: index,
-                        QUESTION_SET: question_set_id,
-                        RESULTS: results,
-                        INDIVIDUAL_RESULTS: individual_results
-                    })
-                clean_checkpoints(arc_solver_directory, config)
-
-    checkpoint_file.close()
-    os.chdir(benchmark_dir)
+    for index, entry in evaluate_question_sets(question_set_indices, benchmark_set_filepaths, arc_solver_directory,
+                                               config):
+        file_results = benchmark_results.setdefault(index_files[index], [])
+        if entry is not None:
+            file_results.append(entry)
     return benchmark_results
 
 
@@ -181,38 +558,11 @@ def evaluate_arc_index(benchmark_results, question_set_indices, benchmark_set_fi
             dict: a dictionary containing the results from the ARC index and all other indices and articles run
                 previously
     """
-    checkpoint_file, completed_entries = create_or_load_arc_checkpoint(config)
-    benchmark_dir = os.getcwd()
-    os.chdir(arc_solver_directory)
-    benchmark_results[config[ARC_CORPUS_INDEX]] = []
-    for question_set_id in question_set_indices.keys():
-        clean_checkpoints(arc_solver_directory, config, full_reset=True)
-        if question_set_id not in benchmark_set_filepaths \
-                or not os.path.isfile(f'{benchmark_dir}{benchmark_set_filepaths[question_set_id]}'):
-            print(f'no question set found for {question_set_id}')
-            continue
-        copy_test_set(arc_solver_directory, f'{benchmark_dir}{benchmark_set_filepaths[question_set_id]}', config)
-        if (config[ARC_CORPUS_INDEX], question_set_id) in completed_entries.keys():
-            benchmark_results[config[ARC_CORPUS_INDEX]].append(
-                completed_entries[config[ARC_CORPUS_INDEX], question_set_id]
-            )
-        else:
-            results, individual_results = run_arc_on_index(config[ARC_CORPUS_INDEX], config)
-            results_entry = {
-                INDEX: config[ARC_CORPUS_INDEX],
-                QUESTION_SET: question_set_id,
-                RESULTS: results,
-                INDIVIDUAL_RESULTS: individual_results
-            }
-            checkpoint_file.write(json.dumps(results_entry) + '\n')
-            benchmark_results[config[ARC_CORPUS_INDEX]].append({
-                INDEX: config[ARC_CORPUS_INDEX],
-                QUESTION_SET: question_set_id,
-                RESULTS: results,
-                INDIVIDUAL_RESULTS: individual_results
-            })
-            clean_checkpoints(arc_solver_directory, config)
-
-    checkpoint_file.close()
-    os.chdir(benchmark_dir)
+    arc_question_set_indices = {question_set_id: [config[ARC_CORPUS_INDEX]] for question_set_id in question_set_indices}
+    benchmark_results[config[ARC_CORPUS_INDEX]] = [
+        entry
+        for _, entry in evaluate_question_sets(arc_question_set_indices, benchmark_set_filepaths, arc_solver_directory,
+                                               config)
+        if entry is not None
+    ]
     return benchmark_results
@@ -1,7 +1,25 @@
+import copy
+import hashlib
+import json
+import os
 import re
-from arc_benchmark.file_utils import read_jsonl_articles, load_tqa_articles
-from arc_benchmark.constants import ELASTICSEARCH_DOC, ELASTICSEARCH_ID, ELASTICSEARCH_INDEX, ELASTICSEARCH_OP_TYPE, \
-    ELASTICSEARCH_SOURCE, ELASTICSEARCH_TYPE, FILE, ID, INDEX, MAPPING, QUESTION_DIRECTORY, TEXT, TITLE
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from elasticsearch.helpers import parallel_bulk
+from arc_benchmark.file_utils import get_parse_worker_count, iterate_jsonl_articles, load_json, load_tqa_articles, \
+    store_json
+from arc_benchmark.sharding import get_shard, is_in_shard
+from arc_benchmark.constants import CHECKPOINT_DIRECTORY, DOC_ID, ELASTICSEARCH_AFTER_KEY, ELASTICSEARCH_AGGREGATIONS, \
+    ELASTICSEARCH_BUCKETS, ELASTICSEARCH_DOC, ELASTICSEARCH_ID, ELASTICSEARCH_INDEX, ELASTICSEARCH_KEY, \
+    ELASTICSEARCH_OP_TYPE, ELASTICSEARCH_REFRESH_INTERVAL, ELASTICSEARCH_ROUTING, ELASTICSEARCH_SETTINGS, \
+    ELASTICSEARCH_SOURCE, ELASTICSEARCH_TYPE, FILE, ID, INDEX, INDEX_CHUNK_SIZE, INDEX_MANIFEST_FILE, \
+    INDEX_THREAD_COUNT, MAPPING, QUESTION_DIRECTORY, SHARED_INDEX, SHARED_INDEX_SEPARATOR, TAGS, TEXT, TITLE
+
+DEFAULT_INDEX_CHUNK_SIZE = 500
+# the number of article indices whose refresh is restored with a single request, keeps the request url short
+REFRESH_BATCH_SIZE = 100
+# the number of stored article names fetched per request when listing the articles of a shared index
+ARTICLE_NAME_PAGE_SIZE = 10000
 
 
 def clean_article_name(article_name):
@@ -51,13 +69,413 @@ def make_documents(index_name, article, config):
         yield doc
 
 
+def use_index_manifest(config):
+    """ Whether a manifest of the content hash of every stored article should be kept, so articles whose text changed
+        are re-indexed rather than skipped because their index already exists
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            bool: True if an index manifest file is set in the config
+    """
+    return INDEX_MANIFEST_FILE in config and bool(config[INDEX_MANIFEST_FILE])
+
+
+def load_index_manifest(config):
+    """ Loads the content hash of every article stored by earlier runs
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            dict: the content hash of each stored article by its index, empty if there is no manifest
+    """
+    if not use_index_manifest(config):
+        return {}
+    return load_json(config[INDEX_MANIFEST_FILE], config) or {}
+
+
+def store_index_manifest(manifest, config):
+    """ Saves the content hash of every stored article to the checkpoint directory
+
+        Args:
+            manifest (dict): the content hash of each stored article by its index
+            config (dict): config file specified properties to use in running the benchmark
+    """
+    if use_index_manifest(config):
+        os.makedirs(config[CHECKPOINT_DIRECTORY], exist_ok=True)
+        store_json(manifest, config[INDEX_MANIFEST_FILE], config)
+
+
+def has_index_manifest(config):
+    """ Whether an earlier run already wrote the index manifest file
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            bool: True if the index manifest file exists in the checkpoint directory
+    """
+    return os.path.isfile(f'{config[CHECKPOINT_DIRECTORY]}/{config[INDEX_MANIFEST_FILE]}')
+
+
+def get_article_hash(article):
+    """ Hashes the text of an article
+
+        Args:
+            article (dict): the article
+
+        Returns:
+            str: the hex digest of the article text
+    """
+    return hashlib.sha1(article[TEXT].encode('utf-8')).hexdigest()
+
+
+def is_article_changed(index_name, article, manifest, config):
+    """ Whether an article already stored under an index has different text than the article now given for it
+
+        Args:
+            index_name (str): the index the article is stored under
+            article (dict): the article as it is now
+            manifest (dict): the content hash of each stored article by its index
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            bool: True if the manifest is in use and does not hold the hash of the article's current text, an article
+                missing from the manifest is only treated as changed once the manifest file exists
+    """
+    if not use_index_manifest(config):
+        return False
+    if index_name not in manifest:
+        # indices stored before the first manifest was written are seeded with their current hash instead of rebuilt
+        return has_index_manifest(config)
+    return manifest[index_name] != get_article_hash(article)
+
+
+def get_index_thread_count(config):
+    """ Returns the number of threads articles are stored into Elasticsearch with, defaulting to storing them one
+        article at a time
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            int: the number of indexing threads
+    """
+    if INDEX_THREAD_COUNT not in config or not config[INDEX_THREAD_COUNT]:
+        return 1
+    return max(1, int(config[INDEX_THREAD_COUNT]))
+
+
+def get_index_chunk_size(config):
+    """ Returns the number of documents sent to Elasticsearch per bulk request when storing articles concurrently
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            int: the number of documents per bulk request
+    """
+    if INDEX_CHUNK_SIZE not in config or not config[INDEX_CHUNK_SIZE]:
+        return DEFAULT_INDEX_CHUNK_SIZE
+    return max(1, int(config[INDEX_CHUNK_SIZE]))
+
+
+def get_deferred_refresh_mapping(config):
+    """ Builds the index mapping with refreshing turned off, so bulk loading an article never waits on a refresh
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            dict: the configured mapping with the refresh interval disabled
+    """
+    mapping = json.loads(config[MAPPING]) if isinstance(config[MAPPING], str) else copy.deepcopy(config[MAPPING])
+    mapping.setdefault(ELASTICSEARCH_SETTINGS, {}).setdefault(INDEX, {})[ELASTICSEARCH_REFRESH_INTERVAL] = '-1'
+    return mapping
+
+
+def create_index_if_missing(index_name, es, mapping, replace=False):
+    """ Creates an article index unless it already exists
+
+        Args:
+            index_name (str): the name of the index to be created
+            es (object): an Elasticsearch instance to use for creating indices
+            mapping (dict): the mapping to create the index with
+            replace (bool): optional, whether an existing index should be deleted and created again
+
+        Returns:
+            bool: True if the index was created, meaning its article still has to be stored
+    """
+    if es.indices.exists(index=index_name):
+        if not replace:
+            return False
+        es.indices.delete(index=index_name, ignore=404)
+    es.indices.create(index=index_name, ignore=400, body=mapping)
+    return True
+
+
+def restore_refresh(index_names, es):
+    """ Turns refreshing back on for indices created with a deferred refresh and refreshes them so their documents
+        are searchable
+
+        Args:
+            index_names (list): the indices created with refreshing turned off
+            es (object): an Elasticsearch instance
+    """
+    for start in range(0, len(index_names), REFRESH_BATCH_SIZE):
+        indices = ','.join(index_names[start:start + REFRESH_BATCH_SIZE])
+        es.indices.put_settings(index=indices, body={INDEX: {ELASTICSEARCH_REFRESH_INTERVAL: None}})
+        es.indices.refresh(index=indices)
+
+
+def store_articles_concurrently(articles, es, manifest, config):
+    """ Inserts articles into Elasticsearch, checking for and creating the indices of a batch of articles on a pool
+        of threads and then streaming the documents of every new index through parallel bulk requests. Indices are
+        created with refreshing turned off, it is turned back on once every article is stored
+
+        Args:
+            articles (iterable of dicts): the articles to insert into Elasticsearch
+            es (object): an Elasticsearch client object to store articles with
+            manifest (dict): the content hash of each stored article by its index, updated with the stored articles
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            dict: a list of Elasticsearch indices by the set of questions they are associated with
+            dict: a dict of files associated with their indices, used later in calculating results
+    """
+    thread_count = get_index_thread_count(config)
+    chunk_size = get_index_chunk_size(config)
+    mapping = get_deferred_refresh_mapping(config)
+    question_set_indices = {}
+    index_file = {}
+    created_indices = []
+    articles = iter(articles)
+    try:
+        with ThreadPoolExecutor(max_workers=thread_count) as executor:
+            article_batch = list(islice(articles, thread_count * chunk_size))
+            while article_batch:
+                new_articles = {}
+                for article in article_batch:
+                    index_name = clean_article_name(article[TITLE])
+                    if index_name not in index_file:
+                        new_articles[index_name] = article
+                    index_file[index_name] = article[FILE]
+                    if article[ID] in question_set_indices:
+                        question_set_indices[article[ID]].append(index_name)
+                    else:
+                        question_set_indices[article[ID]] = [index_name]
+
+                index_names = list(new_articles.keys())
+                created = list(executor.map(
+                    lambda index_name: create_index_if_missing(
+                        index_name,
+                        es,
+                        mapping,
+                        is_article_changed(index_name, new_articles[index_name], manifest, config)
+                    ),
+                    index_names
+                ))
+                for index_name in index_names:
+                    manifest[index_name] = get_article_hash(new_articles[index_name])
+                batch_created_indices = [
+                    index_name for index_name, was_created in zip(index_names, created) if was_created
+                ]
+                created_indices += batch_created_indices
+                documents = (
+                    document
+                    for index_name in batch_created_indices
+                    for document in make_documents(
+                        index_name,
+                        re.split('[.?!]', new_articles[index_name][TEXT]),
+                        config
+                    )
+                )
+                for _ in parallel_bulk(es, documents, thread_count=thread_count, chunk_size=chunk_size):
+                    pass
+                article_batch = list(islice(articles, thread_count * chunk_size))
+    finally:
+        # indices are created with refreshing turned off, so even a failed run must turn it back on
+        restore_refresh(created_indices, es)
+    return question_set_indices, index_file
+
+
+def use_shared_index(config):
+    """ Whether every article should be stored in one shared Elasticsearch index rather than an index per article
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            bool: True if a shared index is set in the config
+    """
+    return SHARED_INDEX in config and bool(config[SHARED_INDEX])
+
+
+def get_shared_article_index(article_name, config):
+    """ Builds the name the rest of the benchmark, and the ARC-Solver, refer to an article in the shared index by
+
+        Args:
+            article_name (str): the cleaned name of the article, stored in the docId field of its sentences
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            str: the shared index and the article name, separated by a slash
+    """
+    return f'{config[SHARED_INDEX]}{SHARED_INDEX_SEPARATOR}{article_name}'
+
+
+def make_shared_index_documents(article_name, article, article_file, config):
+    """ Yields the documents of an article for the shared index, each tagged with the article it belongs to and
+        routed by it so an article's sentences are kept together on one shard
+
+        Args:
+            article_name (str): the cleaned name of the article
+            article (list): a list of sentences from an article
+            article_file (str): the file the article came from
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            generator: a iterable group of Elasticsearch compatible documents
+    """
+    doc_id = 0
+    for line in article:
+        yield {
+            ELASTICSEARCH_INDEX: config[SHARED_INDEX],
+            ELASTICSEARCH_TYPE: ELASTICSEARCH_DOC,
+            ELASTICSEARCH_OP_TYPE: INDEX,
+            ELASTICSEARCH_ID: f'{article_name}-{doc_id}',
+            ELASTICSEARCH_ROUTING: article_name,
+            ELASTICSEARCH_SOURCE: {TEXT: line.strip(), DOC_ID: article_name, TAGS: [article_file]}
+        }
+        doc_id += 1
+
+
+def get_stored_article_names(es, config):
+    """ Lists the articles already stored in the shared index, paging through a composite aggregation of docId
+
+        Args:
+            es (object): an Elasticsearch instance
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            set: the names of the stored articles
+    """
+    article_names = set()
+    composite = {'size': ARTICLE_NAME_PAGE_SIZE, 'sources': [{DOC_ID: {'terms': {'field': DOC_ID}}}]}
+    while True:
+        response = es.search(
+            index=config[SHARED_INDEX],
+            body={'size': 0, 'aggs': {DOC_ID: {'composite': composite}}}
+        )
+        aggregation = response[ELASTICSEARCH_AGGREGATIONS][DOC_ID]
+        buckets = aggregation[ELASTICSEARCH_BUCKETS]
+        article_names.update(bucket[ELASTICSEARCH_KEY][DOC_ID] for bucket in buckets)
+        if len(buckets) < ARTICLE_NAME_PAGE_SIZE or ELASTICSEARCH_AFTER_KEY not in aggregation:
+            return article_names
+        composite = {**composite, 'after': aggregation[ELASTICSEARCH_AFTER_KEY]}
+
+
+def store_articles_in_shared_index(articles, es, bulk, manifest, config):
+    """ Inserts articles into one shared Elasticsearch index, sending the sentences of every article not stored yet
+        through a single stream of bulk requests with refreshing turned off until they are all stored
+
+        Args:
+            articles (iterable of dicts): the articles to insert into Elasticsearch
+            es (object): an Elasticsearch client object to store articles with
+            bulk (function): a function for the Elasticsearch library, passed in for ease of unit testing
+            manifest (dict): the content hash of each stored article by its index, updated with the stored articles
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            dict: a list of article names, as shared index/article, by the set of questions they are associated with
+            dict: a dict of files associated with their article names, used later in calculating results
+    """
+    create_elasticsearch_index(config[SHARED_INDEX], es, config)
+    stored_articles = get_stored_article_names(es, config)
+    question_set_indices = {}
+    index_file = {}
+
+    # fills in the question sets and files as the bulk helper consumes the documents
+    def make_new_article_documents():
+        for article in articles:
+            article_name = clean_article_name(article[TITLE])
+            index_name = get_shared_article_index(article_name, config)
+            is_first_occurrence = index_name not in index_file
+            index_file[index_name] = article[FILE]
+            if article[ID] in question_set_indices:
+                question_set_indices[article[ID]].append(index_name)
+            else:
+                question_set_indices[article[ID]] = [index_name]
+            if not is_first_occurrence:
+                continue
+            if article_name in stored_articles and is_article_changed(index_name, article, manifest, config):
+                es.delete_by_query(
+                    index=config[SHARED_INDEX],
+                    body={'query': {'term': {DOC_ID: article_name}}},
+                    routing=article_name,
+                    conflicts='proceed'
+                )
+                stored_articles.remove(article_name)
+            manifest[index_name] = get_article_hash(article)
+            if article_name not in stored_articles:
+                yield from make_shared_index_documents(
+                    article_name,
+                    re.split('[.?!]', article[TEXT]),
+                    article[FILE],
+                    config
+                )
+
+    es.indices.put_settings(index=config[SHARED_INDEX], body={INDEX: {ELASTICSEARCH_REFRESH_INTERVAL: '-1'}})
+    try:
+        thread_count = get_index_thread_count(config)
+        if thread_count > 1:
+            for _ in parallel_bulk(es, make_new_article_documents(), thread_count=thread_count,
+                                   chunk_size=get_index_chunk_size(config)):
+                pass
+        else:
+            bulk(es, make_new_article_documents(), chunk_size=get_index_chunk_size(config))
+    finally:
+        # refreshing was turned off for the ingest, so even a failed one must turn it back on
+        restore_refresh([config[SHARED_INDEX]], es)
+    return question_set_indices, index_file
+
+
 def store_articles(articles, es, bulk, config):
     """ Takes in a series of articles and inserts them into Elasticsearch
         
         Args:
-            articles (list of dicts): a list of articles to insert into Elasticsearch
+            articles (iterable of dicts): the articles to insert into Elasticsearch, consumed one at a time so it can
+                be a generator streaming them from disk
+            es (object): an Elasticsearch client object to store articles with
+            bulk (function): a function for the Elasticsearch library, passed in for ease of unit testing
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            dict: a list of Elasticsearch indices by the set of questions they are associated with
+            dict: a dict of files associated with their indices, used later in calculating results
+    """
+    manifest = load_index_manifest(config)
+    if use_shared_index(config):
+        question_set_indices, index_file = store_articles_in_shared_index(articles, es, bulk, manifest, config)
+    elif get_index_thread_count(config) > 1:
+        question_set_indices, index_file = store_articles_concurrently(articles, es, manifest, config)
+    else:
+        question_set_indices, index_file = store_articles_one_at_a_time(articles, es, bulk, manifest, config)
+    store_index_manifest(manifest, config)
+    return question_set_indices, index_file
+
+
+def store_articles_one_at_a_time(articles, es, bulk, manifest, config):
+    """ Inserts articles into Elasticsearch one article, and one bulk request, at a time. Articles whose index already
+        exists are skipped unless their text changed since they were stored
+
+        Args:
+            articles (iterable of dicts): the articles to insert into Elasticsearch
             es (object): an Elasticsearch client object to store articles with
             bulk (function): a function for the Elasticsearch library, passed in for ease of unit testing
+            manifest (dict): the content hash of each stored article by its index, updated with the stored articles
             config (dict): config file specified properties to use in running the benchmark
 
         Returns:
@@ -67,12 +485,17 @@ def store_articles(articles, es, bulk, config):
     question_set_indices = {}
     index_file = {}
     for article in articles:
-        line_array = re.split('[.?!]', article[TEXT])
         index_name = clean_article_name(article[TITLE])
-        if not es.indices.exists(index=index_name):
-            create_elasticsearch_index(index_name, es, config)
-            make_documents(index_name, line_array, config)
-            bulk(es, make_documents(index_name, line_array, config))
+        if index_name not in index_file:
+            index_exists = es.indices.exists(index=index_name)
+            if index_exists and is_article_changed(index_name, article, manifest, config):
+                es.indices.delete(index=index_name, ignore=404)
+                index_exists = False
+            if not index_exists:
+                line_array = re.split('[.?!]', article[TEXT])
+                create_elasticsearch_index(index_name, es, config)
+                bulk(es, make_documents(index_name, line_array, config))
+            manifest[index_name] = get_article_hash(article)
         index_file[index_name] = article[FILE]
         if article[ID] in question_set_indices:
             question_set_indices[article[ID]].append(index_name)
@@ -93,7 +516,10 @@ def load_and_store_articles(article_directory, es, bulk, config):
         Returns:
             dict: a list of Elasticsearch indices by the set of questions they are associated with
     """
-    articles = read_jsonl_articles(article_directory)
+    articles = iterate_jsonl_articles(article_directory, get_parse_worker_count(config))
+    shard = get_shard(config)
+    if shard is not None:
+        articles = (article for article in articles if is_in_shard(article[ID], shard))
     #for article in articles:
         #print(article['title'])
         #if article['title'] in ['rerank2_bert-darwin\'s theory of evolution', 'uvabottomup2-darwin\'s theory of evolution', 'dangnt-nlp-darwin\'s theory of evolution']:
@@ -118,7 +544,7 @@ def combine_indices(new_question_set_indices, question_set_indices):
     return question_set_indices
 
 
-def load_and_store_tqa_articles(question_set_indices, es, bulk, config):
+def load_and_store_tqa_articles(question_set_indices, es, bulk, config, tqa_dataset=None):
     """ Loads articles from the TQA dataset and stores them in the Elasticsearch Database
 
         Args:
@@ -126,13 +552,17 @@ def load_and_store_tqa_articles(question_set_indices, es, bulk, config):
             es (object): the Elasticsearch Object used to insert into the database
             bulk (function): the Elasticsearch function to rapidly insert a large chunk of indices
             config (dict): config file specified properties to use in running the benchmark
+            tqa_dataset (TqaDataset): optional, the already loaded question files to take the TQA articles from
 
         Returns:
             dict: the master list of normal article indices and tqa article indices by the question set they will
                 answer
             dict: a dict of files associated with their indices, used later in calculating results
     """
-    articles = load_tqa_articles(question_set_indices, config)
+    if tqa_dataset is not None:
+        articles = tqa_dataset.iterate_articles()
+    else:
+        articles = load_tqa_articles(question_set_indices, config)
     #for article in articles:
         # print(article['title'])
     #    if article['title'] in ['tqa-darwins theory of evolution']:
@@ -1,6 +1,7 @@
 import os
 import shutil
 from arc_benchmark.file_utils import read_json_questions
+from arc_benchmark.question_index import get_question_index_directory
 from arc_benchmark.constants import ANSWER_KEY, ARC_CHALLENGE_TEST, BENCHMARK_SET_DIRECTORY, CHOICES, ID, LABEL, \
     QUESTION, STEM, TEXT
 
@@ -58,7 +59,7 @@ def store_question_sets(question_sets, question_set_ids, config):
     return question_set_filepaths
 
 
-def create_test_sets(question_directory, question_set_ids, config):
+def create_test_sets(question_directory, question_set_ids, config, tqa_dataset=None):
     """ Orchestrates the loading of questions from one or more JSON files and then the storage of sets of questions
         into JSONL test sets for use in the ARC QA system
 
@@ -67,6 +68,7 @@ def create_test_sets(question_directory, question_set_ids, config):
             question_set_ids (keysview): a list of ids that correspond to sets of questions that should be saved,
                 all other sets of questions should be ignored as they won't be used in the benchmark
             config (dict): config file specified properties to use in running the benchmark
+            tqa_dataset (TqaDataset): optional, the already loaded question files to take the questions from
 
         Returns:
             dict: the filepaths of the saved question sets
@@ -74,7 +76,14 @@ def create_test_sets(question_directory, question_set_ids, config):
     """
     create_or_clean_directory(config)
 
-    question_sets, question_answer_counts = read_json_questions(question_directory, question_set_ids)
+    if tqa_dataset is not None:
+        question_sets, question_answer_counts = tqa_dataset.get_questions()
+    else:
+        question_sets, question_answer_counts = read_json_questions(
+            question_directory,
+            question_set_ids,
+            get_question_index_directory(config)
+        )
     #for question in question_sets['L_0432']:
     #    print(f'Question Number: {question["id"]}')
     #    print(f'Question Text: {question["question"]["stem"]}')
@@ -1,6 +1,6 @@
 import json
-import random
-from scipy.stats import kendalltau, spearmanr, sem
+import numpy as np
+from scipy.stats import sem
 
 # Numbering of algorithms
 rerank2_bert = 1
@@ -32,7 +32,12 @@ RPREC = 'rprec'
 SPEAR = 'spear'
 TIE = 'tie'
 TIES = 'ties'
-TIE_RERUNS = 10
+TIE_RERUNS = 10000
+# the number of bootstrap resamples of the reruns used for the confidence interval of each average correlation
+BOOTSTRAP_SAMPLES = 1000
+CONFIDENCE_LEVEL = 0.95
+# the most values drawn at once while bootstrapping, to bound memory
+BOOTSTRAP_CHUNK_SIZE = 1000000
 
 # excluding rerank3 bert and irit-run1 until I get results from laura
 informativeness = {
@@ -88,129 +93,156 @@ metric_rankings = {
 }
 
 
-def decide_tie(tied_algorithms):
-    """ Randomly orders a list of algorithms that are tied
+def generate_randomized_rankings(ranking, run_count, rng):
+    """ Generates run_count rankings as the rows of a matrix, if a ranking has any ties, the tied algorithms are put in
+        a random order in every row
 
         Args:
-            tied_algorithms (list): a list of algorithms that are all tied
+            ranking (dict): contains the order and ties of a ranking of algorithm runs
+            run_count (int): the number of rankings that should be generated
+            rng (Generator): the numpy random generator to order the ties with
 
         Returns:
-            list: a randomly permuted list sampled without replacement from tied_algorithms
+            ndarray: a run_count by algorithm count matrix of the algorithms in ranked order
     """
-    return random.sample(tied_algorithms, len(tied_algorithms))
+    if TIES not in ranking.keys():
+        return np.tile(np.array(ranking[RANKING]), (run_count, 1))
+
+    columns = []
+    tie_count = 0
+    for algorithm in ranking[RANKING]:
+        if algorithm != TIE:
+            columns.append(np.full((run_count, 1), algorithm))
+        else:
+            tied_algorithms = np.array(ranking[TIES][tie_count])
+            # sorting a row of random numbers gives a uniformly random permutation of the tied algorithms
+            columns.append(tied_algorithms[np.argsort(rng.random((run_count, len(tied_algorithms))), axis=1)])
+            tie_count += 1
+    return np.hstack(columns)
 
 
-def generate_randomized_rankings(ranking, run_count):
-    """ Generates run_count number of lists, if a ranking has any ties, randomize the ties to create a permuted list
+def correlate_rankings(randomized_rankings):
+    """ Calculates the kendall's Tau and Spearman's rank correlation between every two metrics for every generated
+        ranking at once. Each generated ranking is a permutation, so both statistics reduce to sums over the ranks of
+        its values, computed for every pair of metrics and every rerun in a single array operation each
 
         Args:
-            ranking (dict): contains the order and ties of a ranking of algorithm runs
-            run_count (int): the number of rankings that should be generated
+            randomized_rankings (dict): the generated rankings of each metric, as matrices with a ranking per row
 
         Returns:
-            list: a list containing all of the rankings generated from an initial ranking
+            dict: the correlations between all metrics per generated ranking, as arrays
+
+        Raises:
+            ValueError: if the rankings do not all have the same number of reruns and algorithms
     """
-    randomized_rankings = []
-    count = 0
-    while count < run_count:
-        if TIES not in ranking.keys():
-            randomized_rankings.append(ranking[RANKING])
-        else:
-            randomized_ranking = []
-            tie_count = 0
-            for algorithm in ranking[RANKING]:
-                if algorithm != TIE:
-                    randomized_ranking.append(algorithm)
-                else:
-                    randomized_ranking = randomized_ranking + decide_tie(ranking[TIES][tie_count])
-                    tie_count += 1
-            randomized_rankings.append(randomized_ranking)
+    metric_names = list(randomized_rankings.keys())
+    if len({randomized_rankings[metric_name].shape for metric_name in metric_names}) > 1:
+        raise ValueError('every metric must rank the same number of algorithms the same number of times')
+    algorithm_count = randomized_rankings[metric_names[0]].shape[1]
+
+    # the rank of the value at each position of every generated ranking, as scipy ranks them
+    ranks = np.stack([
+        np.argsort(np.argsort(randomized_rankings[metric_name], axis=1), axis=1) for metric_name in metric_names
+    ]).astype(np.int64)
+    first_positions, second_positions = np.triu_indices(algorithm_count, 1)
+    pair_signs = np.sign(ranks[:, :, first_positions] - ranks[:, :, second_positions]).astype(np.int64)
+
+    # kendall: concordant minus discordant pairs over all pairs
+    kendall = np.einsum('arp,brp->abr', pair_signs, pair_signs) / len(first_positions)
+    # spearman: 1 - 6 * sum(d^2) / (n(n^2 - 1)), where sum(d^2) = 2 * sum(r^2) - 2 * sum(r_a * r_b)
+    square_sum = (algorithm_count - 1) * algorithm_count * (2 * algorithm_count - 1) // 6
+    squared_differences = 2 * square_sum - 2 * np.einsum('arn,brn->abr', ranks, ranks)
+    spear = 1 - 6 * squared_differences / (algorithm_count * (algorithm_count ** 2 - 1))
 
-        count += 1
-    return randomized_rankings
+    metric_correlations = {}
+    for first_metric_index, first_metric_name in enumerate(metric_names):
+        for second_metric_index in range(first_metric_index + 1, len(metric_names)):
+            second_metric_name = metric_names[second_metric_index]
+            metric_correlations[(first_metric_name, second_metric_name, KENDALL)] = \
+                kendall[first_metric_index, second_metric_index]
+            metric_correlations[(first_metric_name, second_metric_name, SPEAR)] = \
+                spear[first_metric_index, second_metric_index]
+    return metric_correlations
 
 
-def correlate_rankings(randomized_rankings):
-    """ Calculates the kendall's Tau and Spearman's rank correlation between two rankings
+def bootstrap_confidence_interval(correlations, rng, bootstrap_samples=BOOTSTRAP_SAMPLES):
+    """ Estimates a confidence interval of the average of the correlations of every rerun by resampling the reruns
+        with replacement and taking the percentiles of the resampled averages
 
         Args:
-            randomized_rankings (dict): a dictionary containing the generated rankings to be evaluated for correlation
+            correlations (ndarray): the correlation of every rerun
+            rng (Generator): the numpy random generator to resample with
+            bootstrap_samples (int): (optional) the number of resamples
 
         Returns:
-            dict: a dictionary containing the correlations between all metrics per generated ranking
+            float: the lower bound of the confidence interval
+            float: the upper bound of the confidence interval
     """
-    metric_correlations = {}
-    metric_index = 0
-    while metric_index < len(randomized_rankings.keys()) - 1:
-        for second_metric_index in range(metric_index + 1, len(randomized_rankings.keys())):
-            first_metric_name = list(randomized_rankings.keys())[metric_index]
-            second_metric_name = list(randomized_rankings.keys())[second_metric_index]
-            first_second_metric_kendall = []
-            first_second_metric_spear = []
-            for run_index in range(len(randomized_rankings[list(randomized_rankings.keys())[metric_index]])):
-                kendall_correlation, _ = kendalltau(
-                    randomized_rankings[first_metric_name][run_index],
-                    randomized_rankings[second_metric_name][run_index]
-                )
-                first_second_metric_kendall.append(kendall_correlation)
-                spear_correlation, _ = spearmanr(
-                    randomized_rankings[first_metric_name][run_index],
-                    randomized_rankings[second_metric_name][run_index]
-                )
-                first_second_metric_spear.append(spear_correlation)
-            metric_correlations[(first_metric_name, second_metric_name, KENDALL)] = first_second_metric_kendall
-            metric_correlations[(first_metric_name, second_metric_name, SPEAR)] = first_second_metric_spear
-
-        metric_index += 1
-    return metric_correlations
+    resampled_averages = np.empty(bootstrap_samples)
+    chunk_size = max(1, BOOTSTRAP_CHUNK_SIZE // len(correlations))
+    for start in range(0, bootstrap_samples, chunk_size):
+        stop = min(bootstrap_samples, start + chunk_size)
+        samples = rng.integers(0, len(correlations), (stop - start, len(correlations)))
+        resampled_averages[start:stop] = correlations[samples].mean(axis=1)
+    tail = (1 - CONFIDENCE_LEVEL) / 2 * 100
+    lower_bound, upper_bound = np.percentile(resampled_averages, [tail, 100 - tail])
+    return float(lower_bound), float(upper_bound)
 
 
-def aggregate_correlations(correlation_results):
-    """ Calculates an average and standard deviation for each group of correlations calculated for each generated
-        ranking
+def aggregate_correlations(correlation_results, rng):
+    """ Calculates an average, standard deviation and bootstrap confidence interval for each group of correlations
+        calculated for each generated ranking
 
         Args:
-            correlation_results (dict): the correlation lists by each metric and correlation statistic
+            correlation_results (dict): the correlation arrays by each metric and correlation statistic
+            rng (Generator): the numpy random generator to bootstrap the confidence intervals with
 
         Returns:
-            dict: the dictionary of average and standard deviation of each metric by the correlation statistic
+            dict: the dictionary of average, standard deviation and confidence interval of each metric by the
+                correlation statistic
     """
     aggregated_correlations = {}
     for metric_tuple in correlation_results.keys():
-        if f'{(metric_tuple[0], metric_tuple[1])}' not in aggregated_correlations.keys():
-            aggregated_correlations[f'{(metric_tuple[0], metric_tuple[1])}'] = {}
-        aggregated_correlations[f'{(metric_tuple[0], metric_tuple[1])}'] = {
-            **aggregated_correlations[f'{(metric_tuple[0], metric_tuple[1])}'],
-            f'average_{metric_tuple[2]}': round(
-                sum(correlation_results[metric_tuple]) / len(correlation_results[metric_tuple]),
-                DECIMAL_DIGITS
-            ),
-            f'{metric_tuple[2]}_std_dev': round(sem(correlation_results[metric_tuple]), DECIMAL_DIGITS)
-        }
+        correlations = correlation_results[metric_tuple]
+        lower_bound, upper_bound = bootstrap_confidence_interval(correlations, rng)
+        aggregated_correlations.setdefault(f'{(metric_tuple[0], metric_tuple[1])}', {}).update({
+            f'average_{metric_tuple[2]}': round(float(np.mean(correlations)), DECIMAL_DIGITS),
+            f'{metric_tuple[2]}_std_dev': round(float(sem(correlations)), DECIMAL_DIGITS),
+            f'{metric_tuple[2]}_ci_low': round(lower_bound, DECIMAL_DIGITS),
+            f'{metric_tuple[2]}_ci_high': round(upper_bound, DECIMAL_DIGITS)
+        })
     return aggregated_correlations
 
 
-def calculate_correlation(rankings, random_reruns=10):
+def calculate_correlation(rankings, random_reruns=TIE_RERUNS, seed=None):
     """ Orchestrates the calculation of the average correlation between each metric and stores the results in a json
         file
 
         Args:
             rankings (dict): a dict of dicts containing the metric rankings and ties
             random_reruns (int): (optional) the number of randomized rerankings to make ties fair
+            seed (int): (optional) seeds the randomized rerankings and bootstrap, for results that can be reproduced
+
+        Returns:
+            dict: the aggregated correlations stored in the json file
     """
+    rng = np.random.default_rng(seed)
     randomized_rankings = {}
     for ranking_name in rankings.keys():
         randomized_rankings[ranking_name] = generate_randomized_rankings(
             rankings[ranking_name],
-            random_reruns
+            random_reruns,
+            rng
         )
 
     correlation_results = correlate_rankings(randomized_rankings)
-    aggregated_metrics = aggregate_correlations(correlation_results)
+    aggregated_metrics = aggregate_correlations(correlation_results, rng)
 
     json_file = open(f'{RESULTS_FILE}', 'w')
     json.dump(aggregated_metrics, json_file)
     json_file.close()
+    return aggregated_metrics
 
 
-calculate_correlation(metric_rankings, TIE_RERUNS)
+if __name__ == '__main__':
+    calculate_correlation(metric_rankings, TIE_RERUNS)
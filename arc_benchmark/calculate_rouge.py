@@ -1,22 +1,14 @@
 import re
+import hashlib
 import json
 import os
-import sys
 import nltk
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from scipy.stats import sem
-
-print(os.getcwd())
-sys.path.append('../arc-pipeline')
-
-from file_utils import read_jsonl_articles, load_tqa_articles
-from constants import FILE, ID, QUESTION_DIRECTORY, TEXT
-
-decimal_digits = 4
-article_directory = '../generated_articles'
-config_for_tqa_load = {QUESTION_DIRECTORY: 'question-for-extraction/tqa_v1_train.json'}
-results_file = 'checkpoints/rouge_1_results.json'
-
-nltk.download('wordnet')
+from arc_benchmark.file_utils import read_jsonl_articles, load_tqa_articles, store_json
+from arc_benchmark.constants import CHECKPOINT_DIRECTORY, DECIMAL_DIGITS, FILE, ID, QUESTION_DIRECTORY, \
+    ROUGE_RESULTS_FILE, ROUGE_TOKEN_CACHE_FILE, ROUGE_WORKER_COUNT, TEXT
 
 """ ROUGE Citation
 
@@ -35,109 +27,474 @@ nltk.download('wordnet')
 This implements the ROUGE algorithm, I do not own it, and did not create it, I only use it
 """
 
+# the NLTK data ROUGE tokenizes with, by the name nltk.download knows it by
+NLTK_RESOURCES = {
+    'corpora/stopwords': 'stopwords',
+    'corpora/wordnet': 'wordnet',
+    'tokenizers/punkt': 'punkt'
+}
+# the most lemmas a token cache keeps in memory
+LEMMA_CACHE_SIZE = 200000
+# the most tokenized documents a token cache keeps in memory and in its snapshot file
+DOCUMENT_CACHE_SIZE = 20000
+
+lemmatizer = None
+stop_words = None
+# the reference store and token cache of a scoring process, set once when the process starts
+worker_reference_texts = None
+worker_token_cache = None
+
+
+def check_nltk_resources():
+    """ Checks that the NLTK data ROUGE needs is installed, without downloading anything
+
+        Raises:
+            LookupError: if any of the NLTK data is missing, naming the command that installs it
+    """
+    missing_resources = []
+    for resource_path, resource_name in NLTK_RESOURCES.items():
+        try:
+            nltk.data.find(resource_path)
+        except LookupError:
+            missing_resources.append(resource_name)
+    if missing_resources:
+        raise LookupError(f'missing NLTK data {", ".join(missing_resources)}, install it with '
+                          f'python -m nltk.downloader {" ".join(missing_resources)}')
+
+
+def get_rouge_worker_count(config):
+    """ Returns the number of processes the algorithm runs are scored in, defaulting to one per core
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            int: the number of scoring processes, 1 scores the algorithm runs in this process
+    """
+    if ROUGE_WORKER_COUNT not in config or not config[ROUGE_WORKER_COUNT]:
+        return os.cpu_count() or 1
+    return max(1, int(config[ROUGE_WORKER_COUNT]))
+
+
+def get_token_cache_filepath(config):
+    """ Returns the file the lemmas and tokenized documents are kept in between runs
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            str: the token cache file in the checkpoint directory, None if no token cache file is configured
+    """
+    if ROUGE_TOKEN_CACHE_FILE not in config or not config[ROUGE_TOKEN_CACHE_FILE]:
+        return None
+    return f'{config[CHECKPOINT_DIRECTORY]}/{config[ROUGE_TOKEN_CACHE_FILE]}'
+
+
+def get_lemmatizer():
+    """ Returns the WordNet lemmatizer, created once and shared by every call
+
+        Returns:
+            WordNetLemmatizer: the lemmatizer
+    """
+    global lemmatizer
+    if lemmatizer is None:
+        lemmatizer = nltk.WordNetLemmatizer()
+    return lemmatizer
+
+
+def get_stop_words():
+    """ Returns the english stop words, loaded once and shared by every call
+
+        Returns:
+            frozenset: the stop words
+    """
+    global stop_words
+    if stop_words is None:
+        stop_words = frozenset(nltk.corpus.stopwords.words('english'))
+    return stop_words
+
 
-def clean_and_split(text):
+def clean_and_split(text, lemmatize=None):
     """ Takes the article text, removes stop words, converts it to tokens, and lemma-tizes them to get a cleaned and
         split list of tokens
 
         Args:
             text (string): the article text to clean and split
+            lemmatize (function): optional, looks up the lemma of a word, defaults to the WordNet lemmatizer
 
         Returns:
             list: the cleaned and split list of tokens based on the article text
     """
-    lemmatizer = nltk.WordNetLemmatizer()
-    stop_words = set(nltk.corpus.stopwords.words('english'))
+    lemmatize = lemmatize or get_lemmatizer().lemmatize
+    words_to_skip = get_stop_words()
 
     word_tokens = nltk.word_tokenize(re.sub('[!?.,]', '', text))
 
     filtered_sentence = []
     for word in word_tokens:
-        if word not in stop_words:
-            filtered_sentence.append(lemmatizer.lemmatize(word))
+        if word not in words_to_skip:
+            filtered_sentence.append(lemmatize(word))
     return filtered_sentence
 
 
-def get_unigram_overlap(algorithm_unigrams, reference_unigrams):
-    """ calculates the unigram overlap between an algorithm generated article and the reference textbook chapter
+class TokenCache:
+    """ Caches the lemma of every word and the cleaned tokens of every document by a SHA-1 hash of its text, both least
+        recently used first out, so texts already seen in this run or, through a snapshot file, an earlier one skip
+        NLTK. It also hands out the integer id of every token
+    """
+    def __init__(self, max_lemmas=None, max_documents=None):
+        """ Creates an empty cache
+
+            Args:
+                max_lemmas (int): optional, the most lemmas kept in memory, defaults to LEMMA_CACHE_SIZE
+                max_documents (int): optional, the most tokenized documents kept in memory and saved to a snapshot,
+                    defaults to DOCUMENT_CACHE_SIZE
+        """
+        self.max_lemmas = max_lemmas or LEMMA_CACHE_SIZE
+        self.max_documents = max_documents or DOCUMENT_CACHE_SIZE
+        self.lemmas = OrderedDict()
+        self.documents = OrderedDict()
+        self.token_ids = {}
+
+    def lemmatize(self, word):
+        """ Looks up the lemma of a word, only lemmatizing words that are not cached
+
+            Args:
+                word (string): the word to lemmatize
+
+            Returns:
+                string: the lemma of the word
+        """
+        lemma = self.lemmas.get(word)
+        if lemma is None:
+            lemma = get_lemmatizer().lemmatize(word)
+            self.lemmas[word] = lemma
+            if len(self.lemmas) > self.max_lemmas:
+                self.lemmas.popitem(last=False)
+        else:
+            self.lemmas.move_to_end(word)
+        return lemma
+
+    def clean_and_split(self, text):
+        """ Cleans and splits a text like clean_and_split, only once for every distinct text
+
+            Args:
+                text (string): the text to clean and split
+
+            Returns:
+                list: the cleaned and split list of tokens based on the text
+        """
+        key = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        tokens = self.documents.get(key)
+        if tokens is None:
+            tokens = clean_and_split(text, self.lemmatize)
+            self.documents[key] = tokens
+            if len(self.documents) > self.max_documents:
+                self.documents.popitem(last=False)
+        else:
+            self.documents.move_to_end(key)
+        return tokens
+
+    def get_token_ids(self, text):
+        """ Cleans and splits a text and converts its tokens to integer ids, the same token always gets the same id
+
+            Args:
+                text (string): the text to tokenize
+
+            Returns:
+                list: the id of every token of the text
+        """
+        return [self.token_ids.setdefault(token, len(self.token_ids)) for token in self.clean_and_split(text)]
+
+    def load(self, filepath):
+        """ Adds the lemmas and documents of a snapshot file to the cache, if the file exists
+
+            Args:
+                filepath (string): the snapshot file
+        """
+        if not filepath or not os.path.isfile(filepath):
+            return
+        with open(filepath, 'r') as snapshot_file:
+            self.update(json.load(snapshot_file))
+
+    def update(self, snapshot):
+        """ Adds the lemmas and documents of a snapshot, from a file or another process, to the cache
+
+            Args:
+                snapshot (dict): the lemma by word and the tokens by document hash to add
+        """
+        for word, lemma in snapshot['lemmas'].items():
+            self.lemmas[word] = lemma
+        while len(self.lemmas) > self.max_lemmas:
+            self.lemmas.popitem(last=False)
+        for key, tokens in snapshot['documents'].items():
+            self.documents[key] = tokens
+            self.documents.move_to_end(key)
+        while len(self.documents) > self.max_documents:
+            self.documents.popitem(last=False)
+
+    def save(self, filepath):
+        """ Writes the lemmas and documents of the cache to a snapshot file, replacing the old one in a single step so
+            a crash never leaves half a snapshot behind
+
+            Args:
+                filepath (string): the snapshot file
+        """
+        if not filepath:
+            return
+        with open(f'{filepath}.tmp', 'w') as snapshot_file:
+            json.dump({'lemmas': self.lemmas, 'documents': self.documents}, snapshot_file)
+        os.replace(f'{filepath}.tmp', filepath)
+
+
+class RougeText:
+    """ A text tokenized once for every ROUGE variant: its tokens as integer ids, its unigram and bigram counts, and
+        (for reference texts) the positions of each token used to find the longest common subsequence
+    """
+    def __init__(self, text, token_cache):
+        """ Tokenizes and lemmatizes the text
+
+            Args:
+                text (string): the text to tokenize
+                token_cache (TokenCache): the lemmas and tokens of texts seen so far, shared by all texts so their ids
+                    can be compared
+        """
+        self.token_ids = token_cache.get_token_ids(text)
+        self.unigrams = Counter(self.token_ids)
+        self.bigrams = Counter(zip(self.token_ids, self.token_ids[1:]))
+        self.token_masks = None
+
+    def __len__(self):
+        return len(self.token_ids)
+
+    def get_token_masks(self):
+        """ Builds, once, a bit mask for every token with the bits of the positions it appears at
+
+            Returns:
+                dict: the positions bit mask by token id
+        """
+        if self.token_masks is None:
+            self.token_masks = {}
+            for position, token_id in enumerate(self.token_ids):
+                self.token_masks[token_id] = self.token_masks.get(token_id, 0) | 1 << position
+        return self.token_masks
+
+
+def get_ngram_overlap(algorithm_ngrams, reference_ngrams):
+    """ calculates the clipped ngram overlap between an algorithm generated article and the reference textbook
+        chapter, each ngram counts as many times as it appears in both
 
         Args:
-            algorithm_unigrams (list): the unigram list from an algorithm generated article
-            reference_unigrams (list): the uniram list from the reference textbook chapter
+            algorithm_ngrams (Counter): the ngram counts from an algorithm generated article
+            reference_ngrams (Counter): the ngram counts from the reference textbook chapter
 
         Returns:
-            int: the number of overlapping unigrams
+            int: the number of overlapping ngrams
     """
+    if len(algorithm_ngrams) > len(reference_ngrams):
+        algorithm_ngrams, reference_ngrams = reference_ngrams, algorithm_ngrams
     overlap = 0
-    for word in algorithm_unigrams:
-        if word in reference_unigrams:
-            overlap += 1
+    for ngram, count in algorithm_ngrams.items():
+        reference_count = reference_ngrams.get(ngram)
+        if reference_count:
+            overlap += min(count, reference_count)
     return overlap
 
 
-def calculate_rouge_metrics(article_text, reference_text):
-    """ Calculates ROUGE-1 based on the unigram overlap between the generated article and the reference text
+def get_longest_common_subsequence(algorithm_text, reference_text):
+    """ calculates the length of the longest common subsequence of tokens between an algorithm generated article and
+        the reference textbook chapter, with the bit-parallel algorithm of Allison and Dix that handles a whole row of
+        the dynamic programming table per token in one integer operation
 
         Args:
-            article_text (string): the article text generated by an algorithm run
-            reference_text (string): the text from the reference textbook chapter
+            algorithm_text (RougeText): the tokenized algorithm generated article
+            reference_text (RougeText): the tokenized reference textbook chapter
 
         Returns:
-            dict: the ROUGE precision, recall, and F1
+            int: the length of the longest common subsequence
     """
-    article_unigrams = clean_and_split(article_text)
-    reference_unigrams = clean_and_split(reference_text)
-    overlap = get_unigram_overlap(article_unigrams, reference_unigrams)
+    token_masks = reference_text.get_token_masks()
+    row = 0
+    for token_id in algorithm_text.token_ids:
+        matches = token_masks.get(token_id)
+        if matches:
+            matches |= row
+            row = matches & ((matches - ((row << 1) | 1)) ^ matches)
+    return bin(row).count('1')
+
 
-    rouge_precision = overlap / len(article_unigrams)
-    rouge_recall = overlap / len(reference_unigrams)
-    rouge_f1 = 2 * ((rouge_precision * rouge_recall) / (rouge_precision + rouge_recall))
+def get_f1_scores(overlap, algorithm_count, reference_count):
+    """ Calculates the precision, recall, and F1 of an overlap between an article and its reference
 
+        Args:
+            overlap (int): the number of overlapping units
+            algorithm_count (int): the number of units in the algorithm generated article
+            reference_count (int): the number of units in the reference textbook chapter
+
+        Returns:
+            dict: the precision, recall, and F1, each 0 when undefined
+    """
+    precision = overlap / algorithm_count if algorithm_count else 0.0
+    recall = overlap / reference_count if reference_count else 0.0
+    f1 = 2 * ((precision * recall) / (precision + recall)) if precision + recall else 0.0
     return {
-        'precision': rouge_precision,
-        'recall': rouge_recall,
-        'f1': rouge_f1
+        'precision': precision,
+        'recall': recall,
+        'f1': f1
     }
 
 
-def get_algorithm_rouge_score(articles, reference_chapters):
+def calculate_rouge_metrics(algorithm_text, reference_text):
+    """ Calculates ROUGE-1, ROUGE-2, and ROUGE-L between the generated article and the reference text
+
+        Args:
+            algorithm_text (RougeText): the tokenized article text generated by an algorithm run
+            reference_text (RougeText): the tokenized text from the reference textbook chapter
+
+        Returns:
+            dict: the ROUGE precision, recall, and F1 of each ROUGE variant
+    """
+    return {
+        'rouge_1': get_f1_scores(
+            get_ngram_overlap(algorithm_text.unigrams, reference_text.unigrams),
+            len(algorithm_text),
+            len(reference_text)
+        ),
+        'rouge_2': get_f1_scores(
+            get_ngram_overlap(algorithm_text.bigrams, reference_text.bigrams),
+            max(0, len(algorithm_text) - 1),
+            max(0, len(reference_text) - 1)
+        ),
+        'rouge_l': get_f1_scores(
+            get_longest_common_subsequence(algorithm_text, reference_text),
+            len(algorithm_text),
+            len(reference_text)
+        )
+    }
+
+
+def tokenize_reference_chapters(reference_chapters, token_cache):
+    """ Tokenizes every reference chapter once into a store keyed by chapter id, so the reference of an article is
+        found in constant time and reused for the articles of every algorithm run
+
+        Args:
+            reference_chapters (list): the reference texts to compare against with ROUGE
+            token_cache (TokenCache): the lemmas and tokens of texts seen so far, shared by all tokenized texts
+
+        Returns:
+            dict: the tokenized reference text by chapter id
+    """
+    return {chapter[ID]: RougeText(chapter[TEXT], token_cache) for chapter in reference_chapters}
+
+
+def get_algorithm_rouge_score(articles, reference_texts, token_cache):
     """ calculates the average ROUGE f1, precision, and recall along with standard deviation for each algorithm run
         compared against the reference text
 
         Args:
             articles (list): the article texts from all algorithm runs
-            reference_chapters (list): the reference texts to compare against with ROUGE
+            reference_texts (dict): the tokenized reference texts to compare against with ROUGE, by chapter id
+            token_cache (TokenCache): the lemmas and tokens of texts seen so far, shared by all tokenized texts
 
         Returns:
-            dict: the averages and std deviation for each ROUGE metric
+            dict: the averages and std deviation for each ROUGE variant and metric
     """
-    f1_scores = []
-    precision_scores = []
-    recall_scores = []
-
+    scores = {}
     for article in articles:
-        reference_chapter = {}
-        for chapter in reference_chapters:
-            if article[ID] == chapter[ID]:
-                reference_chapter = chapter
+        article_scores = calculate_rouge_metrics(RougeText(article[TEXT], token_cache), reference_texts[article[ID]])
+        for variant, metrics in article_scores.items():
+            for metric, score in metrics.items():
+                scores.setdefault(variant, {}).setdefault(metric, []).append(score)
 
-        scores = calculate_rouge_metrics(article[TEXT], reference_chapter[TEXT])
-        f1_scores.append(scores['f1'])
-        precision_scores.append(scores['precision'])
-        recall_scores.append(scores['recall'])
+    algorithm_results = {}
+    for variant, metrics in scores.items():
+        prefix = '' if variant == 'rouge_1' else f'{variant}_'
+        for metric in ['f1', 'precision', 'recall']:
+            algorithm_results[f'{prefix}average_{metric}'] = round(sum(metrics[metric]) / len(metrics[metric]),
+                                                                   DECIMAL_DIGITS)
+            algorithm_results[f'{prefix}{metric}_std_dev'] = round(sem(metrics[metric]), DECIMAL_DIGITS)
+    return algorithm_results
 
-    return {
-        'average_f1': round(sum(f1_scores) / len(f1_scores), decimal_digits),
-        'f1_std_dev': round(sem(f1_scores), decimal_digits),
-        'average_precision': round(sum(precision_scores) / len(precision_scores), decimal_digits),
-        'precision_std_dev': round(sem(precision_scores), decimal_digits),
-        'average_recall': round(sum(recall_scores) / len(recall_scores), decimal_digits),
-        'recall_std_dev': round(sem(recall_scores), decimal_digits)
+
+def initialize_rouge_worker(reference_texts, token_cache):
+    """ Keeps the reference store and token cache a scoring process was started with for every algorithm run it scores
+
+        Args:
+            reference_texts (dict): the tokenized reference texts to compare against with ROUGE, by chapter id
+            token_cache (TokenCache): the lemmas and tokens of texts seen so far, shared by all tokenized texts
+    """
+    global worker_reference_texts, worker_token_cache
+    worker_reference_texts = reference_texts
+    worker_token_cache = token_cache
+
+
+def score_algorithm_in_worker(article_filename, articles):
+    """ Scores the articles of one algorithm run in a scoring process
+
+        Args:
+            article_filename (string): the file the articles of the algorithm run were read from
+            articles (list): the articles of the algorithm run
+
+        Returns:
+            dict: the averages and std deviation for each ROUGE variant and metric of the algorithm run
+            dict: the lemmas and documents this run added to the process's token cache, to merge into the main one
+    """
+    known_lemmas = set(worker_token_cache.lemmas.keys())
+    known_documents = set(worker_token_cache.documents.keys())
+    algorithm_results = get_algorithm_rouge_score(articles, worker_reference_texts, worker_token_cache)
+    algorithm_results[FILE] = article_filename
+    return algorithm_results, {
+        'lemmas': {word: lemma for word, lemma in worker_token_cache.lemmas.items() if word not in known_lemmas},
+        'documents': {key: tokens for key, tokens in worker_token_cache.documents.items() if key not in known_documents}
     }
 
 
-def calculate_algorithm_rouge_1():
-    """ Orchestrates the calculation of ROUGE-1 statistics, and stores them to a json file """
+def score_algorithms_in_parallel(algorithm_articles, reference_texts, token_cache, worker_count):
+    """ Scores every algorithm run in a pool of processes, each started with a copy of the reference store and token
+        cache, and merges the lemmas and documents the processes tokenized back into the token cache
+
+        Args:
+            algorithm_articles (dict): the articles of every algorithm run, by the file they were read from
+            reference_texts (dict): the tokenized reference texts to compare against with ROUGE, by chapter id
+            token_cache (TokenCache): the lemmas and tokens of texts seen so far, shared by all tokenized texts
+            worker_count (int): the number of processes to score the algorithm runs with
+
+        Returns:
+            list: the ROUGE results of every algorithm run, in the order of algorithm_articles
+    """
+    rouge_results = []
+    with ProcessPoolExecutor(max_workers=worker_count, initializer=initialize_rouge_worker,
+                             initargs=(reference_texts, token_cache)) as executor:
+        article_filenames = list(algorithm_articles.keys())
+        scored_algorithms = executor.map(
+            score_algorithm_in_worker,
+            article_filenames,
+            [algorithm_articles[article_filename] for article_filename in article_filenames]
+        )
+        for algorithm_count, (algorithm_results, new_tokens) in enumerate(scored_algorithms, 1):
+            print(f'Calculated Rouge for algorithm {algorithm_count}')
+            token_cache.update(new_tokens)
+            rouge_results.append(algorithm_results)
+    return rouge_results
+
+
+def calculate_rouge(article_directory, question_directory, config):
+    """ Calculates the ROUGE-1, ROUGE-2, and ROUGE-L statistics of every algorithm run versus the TQA chapters the
+        articles were written for, and stores them to a json file in the checkpoint directory
+
+        Args:
+            article_directory (str): the filepath to a singular, or directory of, JSONL article files, each file holds
+                the articles of one algorithm run
+            question_directory (str): the filepath to the TQA json file the reference chapters are taken from
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            list: the ROUGE results of every algorithm run
+
+        Raises:
+            LookupError: if the NLTK data ROUGE needs is not installed
+    """
+    check_nltk_resources()
     print('Loading in articles for to evaluate with Rouge')
 
     all_articles = read_jsonl_articles(article_directory)
@@ -150,22 +507,31 @@ def calculate_algorithm_rouge_1():
             algorithm_articles[article[FILE]] = []
         algorithm_articles[article[FILE]].append(article)
 
-    reference_articles = load_tqa_articles(chapter_ids, config_for_tqa_load)
-
-    rouge_results = []
-    algorithm_count = 1
-    for article_filename in algorithm_articles.keys():
-        print(f'Calculating Rouge 1 for algorithm {algorithm_count}')
-        algorithm_results = get_algorithm_rouge_score(algorithm_articles[article_filename], reference_articles)
-        algorithm_results[FILE] = article_filename
-        rouge_results.append(algorithm_results)
-        algorithm_count += 1
-
-    json_file = open(f'{results_file}', 'w')
-    json.dump(rouge_results, json_file)
-    json_file.close()
-
-    print(f'Rouge 1 results stored to {results_file}')
-
-
-calculate_algorithm_rouge_1()
+    reference_articles = load_tqa_articles(chapter_ids, {**config, QUESTION_DIRECTORY: question_directory})
+    os.makedirs(config[CHECKPOINT_DIRECTORY], exist_ok=True)
+    token_cache = TokenCache()
+    token_cache.load(get_token_cache_filepath(config))
+    reference_texts = tokenize_reference_chapters(reference_articles, token_cache)
+
+    worker_count = max(1, min(get_rouge_worker_count(config), len(algorithm_articles)))
+    if worker_count > 1:
+        rouge_results = score_algorithms_in_parallel(algorithm_articles, reference_texts, token_cache, worker_count)
+    else:
+        rouge_results = []
+        algorithm_count = 1
+        for article_filename in algorithm_articles.keys():
+            print(f'Calculating Rouge for algorithm {algorithm_count}')
+            algorithm_results = get_algorithm_rouge_score(
+                algorithm_articles[article_filename],
+                reference_texts,
+                token_cache
+            )
+            algorithm_results[FILE] = article_filename
+            rouge_results.append(algorithm_results)
+            algorithm_count += 1
+
+    store_json(rouge_results, config[ROUGE_RESULTS_FILE], config)
+    token_cache.save(get_token_cache_filepath(config))
+
+    print(f'Rouge results stored to {config[CHECKPOINT_DIRECTORY]}/{config[ROUGE_RESULTS_FILE]}')
+    return rouge_results
@@ -0,0 +1,224 @@
+import json
+import os
+import sqlite3
+from arc_benchmark.constants import ARC_CHECKPOINT_FILE, CHECKPOINT_DATABASE_FILE, CHECKPOINT_DIRECTORY, CORRECT, \
+    INCORRECT, INDEX, INDIVIDUAL_RESULTS, QUESTION_SET, RESULTS, UNANSWERED
+from arc_benchmark.file_utils import append_checkpoint_line, create_or_load_arc_checkpoint
+from arc_benchmark.results_table import OUTCOME_CODES, OUTCOMES
+
+# the seconds to wait for another process writing to the checkpoint database
+LOCK_TIMEOUT = 300
+
+
+def use_checkpoint_database(config):
+    """ Whether ARC-Solver results should be checkpointed in a SQLite database rather than the JSONL checkpoint file
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            bool: True if a checkpoint database file is set in the config
+    """
+    return CHECKPOINT_DATABASE_FILE in config and bool(config[CHECKPOINT_DATABASE_FILE])
+
+
+def open_checkpoint_store(config):
+    """ Opens the configured checkpoint store, creating it if it does not exist yet
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            object: a SqliteCheckpointStore or JsonlCheckpointStore holding the runs completed so far
+    """
+    if use_checkpoint_database(config):
+        return SqliteCheckpointStore(config)
+    return JsonlCheckpointStore(config)
+
+
+def encode_individual_results(individual_results):
+    """ Packs the individual results of a run into one byte per question. The question ids are only kept when they
+        are not simply '0', '1', ... in order, which is how the ARC-Solver numbers them
+
+        Args:
+            individual_results (dict): the individual result by question id
+
+        Returns:
+            str: the question ids as a JSON list, None if they are numbered in order
+            bytes: the outcome code of each question, None if an outcome is not one of correct, incorrect or
+                unanswered and the individual results have to be stored as JSON
+    """
+    if any(outcome not in OUTCOME_CODES for outcome in individual_results.values()):
+        return None, None
+    question_ids = list(individual_results.keys())
+    if question_ids == [str(question_number) for question_number in range(len(question_ids))]:
+        encoded_ids = None
+    else:
+        encoded_ids = json.dumps(question_ids)
+    return encoded_ids, bytes(OUTCOME_CODES[outcome] for outcome in individual_results.values())
+
+
+def decode_individual_results(question_ids, outcomes):
+    """ Unpacks the individual results of a run, see encode_individual_results
+
+        Args:
+            question_ids (str): the question ids as a JSON list, None if they are numbered in order
+            outcomes (bytes): the outcome code of each question
+
+        Returns:
+            dict: the individual result by question id
+    """
+    question_ids = json.loads(question_ids) if question_ids is not None \
+        else [str(question_number) for question_number in range(len(outcomes))]
+    return {question_id: OUTCOMES[outcome] for question_id, outcome in zip(question_ids, outcomes)}
+
+
+class JsonlCheckpointStore:
+    """ Checkpoints kept as one JSON line per completed run, all of which are loaded into memory when it is opened.
+        Lines are appended under a file lock and synced to disk, so several EXAM processes can share the file
+    """
+    def __init__(self, config):
+        """ Opens the JSONL checkpoint file and loads the completed runs
+
+            Args:
+                config (dict): config file specified properties to use in running the benchmark
+        """
+        self.checkpoint_file, self.completed_entries = create_or_load_arc_checkpoint(config)
+
+    def __contains__(self, key):
+        return key in self.completed_entries
+
+    def __getitem__(self, key):
+        return self.completed_entries[key]
+
+    def write(self, results_entry):
+        """ Records a completed run
+
+            Args:
+                results_entry (dict): the results entry of the run
+        """
+        append_checkpoint_line(self.checkpoint_file, json.dumps(results_entry))
+        self.completed_entries[(results_entry[INDEX], results_entry[QUESTION_SET])] = results_entry
+
+    def close(self):
+        self.checkpoint_file.close()
+
+
+class SqliteCheckpointStore:
+    """ Checkpoints kept in a SQLite database keyed by (index, question set), so resuming a run only looks up the runs
+        it needs instead of loading every checkpoint into memory. Every run is committed, and synced to disk, on its
+        own, so an interrupted run never leaves a partial checkpoint behind. Several EXAM processes on one machine can
+        share the database, SQLite waits for the lock of another writer rather than failing. The database relies on
+        the file locks of the local filesystem, processes on different machines sharing a checkpoint directory over a
+        network filesystem should use the JsonlCheckpointStore instead
+    """
+    def __init__(self, config):
+        """ Opens, or creates, the checkpoint database. A new database first imports the runs of an existing JSONL
+            checkpoint file, so runs started before the database was enabled are not lost
+
+            Args:
+                config (dict): config file specified properties to use in running the benchmark
+        """
+        os.makedirs(config[CHECKPOINT_DIRECTORY], exist_ok=True)
+        self.connection = sqlite3.connect(
+            f'{config[CHECKPOINT_DIRECTORY]}/{config[CHECKPOINT_DATABASE_FILE]}',
+            timeout=LOCK_TIMEOUT
+        )
+        # a rollback journal rather than WAL, which needs memory shared by every process using the database, and a wait
+        # of up to LOCK_TIMEOUT for another writer's lock
+        self.connection.execute('PRAGMA journal_mode=DELETE')
+        self.connection.execute(f'PRAGMA busy_timeout={LOCK_TIMEOUT * 1000}')
+        self.connection.execute('PRAGMA synchronous=FULL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS checkpoints ('
+            'index_name TEXT NOT NULL, '
+            'question_set TEXT NOT NULL, '
+            'correct INTEGER NOT NULL, '
+            'incorrect INTEGER NOT NULL, '
+            'unanswered INTEGER NOT NULL, '
+            'question_ids TEXT, '
+            'outcomes BLOB, '
+            'individual_results TEXT, '
+            'PRIMARY KEY (index_name, question_set)'
+            ') WITHOUT ROWID'
+        )
+        self.connection.commit()
+        if ARC_CHECKPOINT_FILE in config \
+                and os.path.isfile(f'{config[CHECKPOINT_DIRECTORY]}/{config[ARC_CHECKPOINT_FILE]}') \
+                and self.connection.execute('SELECT 1 FROM checkpoints LIMIT 1').fetchone() is None:
+            self.import_jsonl(f'{config[CHECKPOINT_DIRECTORY]}/{config[ARC_CHECKPOINT_FILE]}')
+
+    def import_jsonl(self, filepath):
+        """ Copies every run of a JSONL checkpoint file into the database, one line at a time, skipping lines left
+            unfinished by a crash
+
+            Args:
+                filepath (str): the path to the JSONL checkpoint file
+        """
+        with open(filepath) as checkpoint_file:
+            with self.connection:
+                for line in checkpoint_file:
+                    if not line.strip():
+                        continue
+                    try:
+                        self.insert(json.loads(line))
+                    except ValueError:
+                        continue
+
+    def __contains__(self, key):
+        return self.connection.execute(
+            'SELECT 1 FROM checkpoints WHERE index_name = ? AND question_set = ?',
+            key
+        ).fetchone() is not None
+
+    def __getitem__(self, key):
+        row = self.connection.execute(
+            'SELECT correct, incorrect, unanswered, question_ids, outcomes, individual_results FROM checkpoints '
+            'WHERE index_name = ? AND question_set = ?',
+            key
+        ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        correct, incorrect, unanswered, question_ids, outcomes, individual_results = row
+        return {
+            INDEX: key[0],
+            QUESTION_SET: key[1],
+            RESULTS: {CORRECT: correct, INCORRECT: incorrect, UNANSWERED: unanswered},
+            INDIVIDUAL_RESULTS: json.loads(individual_results) if outcomes is None
+            else decode_individual_results(question_ids, outcomes)
+        }
+
+    def insert(self, results_entry):
+        """ Inserts or replaces the checkpoint of a run without committing it
+
+            Args:
+                results_entry (dict): the results entry of the run
+        """
+        question_ids, outcomes = encode_individual_results(results_entry[INDIVIDUAL_RESULTS])
+        self.connection.execute(
+            'INSERT OR REPLACE INTO checkpoints '
+            '(index_name, question_set, correct, incorrect, unanswered, question_ids, outcomes, individual_results) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (
+                results_entry[INDEX],
+                results_entry[QUESTION_SET],
+                results_entry[RESULTS][CORRECT],
+                results_entry[RESULTS][INCORRECT],
+                results_entry[RESULTS][UNANSWERED],
+                question_ids,
+                outcomes,
+                json.dumps(results_entry[INDIVIDUAL_RESULTS]) if outcomes is None else None
+            )
+        )
+
+    def write(self, results_entry):
+        """ Records a completed run, committing it right away
+
+            Args:
+                results_entry (dict): the results entry of the run
+        """
+        with self.connection:
+            self.insert(results_entry)
+
+    def close(self):
+        self.connection.close()
@@ -1,5 +1,4 @@
 # Contains strings used repeatedly, storing in this file for consistency
-ADDENDUM_RESULTS = 'Addendum Results:'
 ADJUNCT_TOPICS = 'adjunctTopics'
 ANSWER_CHOICES = 'answerChoices'
 ANSWER_KEY = 'answerKey'
@@ -10,6 +9,7 @@ ARC_RESULTS_FILE = 'arc_results_file'
 ARC_SOLVER_DIRECTORY = 'arc_solver_directory'
 ARTICLE_COUNT = 'article_count'
 ARTICLE_DIRECTORY = 'article_directory'
+ATTEMPTS = 'attempts'
 AVERAGE_CORRECT = 'average_correct'
 AVERAGE_INCORRECT = 'average_incorrect'
 AVERAGE_PERCENT_CORRECT = 'average_percent_correct'
@@ -17,19 +17,28 @@ AVERAGE_PERCENT_INCORRECT = 'average_percent_incorrect'
 AVERAGE_INFORMATIVENESS = 'average_informativeness'
 AVERAGE_PERCENT_UNANSWERED = 'average_percent_unanswered'
 AVERAGE_UNANSWERED = 'average_unanswered'
+BATCH_INDEX_MARKER = 'EXAM Index: '
+BATCH_INDICES = 'batch_indices'
 BEING_ASKED = 'beingAsked'
 BENCHMARK_SET_DIRECTORY = 'benchmark_set_directory'
+CHECKPOINT_DATABASE_FILE = 'checkpoint_database_file'
 CHECKPOINT_DIRECTORY = 'checkpoint_directory'
 CHOICES = 'choices'
+COMMAND = 'command'
 CONDA_ENVIRONMENT_NAME = 'conda_environment_name'
 CONFIG_FILE = 'config_file'
 CONTENT = 'content'
 CORRECT = 'correct'
 CORRECT_ANSWER = 'correctAnswer'
 CORRECT_STANDARD_DEVIATION = 'correct_std_dev'
+DEAD_LETTER_FILE = 'dead_letter_file'
 DECIMAL_DIGITS = 4
 DIAGRAM_ANNOTATIONS = 'diagramAnnotations'
 DISAGREEMENT = 'disagreement'
+DOC_ID = 'docId'
+ENTAILMENT_CACHE_FILE = 'entailment_cache_file'
+ERROR = 'error'
+FAILURE = 'failure'
 FILE = 'file'
 FINAL_RESULTS_FILE = 'final_results_file'
 GLOBAL_ID = 'globalID'
@@ -38,19 +47,30 @@ ID = 'id'
 INCORRECT = 'incorrect'
 INCORRECT_STANDARD_DEVIATION = 'incorrect_std_dev'
 INDEX = 'index'
+INDEX_CHUNK_SIZE = 'index_chunk_size'
 INDEX_COUNT = 'index_count'
+INDEX_MANIFEST_FILE = 'index_manifest_file'
+INDEX_THREAD_COUNT = 'index_thread_count'
+INDICES = 'indices'
 INDIVIDUAL_RESULTS = 'individual_results'
 INDIVIDUAL_QUESTION_METRICS_FILE = 'individual_question_metrics_file'
 INFORMATIVENESS_STANDARD_ERROR = 'informativeness_standard_error'
+INPUT_FILE = 'input_file'
 INSTRUCTIONAL_DIAGRAMS = 'instructionalDiagrams'
+JOB_TIMEOUT = 'job_timeout'
 LABEL = 'label'
 LESSON_NAME = 'lessonName'
 MAPPING = 'mapping'
 MAX_QUESTION_DISAGREEMENT = 'max_question_disagreement'
-METRICS = 'Metrics'
+MAX_RETRY_DELAY = 'max_retry_delay'
+MERGE = 'merge'
+MESSAGE = 'message'
 NON_DIAGRAM_QUESTIONS = 'nonDiagramQuestions'
+OUTPUT = 'output'
+OUTPUTS = 'outputs'
 PARA_BODY = 'para_body'
 PARAGRAPHS = 'paragraphs'
+PARSE_WORKER_COUNT = 'parse_worker_count'
 PERCENT_CORRECT = 'percent_correct'
 PERCENT_INCORRECT = 'percent_incorrect'
 PERCENT_UNANSWERED = 'percent_unanswered'
@@ -60,13 +80,29 @@ QUESTION = 'question'
 QUESTION_COUNT = 'question_count'
 QUESTION_DIRECTORY = 'question_directory'
 QUESTION_ID = 'question_id'
+QUESTION_INDEX_DIRECTORY = 'question_index_directory'
 QUESTION_SET = 'question_set'
 QUESTION_SET_METRICS_FILE = 'question_set_metrics_file'
 QUESTIONS = 'questions'
 RANDOM_ANSWERING = 'random_answering'
+READY = 'ready'
+RESULT_MARKER = 'EXAM Result: '
 RESULTS = 'results'
+RETRIEVAL_BATCH_SIZE = 'retrieval_batch_size'
+RETRIEVAL_CACHE_FILE = 'retrieval_cache_file'
+RETRIEVAL_CONCURRENCY = 'retrieval_concurrency'
+RETRY_COUNT = 'retry_count'
+RETRY_DELAY = 'retry_delay'
+ROUGE = 'rouge'
+ROUGE_RESULTS_FILE = 'rouge_results_file'
+ROUGE_TOKEN_CACHE_FILE = 'rouge_token_cache_file'
+ROUGE_WORKER_COUNT = 'rouge_worker_count'
+RUN = 'run'
+SHARD = 'shard'
+SHARED_INDEX = 'shared_index'
 SQUID = 'squid'
 STEM = 'stem'
+TAGS = 'tags'
 TEXT = 'text'
 TITLE = 'title'
 TOPICS = 'topics'
@@ -78,6 +114,8 @@ TOTAL_UNANSWERED = 'total_unanswered'
 TQA = 'tqa'
 UNANSWERED = 'unanswered'
 UNANSWERD_STANDARD_DEVIATION = 'unanswered_std_dev'
+USE_SOLVER_SERVER = 'use_solver_server'
+WORKER_COUNT = 'worker_count'
 ARC_CORPUS_INDEX = 'arc_corpus_index'
 
 # Elasticsearch mapping values
@@ -87,6 +125,21 @@ ELASTICSEARCH_INDEX = '_index'
 ELASTICSEARCH_TYPE = '_type'
 ELASTICSEARCH_OP_TYPE = '_op_type'
 ELASTICSEARCH_SOURCE = '_source'
+ELASTICSEARCH_REFRESH_INTERVAL = 'refresh_interval'
+ELASTICSEARCH_ROUTING = '_routing'
+ELASTICSEARCH_SETTINGS = 'settings'
+ELASTICSEARCH_AFTER_KEY = 'after_key'
+ELASTICSEARCH_AGGREGATIONS = 'aggregations'
+ELASTICSEARCH_BUCKETS = 'buckets'
+ELASTICSEARCH_KEY = 'key'
+SHARED_INDEX_SEPARATOR = '/'
+
+# Kinds of failed ARC-Solver runs
+BAD_INPUT = 'bad_input'
+ELASTICSEARCH_OVERLOAD = 'elasticsearch_overload'
+OUT_OF_MEMORY = 'out_of_memory'
+TIMEOUT = 'timeout'
+UNKNOWN_FAILURE = 'unknown'
 
 # Files and Directories
 ARC_DATA_FULL_WIPE_KEEP_FILES = [
@@ -109,7 +162,15 @@ ARC_CHALLENGE_TEST = 'ARC-Challenge-Test.jsonl'
 BENCHMARK_CONFIG_YAML = 'benchmarkConfig.yaml'
 ENV_DIRECTORY = '/env'
 EVALUATE_SOLVER_FILEPATH = 'scripts/evaluate_solver.sh'
+EXAM_SOLVER_FILEPATH = 'arc_solvers/processing/exam_solver.py'
 HTMLCOV_DIRECTORY = '/htmlcov'
 JSON_EXTENSION = '.json'
 JSONL_EXTENSION = '.jsonl'
+QUESTION_ANSWER_COUNTS_FILE = 'question_answer_counts.json'
+QUESTION_FILE_INDEX_EXTENSION = '.index.sqlite'
+SHARD_DIRECTORY_FORMAT = 'shard-{}-of-{}'
+SHARD_DIRECTORY_PATTERN = r'shard-(\d+)-of-(\d+)'
+SOLVER_LOG_FILE = 'arc_solver.log'
+SOLVER_SERVER_LOG_FILE = 'arc_solver_server.log'
 TESTS_DIRECTORY = '/tests'
+WORKER_DIRECTORY_SUFFIX = '-worker-'
@@ -1,10 +1,39 @@
 import json
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from arc_benchmark.constants import ADJUNCT_TOPICS, ANSWER_CHOICES, ANSWER_KEY, ARC_CHECKPOINT_FILE, BEING_ASKED, \
     CHECKPOINT_DIRECTORY, CHOICES, CONTENT, CORRECT_ANSWER, DIAGRAM_ANNOTATIONS, FILE, GLOBAL_ID, ID, INDEX, \
     INSTRUCTIONAL_DIAGRAMS, JSONL_EXTENSION, JSON_EXTENSION, LABEL, LESSON_NAME, NON_DIAGRAM_QUESTIONS, PARA_BODY, \
-    PARAGRAPHS, PROCESSED_TEXT, QUESTION, QUESTION_DIRECTORY, QUESTION_SET, QUESTIONS, SQUID, STEM, TEXT, TITLE, \
-    TOPICS, TQA
+    PARAGRAPHS, PARSE_WORKER_COUNT, PROCESSED_TEXT, QUESTION, QUESTION_DIRECTORY, QUESTION_SET, QUESTIONS, SQUID, \
+    STEM, TEXT, TITLE, TOPICS, TQA
+from arc_benchmark.question_index import get_question_index_directory, load_lessons
+
+# orjson is an optional, much faster, JSON decoder for parsing large article files
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# fcntl is only available on Unix, elsewhere checkpoint files are appended to without locking
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+def decode_json_line(line):
+    """ Decodes a line of JSON, with orjson when it is installed
+
+        Args:
+            line (str): the JSON formatted line
+
+        Returns:
+            object: the decoded python object
+    """
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
 
 
 def process_article_line(article_line, filename):
@@ -19,11 +48,10 @@ def process_article_line(article_line, filename):
         Returns:
             dict: the title, text, and question set id of an article from the JSONL article file
     """
-    article_object = json.loads(article_line)
-    article_text = ''
-    for paragraph in article_object[PARAGRAPHS]:
-        for text_piece in paragraph[PARA_BODY]:
-            article_text += text_piece[TEXT]
+    article_object = decode_json_line(article_line)
+    article_text = ''.join(
+        text_piece[TEXT] for paragraph in article_object[PARAGRAPHS] for text_piece in paragraph[PARA_BODY]
+    )
     return {
         TITLE: f'{filename}-{article_object[TITLE].lower()}',
         TEXT: article_text,
@@ -32,51 +60,111 @@ def process_article_line(article_line, filename):
     }
 
 
-def process_article(filepath):
-    """ Opens a JSONL article file and returns all articles from it
+def iterate_article_file(filepath):
+    """ Opens a JSONL article file and yields its articles one line at a time, so only a single article is held in
+        memory at once
 
         Args:
             filepath (str): the path to the file
 
         Returns:
-            list: a list of formattted article dicts gotten from the JSONL article file
+            generator: the formatted article dicts of the JSONL article file, in file order
     """
-    articles = []
     # appends the JSONL extension if it does not exist in the path to the file
     filename = filepath if JSONL_EXTENSION in filepath else f'{filepath}{JSONL_EXTENSION}'
+    article_filename = filename.split(JSONL_EXTENSION)[0].split('/')[-1].lower()
     with open(filename) as article_file:
-        article_line = article_file.readline()
-        while article_line:
-            articles.append(
-                process_article_line(article_line, filename.split(JSONL_EXTENSION)[0].split('/')[-1].lower())
-            )
-            article_line = article_file.readline()
-    return articles
+        for article_line in article_file:
+            if article_line.strip():
+                yield process_article_line(article_line, article_filename)
 
 
-def read_jsonl_articles(filepath):
-    """ Opens the file(s) at a given filepath, extracts the articles, and returns them
+def process_article(filepath):
+    """ Opens a JSONL article file and returns all articles from it
+
+        Args:
+            filepath (str): the path to the file
+
+        Returns:
+            list: a list of formattted article dicts gotten from the JSONL article file
+    """
+    return list(iterate_article_file(filepath))
+
+
+def get_parse_worker_count(config):
+    """ Returns the number of processes article files should be parsed with, defaulting to parsing in this process
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            int: the number of article parsing processes
+    """
+    if PARSE_WORKER_COUNT not in config or not config[PARSE_WORKER_COUNT]:
+        return 1
+    return max(1, int(config[PARSE_WORKER_COUNT]))
+
+
+def parse_article_files_in_parallel(filepaths, parse_worker_count):
+    """ Parses JSONL article files in a pool of processes, yielding the articles in the order of the files. Only a
+        couple of files per process are parsed ahead of the consumer so memory stays bounded
+
+        Args:
+            filepaths (list): the paths to the JSONL article files
+            parse_worker_count (int): the number of processes to parse the files with
+
+        Returns:
+            generator: the articles of every file, in file order
+    """
+    with ProcessPoolExecutor(max_workers=parse_worker_count) as executor:
+        pending_files = deque()
+        for filepath in filepaths:
+            pending_files.append(executor.submit(process_article, filepath))
+            if len(pending_files) >= 2 * parse_worker_count:
+                yield from pending_files.popleft().result()
+        while pending_files:
+            yield from pending_files.popleft().result()
+
+
+def iterate_jsonl_articles(filepath, parse_worker_count=1):
+    """ Opens the file(s) at a given filepath and yields their articles file by file, without ever loading every
+        article into memory
 
         Args:
             filepath (str): a path to a singular file, or directory of, JSONL article files
+            parse_worker_count (int): optional, the number of processes to parse the files of a directory with
 
         Returns:
-            list: all articles at the filepath
+            generator: all articles at the filepath, files of a directory are read in sorted order
     """
-    all_articles = []
     try:
-        # try to open filepath as a singular file
-        all_articles = process_article(filepath)
+        # try to open filepath as a singular file, the file is opened before the first article is yielded
+        yield from iterate_article_file(filepath)
     except (IsADirectoryError, FileNotFoundError):
         # if it errors, try to open it as a directory containing JSONL files
-        for filename in sorted(os.listdir(filepath)):
-            if JSONL_EXTENSION in filename:
-                all_articles += process_article(f'{filepath}/{filename}')
+        filepaths = [
+            f'{filepath}/{filename}' for filename in sorted(os.listdir(filepath)) if JSONL_EXTENSION in filename
+        ]
+        if parse_worker_count > 1 and len(filepaths) > 1:
+            yield from parse_article_files_in_parallel(filepaths, parse_worker_count)
+        else:
+            for article_filepath in filepaths:
+                yield from iterate_article_file(article_filepath)
+
+
+def read_jsonl_articles(filepath):
+    """ Opens the file(s) at a given filepath, extracts the articles, and returns them
 
-    return all_articles
+        Args:
+            filepath (str): a path to a singular file, or directory of, JSONL article files
+
+        Returns:
+            list: all articles at the filepath
+    """
+    return list(iterate_jsonl_articles(filepath))
 
 
-def retrieve_questions(filepath, question_set_ids):
+def retrieve_questions(filepath, question_set_ids, index_directory=None):
     """ Retrieves questions grouped by an ID to be used in benchmarking sets of articles. This extraction was designed
         for questions from the TQA dataset.
 
@@ -84,17 +172,31 @@ def retrieve_questions(filepath, question_set_ids):
             filepath (str): the path to the question file
             question_set_ids (keysview): a list of ids that correspond to sets of questions that should be saved,
                 all other sets of questions should be ignored as they won't be used in the benchmark
+            index_directory (str): optional, the directory to keep an index of the question file in, so only the
+                selected sets of questions are read rather than the whole file
 
         Returns:
             dict: groups of questions to be stored for later benchmarking
             dict: the count of questions by the number of possible answers
     """
-    question_answer_count = {}
-    question_count = 0
     filename = filepath if JSON_EXTENSION in filepath else f'{filepath}{JSON_EXTENSION}'
-    with open(filename) as question_file:
-        question_sets = json.load(question_file)
+    return digest_questions(load_lessons(filename, question_set_ids, index_directory), question_set_ids)
+
+
+def digest_questions(question_sets, question_set_ids):
+    """ Converts the non-diagram questions of TQA lessons into the question format used by the ARC-Solver
+
+        Args:
+            question_sets (list): the TQA lessons, each holding a set of questions
+            question_set_ids (keysview): a list of ids that correspond to sets of questions that should be saved,
+                all other sets of questions should be ignored as they won't be used in the benchmark
 
+        Returns:
+            dict: groups of questions to be stored for later benchmarking
+            dict: the count of questions by the number of possible answers
+    """
+    question_answer_count = {}
+    question_count = 0
     parsed_questions = {}
     for question_set in question_sets:
         temp_question_count = 0
@@ -156,13 +258,14 @@ def add_question_counts(total_counts, new_counts):
     return total_counts
 
 
-def read_json_questions(filepath, question_set_ids):
+def read_json_questions(filepath, question_set_ids, index_directory=None):
     """ Opens the file(s) at a given filepath, extracts the questions, and returns them
 
         Args:
             filepath (str): a path to a singular, or directory of, JSON question files
             question_set_ids (keysview): a list of ids that correspond to sets of questions that should be saved,
                 all other sets of questions should be ignored as they won't be used in the benchmark
+            index_directory (str): optional, the directory to keep an index of each question file in
 
         Returns:
             dict: all sets of grouped questions
@@ -170,14 +273,15 @@ def read_json_questions(filepath, question_set_ids):
     """
     all_questions = {}
     try:
-        all_questions, total_question_answer_counts = retrieve_questions(filepath, question_set_ids)
+        all_questions, total_question_answer_counts = retrieve_questions(filepath, question_set_ids, index_directory)
     except (IsADirectoryError, FileNotFoundError):
         total_question_answer_counts = {}
         for filename in sorted(os.listdir(filepath)):
             if JSON_EXTENSION in filename:
                 new_questions, new_question_answer_counts = retrieve_questions(
                     f'{filepath}/{filename}',
-                    question_set_ids
+                    question_set_ids,
+                    index_directory
                 )
                 all_questions = {
                     **all_questions,
@@ -192,7 +296,9 @@ def read_json_questions(filepath, question_set_ids):
 
 
 def create_or_load_arc_checkpoint(config):
-    """ Loads in the JSONL checkpoint file if it exists or creates it if it doesn't
+    """ Loads in the JSONL checkpoint file if it exists or creates it if it doesn't. The file is always opened for
+        appending, so runs written by other EXAM processes are never overwritten, and lines left unfinished by a
+        crash are skipped
 
         Args:
             config (dict): config file specified properties to use in running the benchmark
@@ -202,23 +308,49 @@ def create_or_load_arc_checkpoint(config):
             object: an object containing any entries loaded from a checkpoint file
     """
     if not os.path.isdir(config[CHECKPOINT_DIRECTORY]):
-        os.mkdir(config[CHECKPOINT_DIRECTORY])
-
-    if not os.path.isfile(f'{config[CHECKPOINT_DIRECTORY]}/{config[ARC_CHECKPOINT_FILE]}'):
-        checkpoint_file = open(f'{config[CHECKPOINT_DIRECTORY]}/{config[ARC_CHECKPOINT_FILE]}', 'w+')
-        completed_entries = {}
-    else:
-        checkpoint_read = open(f'{config[CHECKPOINT_DIRECTORY]}/{config[ARC_CHECKPOINT_FILE]}', 'r')
-        completed_entries = {}
-        for line in checkpoint_read.readlines():
-            json_line = json.loads(line)
-            completed_entries[(json_line[INDEX], json_line[QUESTION_SET])] = json_line
-        checkpoint_read.close()
-        checkpoint_file = open(f'{config[CHECKPOINT_DIRECTORY]}/{config[ARC_CHECKPOINT_FILE]}', 'a+')
+        os.makedirs(config[CHECKPOINT_DIRECTORY], exist_ok=True)
+
+    completed_entries = {}
+    if os.path.isfile(f'{config[CHECKPOINT_DIRECTORY]}/{config[ARC_CHECKPOINT_FILE]}'):
+        with open(f'{config[CHECKPOINT_DIRECTORY]}/{config[ARC_CHECKPOINT_FILE]}', 'r') as checkpoint_read:
+            for line in checkpoint_read:
+                if not line.strip():
+                    continue
+                try:
+                    json_line = json.loads(line)
+                except ValueError:
+                    # a line left unfinished by a process that crashed while writing it
+                    continue
+                completed_entries[(json_line[INDEX], json_line[QUESTION_SET])] = json_line
+    checkpoint_file = open(f'{config[CHECKPOINT_DIRECTORY]}/{config[ARC_CHECKPOINT_FILE]}', 'a+')
 
     return checkpoint_file, completed_entries
 
 
+def append_checkpoint_line(checkpoint_file, line):
+    """ Appends a line to a checkpoint file shared with other processes. The file is locked while the line is written
+        and the line is synced to disk before the lock is released, so a line is either fully recorded or not at all.
+        A line torn by an earlier crash is ended first, so the new line is not glued to it
+
+        Args:
+            checkpoint_file (file): the checkpoint file, opened for appending
+            line (str): the line to append, without its line break
+    """
+    file_descriptor = checkpoint_file.fileno()
+    if fcntl is not None:
+        fcntl.flock(file_descriptor, fcntl.LOCK_EX)
+    try:
+        file_size = os.fstat(file_descriptor).st_size
+        if file_size > 0 and os.pread(file_descriptor, 1, file_size - 1) != b'\n':
+            line = f'\n{line}'
+        checkpoint_file.write(f'{line}\n')
+        checkpoint_file.flush()
+        os.fsync(file_descriptor)
+    finally:
+        if fcntl is not None:
+            fcntl.flock(file_descriptor, fcntl.LOCK_UN)
+
+
 def load_json(filename, config):
     """ Imports a json formatted file, it will return None if the file does not exist
 
@@ -263,33 +395,42 @@ def load_tqa_articles(question_set_indices, config):
         Returns:
             list: the loaded TQA articles to be later stored into Elasticsearch
     """
-    articles = []
-    tqa_file = open(config[QUESTION_DIRECTORY], 'r')
-    tqa_dataset = json.load(tqa_file)
-    tqa_file.close()
-
-    for question_set in tqa_dataset:
-        if question_set[GLOBAL_ID] in question_set_indices:
-            tqa_text = ''
-
-            for topic in question_set[TOPICS].keys():
-                tqa_text += question_set[TOPICS][topic][CONTENT][TEXT]
-            for topic in question_set[ADJUNCT_TOPICS].keys():
-                if CONTENT in question_set[ADJUNCT_TOPICS][topic] \
-                        and TEXT in question_set[ADJUNCT_TOPICS][topic][CONTENT]:
-                    tqa_text += question_set[ADJUNCT_TOPICS][topic][CONTENT][TEXT]
-            for diagram in question_set[DIAGRAM_ANNOTATIONS].keys():
-                for annotation in question_set[DIAGRAM_ANNOTATIONS][diagram]:
-                    if TEXT in annotation:
-                        tqa_text += f' {annotation[TEXT]}.'
-            for diagram in question_set[INSTRUCTIONAL_DIAGRAMS].keys():
-                if PROCESSED_TEXT in question_set[INSTRUCTIONAL_DIAGRAMS][diagram]:
-                    tqa_text += question_set[INSTRUCTIONAL_DIAGRAMS][diagram][PROCESSED_TEXT]
-
-            articles.append({
-                TITLE: f'{TQA}-{question_set[LESSON_NAME].lower()}',
-                TEXT: tqa_text,
-                ID: question_set[GLOBAL_ID],
-                FILE: config[QUESTION_DIRECTORY].split('/')[-1]
-            })
-    return articles
+    tqa_dataset = load_lessons(config[QUESTION_DIRECTORY], question_set_indices, get_question_index_directory(config))
+    return [
+        make_tqa_article(question_set, config[QUESTION_DIRECTORY].split('/')[-1])
+        for question_set in tqa_dataset
+        if question_set[GLOBAL_ID] in question_set_indices
+    ]
+
+
+def make_tqa_article(question_set, filename):
+    """ Builds the reference article of a TQA lesson from the text of its topics and diagrams
+
+        Args:
+            question_set (dict): the TQA lesson
+            filename (str): the name of the TQA file the lesson was loaded from
+
+        Returns:
+            dict: the TQA article to be later stored into Elasticsearch
+    """
+    tqa_text = ''
+    for topic in question_set[TOPICS].keys():
+        tqa_text += question_set[TOPICS][topic][CONTENT][TEXT]
+    for topic in question_set[ADJUNCT_TOPICS].keys():
+        if CONTENT in question_set[ADJUNCT_TOPICS][topic] \
+                and TEXT in question_set[ADJUNCT_TOPICS][topic][CONTENT]:
+            tqa_text += question_set[ADJUNCT_TOPICS][topic][CONTENT][TEXT]
+    for diagram in question_set[DIAGRAM_ANNOTATIONS].keys():
+        for annotation in question_set[DIAGRAM_ANNOTATIONS][diagram]:
+            if TEXT in annotation:
+                tqa_text += f' {annotation[TEXT]}.'
+    for diagram in question_set[INSTRUCTIONAL_DIAGRAMS].keys():
+        if PROCESSED_TEXT in question_set[INSTRUCTIONAL_DIAGRAMS][diagram]:
+            tqa_text += question_set[INSTRUCTIONAL_DIAGRAMS][diagram][PROCESSED_TEXT]
+
+    return {
+        TITLE: f'{TQA}-{question_set[LESSON_NAME].lower()}',
+        TEXT: tqa_text,
+        ID: question_set[GLOBAL_ID],
+        FILE: filename
+    }
@@ -0,0 +1,166 @@
+import json
+import os
+import sqlite3
+from arc_benchmark.constants import ADJUNCT_TOPICS, DIAGRAM_ANNOTATIONS, GLOBAL_ID, INSTRUCTIONAL_DIAGRAMS, \
+    LESSON_NAME, NON_DIAGRAM_QUESTIONS, QUESTION_FILE_INDEX_EXTENSION, QUESTION_INDEX_DIRECTORY, QUESTIONS, TOPICS
+
+# the parts of a TQA lesson used when building question sets and TQA articles, everything else (the diagram questions
+# in particular) is left out of the index
+INDEXED_LESSON_FIELDS = [GLOBAL_ID, LESSON_NAME, TOPICS, ADJUNCT_TOPICS, DIAGRAM_ANNOTATIONS, INSTRUCTIONAL_DIAGRAMS]
+# the number of lessons looked up with a single query, SQLite limits the number of parameters of a statement
+LOOKUP_BATCH_SIZE = 500
+
+
+def get_question_index_directory(config):
+    """ Gets the directory indexed copies of the TQA question files are kept in
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            str: the index directory, None if question files should be parsed in full every time
+    """
+    if QUESTION_INDEX_DIRECTORY in config and config[QUESTION_INDEX_DIRECTORY]:
+        return config[QUESTION_INDEX_DIRECTORY]
+    return None
+
+
+def get_question_file_index_path(filename, index_directory):
+    """ Gets where the index of a question file is stored
+
+        Args:
+            filename (str): the path to the JSON question file
+            index_directory (str): the directory indexed question files are kept in
+
+        Returns:
+            str: the path to the SQLite index of the question file
+    """
+    return f'{index_directory}/{os.path.basename(filename)}{QUESTION_FILE_INDEX_EXTENSION}'
+
+
+def get_source_signature(filename):
+    """ Identifies the current version of a question file, so an index built from an older version is never used
+
+        Args:
+            filename (str): the path to the JSON question file
+
+        Returns:
+            str: the absolute path, size and modification time of the file
+    """
+    file_stat = os.stat(filename)
+    return json.dumps([os.path.abspath(filename), file_stat.st_size, file_stat.st_mtime_ns])
+
+
+def compact_lesson(lesson):
+    """ Keeps only the parts of a TQA lesson the benchmark reads
+
+        Args:
+            lesson (dict): a lesson, with its questions, from a TQA question file
+
+        Returns:
+            dict: the lesson without its diagram questions or any other unused fields
+    """
+    compacted_lesson = {field: lesson[field] for field in INDEXED_LESSON_FIELDS if field in lesson}
+    if QUESTIONS in lesson:
+        compacted_lesson[QUESTIONS] = {NON_DIAGRAM_QUESTIONS: lesson[QUESTIONS][NON_DIAGRAM_QUESTIONS]}
+    return compacted_lesson
+
+
+def is_index_current(index_path, signature):
+    """ Whether an index exists and was built from the current version of its question file
+
+        Args:
+            index_path (str): the path to the SQLite index
+            signature (str): the signature of the current version of the question file
+
+        Returns:
+            bool: True if the index can be used as is
+    """
+    if not os.path.isfile(index_path):
+        return False
+    connection = sqlite3.connect(index_path)
+    try:
+        row = connection.execute('SELECT signature FROM source').fetchone()
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        connection.close()
+    return row is not None and row[0] == signature
+
+
+def build_question_file_index(filename, index_path, signature):
+    """ Parses a question file once and stores each of its lessons, keyed by global id, in a SQLite index. The index
+        is written to a temporary file first and then moved into place, so readers never see a partial index
+
+        Args:
+            filename (str): the path to the JSON question file
+            index_path (str): the path to store the SQLite index at
+            signature (str): the signature of the current version of the question file
+    """
+    with open(filename) as question_file:
+        lessons = json.load(question_file)
+
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    temporary_path = f'{index_path}.{os.getpid()}.tmp'
+    connection = sqlite3.connect(temporary_path)
+    connection.execute('CREATE TABLE source (signature TEXT NOT NULL)')
+    connection.execute('CREATE TABLE lessons (position INTEGER PRIMARY KEY, global_id TEXT NOT NULL, lesson TEXT)')
+    connection.execute('CREATE INDEX lessons_global_id ON lessons (global_id)')
+    connection.execute('INSERT INTO source (signature) VALUES (?)', (signature,))
+    connection.executemany(
+        'INSERT INTO lessons (position, global_id, lesson) VALUES (?, ?, ?)',
+        (
+            (position, lesson[GLOBAL_ID], json.dumps(compact_lesson(lesson), separators=(',', ':')))
+            for position, lesson in enumerate(lessons)
+        )
+    )
+    connection.commit()
+    connection.close()
+    os.replace(temporary_path, index_path)
+
+
+def load_indexed_lessons(filename, question_set_ids, index_directory):
+    """ Looks the selected lessons of a question file up in its index, building the index first if it is missing or
+        was built from an older version of the file
+
+        Args:
+            filename (str): the path to the JSON question file
+            question_set_ids (iterable): the global ids of the lessons to load
+            index_directory (str): the directory indexed question files are kept in
+
+        Returns:
+            list: the selected lessons, in the order they appear in the question file
+    """
+    index_path = get_question_file_index_path(filename, index_directory)
+    signature = get_source_signature(filename)
+    if not is_index_current(index_path, signature):
+        build_question_file_index(filename, index_path, signature)
+
+    global_ids = list(dict.fromkeys(question_set_ids))
+    rows = []
+    connection = sqlite3.connect(index_path)
+    for batch_start in range(0, len(global_ids), LOOKUP_BATCH_SIZE):
+        batch = global_ids[batch_start:batch_start + LOOKUP_BATCH_SIZE]
+        rows += connection.execute(
+            f'SELECT position, lesson FROM lessons WHERE global_id IN ({",".join("?" * len(batch))})',
+            batch
+        ).fetchall()
+    connection.close()
+    return [json.loads(lesson) for position, lesson in sorted(rows)]
+
+
+def load_lessons(filename, question_set_ids, index_directory=None):
+    """ Loads the lessons of a TQA question file, through its index when an index directory is given
+
+        Args:
+            filename (str): the path to the JSON question file
+            question_set_ids (iterable): the global ids of the lessons that will be used
+            index_directory (str): optional, the directory indexed question files are kept in
+
+        Returns:
+            list: the lessons, only the selected ones when they are loaded through the index
+    """
+    if index_directory is not None:
+        return load_indexed_lessons(filename, question_set_ids, index_directory)
+    with open(filename) as question_file:
+        return json.load(question_file)
@@ -1,13 +1,14 @@
 from math import floor, ceil
-from scipy.stats import sem
+import numpy as np
 from arc_benchmark.constants import ARTICLE_COUNT, AVERAGE_CORRECT, AVERAGE_INCORRECT, AVERAGE_INFORMATIVENESS, \
     AVERAGE_PERCENT_CORRECT, AVERAGE_PERCENT_INCORRECT, AVERAGE_PERCENT_UNANSWERED, AVERAGE_UNANSWERED, \
     CHECKPOINT_DIRECTORY, CORRECT, CORRECT_STANDARD_DEVIATION, DECIMAL_DIGITS, DISAGREEMENT, FINAL_RESULTS_FILE, \
-    INCORRECT, INCORRECT_STANDARD_DEVIATION, INDIVIDUAL_QUESTION_METRICS_FILE, INDIVIDUAL_RESULTS, \
-    INFORMATIVENESS_STANDARD_ERROR, PERCENT_CORRECT, PERCENT_INCORRECT, PERCENT_UNANSWERED, RANDOM_ANSWERING, RESULTS, \
-    QUESTION_COUNT, QUESTION_ID, QUESTION_SET, QUESTION_SET_METRICS_FILE, TOTAL_CORRECT, TOTAL_INCORRECT, \
-    TOTAL_INFORMATIVENESS, TOTAL_UNANSWERED, UNANSWERED, UNANSWERD_STANDARD_DEVIATION
+    INCORRECT, INCORRECT_STANDARD_DEVIATION, INDIVIDUAL_QUESTION_METRICS_FILE, INFORMATIVENESS_STANDARD_ERROR, \
+    PERCENT_CORRECT, PERCENT_INCORRECT, PERCENT_UNANSWERED, RANDOM_ANSWERING, RESULTS, QUESTION_COUNT, QUESTION_ID, \
+    QUESTION_SET, QUESTION_SET_METRICS_FILE, TOTAL_CORRECT, TOTAL_INCORRECT, TOTAL_INFORMATIVENESS, TOTAL_UNANSWERED, \
+    UNANSWERED, UNANSWERD_STANDARD_DEVIATION
 from arc_benchmark.file_utils import store_json
+from arc_benchmark.results_table import OUTCOMES, ResultsTable, sum_by_group
 
 
 def calculate_baselines(question_answer_counts):
@@ -45,35 +46,13 @@ def analyze_results(benchmark_results, question_answer_counts, config):
     """
     baseline_results = calculate_baselines(question_answer_counts)
 
-    file_results = {RANDOM_ANSWERING: baseline_results}
-    count = 1
-
+    file_results = {
+        RANDOM_ANSWERING: baseline_results,
+        **calculate_file_results(ResultsTable.from_benchmark_results(benchmark_results))
+    }
     for file in benchmark_results.keys():
-        correct = 0
-        incorrect = 0
-        unanswered = 0
-        question_set_informativeness = []
-        for index_entry in benchmark_results[file]:
-            if len(index_entry[RESULTS].keys()) > 0:
-                correct += index_entry[RESULTS][CORRECT]
-                incorrect += index_entry[RESULTS][INCORRECT]
-                unanswered += index_entry[RESULTS][UNANSWERED]
-                question_set_informativeness.append(
-                    index_entry[RESULTS][CORRECT] / (index_entry[RESULTS][CORRECT] + index_entry[RESULTS][INCORRECT]
-                                                     + index_entry[RESULTS][UNANSWERED])
-                )
-        file_results[file] = {
-            CORRECT: correct,
-            INCORRECT: incorrect,
-            UNANSWERED: unanswered,
-            TOTAL_INFORMATIVENESS: round(correct / (correct + incorrect + unanswered), DECIMAL_DIGITS),
-            AVERAGE_INFORMATIVENESS: round(
-                sum(question_set_informativeness)/len(question_set_informativeness), DECIMAL_DIGITS
-            ),
-            INFORMATIVENESS_STANDARD_ERROR: round(sem(question_set_informativeness), DECIMAL_DIGITS)
-        }
-        count += 1
-        print(correct + incorrect + unanswered)
+        if file in file_results:
+            print(file_results[file][CORRECT] + file_results[file][INCORRECT] + file_results[file][UNANSWERED])
 
     print('##############')
     store_json(file_results, config[FINAL_RESULTS_FILE], config)
@@ -81,6 +60,44 @@ def analyze_results(benchmark_results, question_answer_counts, config):
     print('##############')
 
 
+def calculate_file_results(results_table):
+    """ Tallies the count of correct, incorrect, and unanswered questions by article file, along with the
+        informativeness of each file over all of its question sets and the average and standard error of its
+        informativeness per question set. Runs without results are left out
+
+        Args:
+            results_table (ResultsTable): the results obtained from running the ARC Solver repeatedly
+
+        Returns:
+            dict: the results of each article file
+    """
+    file_count = len(results_table.file_labels)
+    file_codes = results_table.file_codes[results_table.answered]
+    outcome_counts = results_table.outcome_counts[results_table.answered]
+    run_counts = np.bincount(file_codes, minlength=file_count)
+    totals = sum_by_group(file_codes, outcome_counts, file_count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        run_informativeness = outcome_counts[:, 0] / outcome_counts.sum(axis=1)
+        average_informativeness = sum_by_group(file_codes, run_informativeness, file_count) / run_counts
+        squared_deviations = (run_informativeness - average_informativeness[file_codes]) ** 2
+        informativeness_standard_error = np.sqrt(
+            sum_by_group(file_codes, squared_deviations, file_count) / (run_counts - 1)
+        ) / np.sqrt(run_counts)
+        total_informativeness = totals[:, 0] / totals.sum(axis=1)
+
+    file_results = {}
+    for file_code, file in enumerate(results_table.file_labels):
+        file_results[file] = {
+            CORRECT: int(totals[file_code, 0]),
+            INCORRECT: int(totals[file_code, 1]),
+            UNANSWERED: int(totals[file_code, 2]),
+            TOTAL_INFORMATIVENESS: round(float(total_informativeness[file_code]), DECIMAL_DIGITS),
+            AVERAGE_INFORMATIVENESS: round(float(average_informativeness[file_code]), DECIMAL_DIGITS),
+            INFORMATIVENESS_STANDARD_ERROR: round(float(informativeness_standard_error[file_code]), DECIMAL_DIGITS)
+        }
+    return file_results
+
+
 def calculate_results_standard_deviation(question_set_results, question_set_metrics):
     """ Calculates the standard deviation of the number of correct, incorrect, and unanswered questions by articles
         across a question set
@@ -92,27 +109,17 @@ def calculate_results_standard_deviation(question_set_results, question_set_metr
         Returns:
             dict: the partially analyzed results with the additional standard deviation metrics
     """
-    correct_mean_diff_total = 0
-    incorrect_mean_diff_total = 0
-    unanswered_mean_diff_total = 0
-    for results in question_set_results:
-        correct_mean_diff_total += (results[RESULTS][CORRECT] - question_set_metrics[AVERAGE_CORRECT]) ** 2
-        incorrect_mean_diff_total += (results[RESULTS][INCORRECT] - question_set_metrics[AVERAGE_INCORRECT]) ** 2
-        unanswered_mean_diff_total += (results[RESULTS][UNANSWERED] - question_set_metrics[AVERAGE_UNANSWERED]) ** 2
-
+    outcome_counts = np.array([[results[RESULTS][outcome] for outcome in OUTCOMES] for results in question_set_results])
+    averages = np.array([
+        question_set_metrics[AVERAGE_CORRECT],
+        question_set_metrics[AVERAGE_INCORRECT],
+        question_set_metrics[AVERAGE_UNANSWERED]
+    ])
+    standard_deviations = (((outcome_counts - averages) ** 2).sum(axis=0) / question_set_metrics[ARTICLE_COUNT]) ** 0.5
     return {
-        CORRECT_STANDARD_DEVIATION: round(
-            (correct_mean_diff_total / question_set_metrics[ARTICLE_COUNT]) ** 0.5,
-            DECIMAL_DIGITS
-        ),
-        INCORRECT_STANDARD_DEVIATION: round(
-            (incorrect_mean_diff_total / question_set_metrics[ARTICLE_COUNT]) ** 0.5,
-            DECIMAL_DIGITS
-        ),
-        UNANSWERD_STANDARD_DEVIATION: round(
-            (unanswered_mean_diff_total / question_set_metrics[ARTICLE_COUNT]) ** 0.5,
-            DECIMAL_DIGITS
-        )
+        CORRECT_STANDARD_DEVIATION: round(float(standard_deviations[0]), DECIMAL_DIGITS),
+        INCORRECT_STANDARD_DEVIATION: round(float(standard_deviations[1]), DECIMAL_DIGITS),
+        UNANSWERD_STANDARD_DEVIATION: round(float(standard_deviations[2]), DECIMAL_DIGITS)
     }
 
 
@@ -125,54 +132,58 @@ def calculate_question_set_metrics(question_set_results):
         Returns:
             dict: the fully analyzed results of article performance on a question set
     """
+    return calculate_question_set_table_metrics(ResultsTable.from_question_set_results(question_set_results))
+
+
+def calculate_question_set_table_metrics(results_table):
+    """ Calculates the metrics across sets of questions, runs without results are left out
+
+        Args:
+            results_table (ResultsTable): the results obtained from running the ARC Solver repeatedly
+
+        Returns:
+            dict: the fully analyzed results of article performance on a question set
+    """
+    question_set_count = len(results_table.question_set_labels)
+    question_set_codes = results_table.question_set_codes[results_table.answered]
+    outcome_counts = results_table.outcome_counts[results_table.answered]
+    article_counts = np.bincount(question_set_codes, minlength=question_set_count)
+    totals = sum_by_group(question_set_codes, outcome_counts, question_set_count).astype(np.int64)
+
+    # the averages are rounded before the percents and standard deviations are derived from them
+    averages = np.zeros((question_set_count, len(OUTCOMES)))
+    for question_set_code in np.flatnonzero(article_counts):
+        averages[question_set_code] = [
+            round(int(total) / int(article_counts[question_set_code]), DECIMAL_DIGITS)
+            for total in totals[question_set_code]
+        ]
+    squared_deviations = (outcome_counts - averages[question_set_codes]) ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        standard_deviations = (
+            sum_by_group(question_set_codes, squared_deviations, question_set_count) / article_counts[:, None]
+        ) ** 0.5
+
     question_set_metrics = {}
-    for question_set_id in question_set_results.keys():
-        count = 0
-        correct = 0
-        incorrect = 0
-        unanswered = 0
-        for results in question_set_results[question_set_id]:
-            count += 1
-            correct += results[RESULTS][CORRECT]
-            incorrect += results[RESULTS][INCORRECT]
-            unanswered += results[RESULTS][UNANSWERED]
-
-        question_set_metrics[question_set_id] = {
+    for question_set_code in np.flatnonzero(article_counts):
+        count = int(article_counts[question_set_code])
+        correct, incorrect, unanswered = (int(total) for total in totals[question_set_code])
+        average_correct, average_incorrect, average_unanswered = (float(a) for a in averages[question_set_code])
+        question_count = int((correct + incorrect + unanswered) / count)
+        question_set_metrics[results_table.question_set_labels[question_set_code]] = {
             ARTICLE_COUNT: count,
-            QUESTION_COUNT: int((correct + incorrect + unanswered) / count),
+            QUESTION_COUNT: question_count,
             TOTAL_CORRECT: correct,
-            AVERAGE_CORRECT: round(correct / count, DECIMAL_DIGITS),
+            AVERAGE_CORRECT: average_correct,
             TOTAL_INCORRECT: incorrect,
-            AVERAGE_INCORRECT: round(incorrect / count, DECIMAL_DIGITS),
+            AVERAGE_INCORRECT: average_incorrect,
             TOTAL_UNANSWERED: unanswered,
-            AVERAGE_UNANSWERED: round(unanswered / count, DECIMAL_DIGITS)
-        }
-
-        question_set_metrics[question_set_id] = {
-            **question_set_metrics[question_set_id],
-            AVERAGE_PERCENT_CORRECT: round(
-                question_set_metrics[question_set_id][AVERAGE_CORRECT]
-                    / question_set_metrics[question_set_id][QUESTION_COUNT],
-                DECIMAL_DIGITS
-            ),
-            AVERAGE_PERCENT_INCORRECT: round(
-                question_set_metrics[question_set_id][AVERAGE_INCORRECT]
-                    / question_set_metrics[question_set_id][QUESTION_COUNT],
-                DECIMAL_DIGITS
-            ),
-            AVERAGE_PERCENT_UNANSWERED: round(
-                question_set_metrics[question_set_id][AVERAGE_UNANSWERED]
-                    / question_set_metrics[question_set_id][QUESTION_COUNT],
-                DECIMAL_DIGITS
-            )
-        }
-
-        question_set_metrics[question_set_id] = {
-            **question_set_metrics[question_set_id],
-            **calculate_results_standard_deviation(
-                question_set_results[question_set_id],
-                question_set_metrics[question_set_id]
-            )
+            AVERAGE_UNANSWERED: average_unanswered,
+            AVERAGE_PERCENT_CORRECT: round(average_correct / question_count, DECIMAL_DIGITS),
+            AVERAGE_PERCENT_INCORRECT: round(average_incorrect / question_count, DECIMAL_DIGITS),
+            AVERAGE_PERCENT_UNANSWERED: round(average_unanswered / question_count, DECIMAL_DIGITS),
+            CORRECT_STANDARD_DEVIATION: round(float(standard_deviations[question_set_code, 0]), DECIMAL_DIGITS),
+            INCORRECT_STANDARD_DEVIATION: round(float(standard_deviations[question_set_code, 1]), DECIMAL_DIGITS),
+            UNANSWERD_STANDARD_DEVIATION: round(float(standard_deviations[question_set_code, 2]), DECIMAL_DIGITS)
         }
     return question_set_metrics
 
@@ -195,6 +206,42 @@ def calculate_disagreement(individual_question_result):
     return round(answer_percents[0] + answer_percents[1], DECIMAL_DIGITS)
 
 
+def calculate_outcome_percents(outcome_counts):
+    """ Calculates the share of each outcome of individual questions and how many articles disagreed from the
+        majority/plurality opinion, see calculate_disagreement
+
+        Args:
+            outcome_counts (numpy.ndarray): the correct, incorrect and unanswered counts of each question
+
+        Returns:
+            numpy.ndarray: the percent correct, incorrect and unanswered of each question
+            numpy.ndarray: the disagreement on each question
+    """
+    percents = outcome_counts / outcome_counts.sum(axis=1)[:, None]
+    sorted_percents = np.sort(percents, axis=1)
+    return percents, sorted_percents[:, 0] + sorted_percents[:, 1]
+
+
+def add_percents_and_disagreement(individual_question_result, percents, disagreement):
+    """ Adds the rounded percents and disagreement of a question to its raw performance
+
+        Args:
+            individual_question_result (dict): the raw performance of the articles on an individual question
+            percents (numpy.ndarray): the percent correct, incorrect and unanswered of the question
+            disagreement (float): the disagreement on the question
+
+        Returns:
+            dict: the fully analyzed results of the question
+    """
+    return {
+        **individual_question_result,
+        PERCENT_CORRECT: round(float(percents[0]), DECIMAL_DIGITS),
+        PERCENT_INCORRECT: round(float(percents[1]), DECIMAL_DIGITS),
+        PERCENT_UNANSWERED: round(float(percents[2]), DECIMAL_DIGITS),
+        DISAGREEMENT: round(float(disagreement), DECIMAL_DIGITS)
+    }
+
+
 def calculate_individual_question_metrics(individual_question_results):
     """ Calculates metrics specific to individual questions
 
@@ -204,26 +251,42 @@ def calculate_individual_question_metrics(individual_question_results):
         Returns:
             dict: the fully analyzed results of each individual question
     """
-    individual_question_metrics = {}
-    for question_set_and_id in individual_question_results.keys():
-        article_count = individual_question_results[question_set_and_id][ARTICLE_COUNT]
-        individual_question_metrics[question_set_and_id] = {
-            **individual_question_results[question_set_and_id],
-            PERCENT_CORRECT: round(
-                individual_question_results[question_set_and_id][CORRECT] / article_count,
-                DECIMAL_DIGITS
-            ),
-            PERCENT_INCORRECT: round(
-                individual_question_results[question_set_and_id][INCORRECT] / article_count,
-                DECIMAL_DIGITS
-            ),
-            PERCENT_UNANSWERED: round(
-                individual_question_results[question_set_and_id][UNANSWERED] / article_count,
-                DECIMAL_DIGITS
-            ),
-            DISAGREEMENT: calculate_disagreement(individual_question_results[question_set_and_id])
-        }
+    question_keys = list(individual_question_results.keys())
+    outcome_counts = np.array(
+        [[individual_question_results[key][outcome] for outcome in OUTCOMES] for key in question_keys]
+    ).reshape(-1, len(OUTCOMES))
+    percents, disagreement = calculate_outcome_percents(outcome_counts)
+    return {
+        key: add_percents_and_disagreement(individual_question_results[key], percents[row], disagreement[row])
+        for row, key in enumerate(question_keys)
+    }
+
+
+def calculate_individual_question_table_metrics(results_table):
+    """ Counts the outcomes of each individual question across articles and calculates their metrics
 
+        Args:
+            results_table (ResultsTable): the results obtained from running the ARC Solver repeatedly
+
+        Returns:
+            dict: the fully analyzed results of each individual question, by question set and question id
+    """
+    outcome_counts = results_table.count_question_outcomes()
+    percents, disagreement = calculate_outcome_percents(outcome_counts)
+    individual_question_metrics = {}
+    for question_code, (question_set, question_id) in enumerate(results_table.question_labels):
+        individual_question_metrics[f'{question_set}:{question_id}'] = add_percents_and_disagreement(
+            {
+                QUESTION_SET: question_set,
+                QUESTION_ID: question_id,
+                CORRECT: int(outcome_counts[question_code, 0]),
+                INCORRECT: int(outcome_counts[question_code, 1]),
+                UNANSWERED: int(outcome_counts[question_code, 2]),
+                ARTICLE_COUNT: int(outcome_counts[question_code].sum())
+            },
+            percents[question_code],
+            disagreement[question_code]
+        )
     return individual_question_metrics
 
 
@@ -234,29 +297,8 @@ def analyze_questions(benchmark_results, config):
             benchmark_results (dict): the results obtained from running the ARC Solver repeatedly
             config (dict): config file specified properties to use in running the benchmark
     """
-    question_set_results = {}
-    individual_question_results = {}
-    for file in benchmark_results.keys():
-        for index_results in benchmark_results[file]:
-            if index_results[QUESTION_SET] not in question_set_results.keys():
-                question_set_results[index_results[QUESTION_SET]] = []
-            question_set_results[index_results[QUESTION_SET]].append(index_results)
-
-            for question_id in index_results[INDIVIDUAL_RESULTS].keys():
-                if f'{index_results[QUESTION_SET]}:{question_id}' not in individual_question_results:
-                    individual_question_results[f'{index_results[QUESTION_SET]}:{question_id}'] = {
-                        QUESTION_SET: index_results[QUESTION_SET],
-                        QUESTION_ID:  question_id,
-                        CORRECT: 0,
-                        INCORRECT: 0,
-                        UNANSWERED: 0,
-                        ARTICLE_COUNT: 0
-                    }
-                individual_question_results[f'{index_results[QUESTION_SET]}:{question_id}'] \
-                    [index_results[INDIVIDUAL_RESULTS][question_id]] += 1
-                individual_question_results[f'{index_results[QUESTION_SET]}:{question_id}'][ARTICLE_COUNT] += 1
-
-    question_set_metrics = calculate_question_set_metrics(question_set_results)
-    individual_question_metrics = calculate_individual_question_metrics(individual_question_results)
+    results_table = ResultsTable.from_benchmark_results(benchmark_results)
+    question_set_metrics = calculate_question_set_table_metrics(results_table)
+    individual_question_metrics = calculate_individual_question_table_metrics(results_table)
     store_json(question_set_metrics, config[QUESTION_SET_METRICS_FILE], config)
     store_json(individual_question_metrics, config[INDIVIDUAL_QUESTION_METRICS_FILE], config)
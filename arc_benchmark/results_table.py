@@ -0,0 +1,133 @@
+import numpy as np
+from arc_benchmark.constants import CORRECT, INCORRECT, INDIVIDUAL_RESULTS, QUESTION_SET, RESULTS, UNANSWERED
+
+# the column of each outcome in the outcome counts, and the code of each outcome of an individual question
+OUTCOMES = [CORRECT, INCORRECT, UNANSWERED]
+OUTCOME_CODES = {outcome: code for code, outcome in enumerate(OUTCOMES)}
+
+
+def sum_by_group(codes, values, group_count):
+    """ Sums values by the group each row belongs to
+
+        Args:
+            codes (numpy.ndarray): the group code of each row
+            values (numpy.ndarray): the values of each row, either one value or a row of values per code
+            group_count (int): the number of groups
+
+        Returns:
+            numpy.ndarray: the sums of each group, one row per group when rows of values are given
+    """
+    if values.ndim == 1:
+        return np.bincount(codes, weights=values, minlength=group_count)
+    return np.stack(
+        [np.bincount(codes, weights=values[:, column], minlength=group_count) for column in range(values.shape[1])],
+        axis=1
+    )
+
+
+class ResultsTable:
+    """ Columnar copy of the results of the ARC-Solver runs, built once so every metric can be calculated as a grouped
+        NumPy reduction instead of walking the nested results
+
+        Each run of a question set with an index is a row of the run columns: the code of its article file, the code
+        of its question set, its correct/incorrect/unanswered counts and whether it has results at all. Each answer to
+        an individual question is a row of the question columns: the code of its (question set, question id) pair
+        and the code of its outcome. Codes are given in order of first appearance, so the labels keep the order of
+        the results.
+    """
+    def __init__(self):
+        self.file_labels = []
+        self.question_set_labels = []
+        self.question_labels = []
+        self.file_codes = np.zeros(0, dtype=np.int64)
+        self.question_set_codes = np.zeros(0, dtype=np.int64)
+        self.outcome_counts = np.zeros((0, len(OUTCOMES)), dtype=np.int64)
+        self.answered = np.zeros(0, dtype=bool)
+        self.question_codes = np.zeros(0, dtype=np.int64)
+        self.question_outcomes = np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def from_benchmark_results(cls, benchmark_results):
+        """ Builds the table from the results of the ARC-Solver runs
+
+            Args:
+                benchmark_results (dict): the results obtained from running the ARC Solver repeatedly, by file
+
+            Returns:
+                ResultsTable: the results in columns
+        """
+        return cls.from_runs(
+            (file, index_entry.get(QUESTION_SET), index_entry)
+            for file in benchmark_results.keys()
+            for index_entry in benchmark_results[file]
+        )
+
+    @classmethod
+    def from_question_set_results(cls, question_set_results):
+        """ Builds the table from results already grouped by question set, without any article file
+
+            Args:
+                question_set_results (dict): the raw performance of articles by each question set
+
+            Returns:
+                ResultsTable: the results in columns
+        """
+        return cls.from_runs(
+            (None, question_set_id, results)
+            for question_set_id in question_set_results.keys()
+            for results in question_set_results[question_set_id]
+        )
+
+    @classmethod
+    def from_runs(cls, runs):
+        """ Builds the table from the results of individual runs
+
+            Args:
+                runs (iterable): (article file, question set, index entry) tuples, one per ARC-Solver run
+
+            Returns:
+                ResultsTable: the results in columns
+        """
+        table = cls()
+        file_lookup = {}
+        question_set_lookup = {}
+        question_lookup = {}
+        file_codes = []
+        question_set_codes = []
+        outcome_counts = []
+        answered = []
+        question_codes = []
+        question_outcomes = []
+        for file, question_set, index_entry in runs:
+            file_codes.append(file_lookup.setdefault(file, len(file_lookup)))
+            question_set_codes.append(question_set_lookup.setdefault(question_set, len(question_set_lookup)))
+            results = index_entry[RESULTS]
+            answered.append(len(results.keys()) > 0)
+            outcome_counts.append([results.get(outcome, 0) for outcome in OUTCOMES])
+            individual_results = index_entry.get(INDIVIDUAL_RESULTS, {})
+            for question_id in individual_results.keys():
+                question_codes.append(question_lookup.setdefault((question_set, question_id), len(question_lookup)))
+                question_outcomes.append(OUTCOME_CODES[individual_results[question_id]])
+
+        table.file_labels = list(file_lookup.keys())
+        table.question_set_labels = list(question_set_lookup.keys())
+        table.question_labels = list(question_lookup.keys())
+        table.file_codes = np.array(file_codes, dtype=np.int64)
+        table.question_set_codes = np.array(question_set_codes, dtype=np.int64)
+        table.outcome_counts = np.array(outcome_counts, dtype=np.int64).reshape(-1, len(OUTCOMES))
+        table.answered = np.array(answered, dtype=bool)
+        table.question_codes = np.array(question_codes, dtype=np.int64)
+        table.question_outcomes = np.array(question_outcomes, dtype=np.int64)
+        return table
+
+    def count_question_outcomes(self):
+        """ Counts the outcomes of every individual question across all runs
+
+            Returns:
+                numpy.ndarray: the correct, incorrect and unanswered counts of each question, one row per question label
+        """
+        question_count = len(self.question_labels)
+        return np.bincount(
+            self.question_codes * len(OUTCOMES) + self.question_outcomes,
+            minlength=question_count * len(OUTCOMES)
+        ).reshape(question_count, len(OUTCOMES))
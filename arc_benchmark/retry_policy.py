@@ -0,0 +1,238 @@
+import json
+import os
+import random
+import time
+from arc_benchmark.constants import ATTEMPTS, BAD_INPUT, CHECKPOINT_DIRECTORY, DEAD_LETTER_FILE, \
+    ELASTICSEARCH_OVERLOAD, FAILURE, INDEX, MAX_RETRY_DELAY, MESSAGE, OUT_OF_MEMORY, QUESTION_SET, RETRY_COUNT, \
+    RETRY_DELAY, TIMEOUT, UNKNOWN_FAILURE
+from arc_benchmark.file_utils import append_checkpoint_line
+from arc_benchmark.solver_client import JobTimeoutError, SolverRunError
+
+# the text that identifies each kind of failure in the error output of an ARC-Solver run, checked in order
+FAILURE_PATTERNS = [
+    (OUT_OF_MEMORY, ['MemoryError', 'out of memory', 'Cannot allocate memory', 'std::bad_alloc']),
+    (ELASTICSEARCH_OVERLOAD, [
+        'es_rejected_execution_exception',
+        'circuit_breaking_exception',
+        'ConnectionTimeout',
+        'ConnectionError',
+        'Too Many Requests',
+        'TransportError(429',
+        'TransportError(503'
+    ]),
+    (BAD_INPUT, [
+        'index_not_found_exception',
+        'EnvironmentLocationNotFound',
+        'FileNotFoundError',
+        'No such file or directory',
+        'JSONDecodeError'
+    ])
+]
+# return codes of processes killed by the kernel, which is almost always the out of memory killer
+KILLED_RETURN_CODES = [-9, 137]
+# the kinds of failure that are worth retrying, the others fail the same way every time
+TRANSIENT_FAILURES = [ELASTICSEARCH_OVERLOAD, OUT_OF_MEMORY, UNKNOWN_FAILURE]
+# the number of characters of error output kept in the dead-letter file
+MESSAGE_LENGTH = 2000
+
+
+class JobFailedError(Exception):
+    """ Raised when an ARC-Solver run failed for good, either on a permanent failure or after its last retry """
+    def __init__(self, failure, message, attempts):
+        super().__init__(f'{failure} after {attempts} attempt{"s" if attempts > 1 else ""}')
+        self.failure = failure
+        self.message = message
+        self.attempts = attempts
+
+
+def get_retry_count(config):
+    """ Returns the number of times a run that failed on a transient failure is retried, defaulting to 5
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            int: the number of retries
+    """
+    if RETRY_COUNT not in config or config[RETRY_COUNT] is None:
+        return 5
+    return max(0, int(config[RETRY_COUNT]))
+
+
+def get_retry_delay(config):
+    """ Returns the seconds to wait before the first retry, every later retry waits twice as long, defaulting to 2
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            float: the delay before the first retry
+    """
+    if RETRY_DELAY not in config or config[RETRY_DELAY] is None:
+        return 2.0
+    return max(0.0, float(config[RETRY_DELAY]))
+
+
+def get_max_retry_delay(config):
+    """ Returns the most seconds to wait before any retry, defaulting to 60
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            float: the longest delay before a retry
+    """
+    if MAX_RETRY_DELAY not in config or config[MAX_RETRY_DELAY] is None:
+        return 60.0
+    return max(0.0, float(config[MAX_RETRY_DELAY]))
+
+
+def get_backoff_delay(retry, config):
+    """ Picks how long to wait before a retry. The delay doubles with every retry up to the maximum delay, and a
+        random half of it is added on top of the other half, so workers that failed together do not retry together
+
+        Args:
+            retry (int): the number of the retry, counting from 0
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            float: the seconds to wait
+    """
+    delay = min(get_max_retry_delay(config), get_retry_delay(config) * 2 ** retry)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def classify_failure(error):
+    """ Works out what kind of failure made an ARC-Solver run fail from the error it raised, including the return
+        code and error output of the run when there is one
+
+        Args:
+            error (Exception): the error the run raised
+
+        Returns:
+            str: the kind of failure
+            str: the error output the failure was identified by, shortened to its end
+    """
+    if isinstance(error, JobTimeoutError):
+        return TIMEOUT, str(error)
+    if isinstance(error, SolverRunError):
+        message = error.stderr or str(error)
+        if error.returncode in KILLED_RETURN_CODES:
+            return OUT_OF_MEMORY, message[-MESSAGE_LENGTH:]
+    else:
+        message = f'{type(error).__name__}: {error}'
+    for failure, patterns in FAILURE_PATTERNS:
+        if any(pattern in message for pattern in patterns):
+            return failure, message[-MESSAGE_LENGTH:]
+    return UNKNOWN_FAILURE, message[-MESSAGE_LENGTH:]
+
+
+def is_transient(failure):
+    """ Whether a kind of failure might not happen again, so the run is worth retrying
+
+        Args:
+            failure (str): the kind of failure
+
+        Returns:
+            bool: True if the run should be retried
+    """
+    return failure in TRANSIENT_FAILURES
+
+
+def run_with_retries(run, config):
+    """ Calls a run until it succeeds, retrying transient failures with a jittered exponential backoff and giving up
+        straight away on permanent ones
+
+        Args:
+            run (function): the run to call, without arguments, it raises an error when it fails
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            various: whatever the successful call of the run returned
+
+        Raises:
+            JobFailedError: if the run failed on a permanent failure or failed every retry
+    """
+    retry = 0
+    while True:
+        try:
+            return run()
+        except Exception as error:
+            failure, message = classify_failure(error)
+            if not is_transient(failure) or retry >= get_retry_count(config):
+                raise JobFailedError(failure, message, retry + 1) from error
+            delay = get_backoff_delay(retry, config)
+            print(f'arc run failure ({failure}), retry attempt #{retry + 1} in {delay:.1f} seconds')
+            time.sleep(delay)
+            retry += 1
+
+
+def use_dead_letter_file(config):
+    """ Whether runs that failed for good should be recorded in a dead-letter file
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            bool: True if a dead-letter file is set in the config
+    """
+    return DEAD_LETTER_FILE in config and bool(config[DEAD_LETTER_FILE])
+
+
+def record_dead_letter(index, question_set_id, job_failure, config):
+    """ Appends a run that failed for good to the dead-letter file, if one is configured, so it can be looked into
+        and queued again later
+
+        Args:
+            index (str): the Elasticsearch index of the run
+            question_set_id (str): the id of the question set of the run
+            job_failure (JobFailedError): why and after how many attempts the run failed
+            config (dict): config file specified properties to use in running the benchmark
+    """
+    if not use_dead_letter_file(config):
+        return
+    os.makedirs(config[CHECKPOINT_DIRECTORY], exist_ok=True)
+    with open(f'{config[CHECKPOINT_DIRECTORY]}/{config[DEAD_LETTER_FILE]}', 'a+') as dead_letter_file:
+        append_checkpoint_line(dead_letter_file, json.dumps({
+            INDEX: index,
+            QUESTION_SET: question_set_id,
+            FAILURE: job_failure.failure,
+            ATTEMPTS: job_failure.attempts,
+            MESSAGE: job_failure.message
+        }))
+
+
+def report_dead_letters(checkpoint_store, config):
+    """ Prints how many runs recorded in the dead-letter file by an earlier run are still without a checkpoint, and so
+        are queued again by this run
+
+        Args:
+            checkpoint_store (object): the checkpoint store holding the completed runs
+            config (dict): config file specified properties to use in running the benchmark
+    """
+    requeued_runs = [key for key in load_dead_letters(config).keys() if key not in checkpoint_store]
+    if requeued_runs:
+        print(f'{len(requeued_runs)} runs from the dead-letter file {config[DEAD_LETTER_FILE]} are queued again')
+
+
+def load_dead_letters(config):
+    """ Loads the runs recorded in the dead-letter file, keeping the latest failure of every run
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            dict: the latest dead-letter entry by (index, question set id), empty without a dead-letter file
+    """
+    dead_letters = {}
+    if not use_dead_letter_file(config) \
+            or not os.path.isfile(f'{config[CHECKPOINT_DIRECTORY]}/{config[DEAD_LETTER_FILE]}'):
+        return dead_letters
+    with open(f'{config[CHECKPOINT_DIRECTORY]}/{config[DEAD_LETTER_FILE]}') as dead_letter_file:
+        for line in dead_letter_file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            dead_letters[(entry[INDEX], entry[QUESTION_SET])] = entry
+    return dead_letters
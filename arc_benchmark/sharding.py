@@ -0,0 +1,125 @@
+import os
+import re
+import zlib
+from arc_benchmark.constants import ARC_RESULTS_FILE, CHECKPOINT_DIRECTORY, QUESTION_ANSWER_COUNTS_FILE, SHARD, \
+    SHARD_DIRECTORY_FORMAT, SHARD_DIRECTORY_PATTERN
+from arc_benchmark.file_utils import add_question_counts, load_json
+
+
+def parse_shard(shard):
+    """ Parses a shard given as i/N, the i-th of N shards counting from 0
+
+        Args:
+            shard (str): the shard to parse
+
+        Returns:
+            tuple: the shard number and the shard count
+
+        Raises:
+            ValueError: if the shard is not of the form i/N with 0 <= i < N
+    """
+    match = re.fullmatch(r'\s*(\d+)\s*/\s*(\d+)\s*', str(shard))
+    if not match or int(match.group(2)) < 1 or int(match.group(1)) >= int(match.group(2)):
+        raise ValueError(f'a shard must be given as i/N with 0 <= i < N, got {shard}')
+    return int(match.group(1)), int(match.group(2))
+
+
+def get_shard(config):
+    """ Gets the shard of the question sets this run is limited to
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            tuple: the shard number and the shard count, None if every question set is run
+    """
+    if SHARD in config and config[SHARD]:
+        return parse_shard(config[SHARD])
+    return None
+
+
+def is_in_shard(question_set_id, shard):
+    """ Whether a question set belongs to a shard. Question sets are assigned by a hash of their id, so every machine
+        running a shard of the same benchmark makes the same assignment, and all runs of a question set stay together
+
+        Args:
+            question_set_id (str): the id of the question set
+            shard (tuple): the shard number and the shard count
+
+        Returns:
+            bool: True if the question set is run by the shard
+    """
+    shard_number, shard_count = shard
+    return zlib.crc32(str(question_set_id).encode('utf-8')) % shard_count == shard_number
+
+
+def get_shard_directory(checkpoint_directory, shard):
+    """ Gets the checkpoint directory of a shard, each shard keeps its own checkpoints and results
+
+        Args:
+            checkpoint_directory (str): the checkpoint directory of the whole benchmark
+            shard (tuple): the shard number and the shard count
+
+        Returns:
+            str: the checkpoint directory of the shard
+    """
+    shard_number, shard_count = shard
+    return f'{checkpoint_directory}/{SHARD_DIRECTORY_FORMAT.format(shard_number, shard_count)}'
+
+
+def find_shard_directories(checkpoint_directory):
+    """ Finds the checkpoint directories of every shard of a sharded benchmark
+
+        Args:
+            checkpoint_directory (str): the checkpoint directory of the whole benchmark
+
+        Returns:
+            list: the checkpoint directories of the shards, in shard order
+
+        Raises:
+            ValueError: if there are no shards, shards of different shard counts, or a shard is missing
+    """
+    shards = []
+    if os.path.isdir(checkpoint_directory):
+        for filename in os.listdir(checkpoint_directory):
+            match = re.fullmatch(SHARD_DIRECTORY_PATTERN, filename)
+            if match and os.path.isdir(f'{checkpoint_directory}/{filename}'):
+                shards.append((int(match.group(1)), int(match.group(2))))
+    shard_counts = {shard_count for _, shard_count in shards}
+    if len(shard_counts) != 1:
+        raise ValueError(f'expected the shards of a single sharded run in {checkpoint_directory}, found {len(shards)} '
+                         f'shards of {len(shard_counts)} different shard counts')
+    shard_count = shard_counts.pop()
+    missing_shards = sorted(set(range(shard_count)) - {shard_number for shard_number, _ in shards})
+    if missing_shards:
+        raise ValueError(f'shards {missing_shards} of {shard_count} are missing from {checkpoint_directory}')
+    return [
+        get_shard_directory(checkpoint_directory, (shard_number, shard_count)) for shard_number in range(shard_count)
+    ]
+
+
+def merge_shard_results(config):
+    """ Combines the ARC-Solver results and question counts written by every shard of a sharded benchmark
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            dict: the results of every shard, by article file
+            dict: the count of questions of every shard by the number of possible answers
+
+        Raises:
+            ValueError: if a shard is missing or has not finished running
+    """
+    benchmark_results = {}
+    question_answer_counts = {}
+    for shard_directory in find_shard_directories(config[CHECKPOINT_DIRECTORY]):
+        shard_config = {**config, CHECKPOINT_DIRECTORY: shard_directory}
+        shard_results = load_json(config[ARC_RESULTS_FILE], shard_config)
+        shard_question_answer_counts = load_json(QUESTION_ANSWER_COUNTS_FILE, shard_config)
+        if shard_results is None or shard_question_answer_counts is None:
+            raise ValueError(f'the shard in {shard_directory} has not finished running')
+        for file in shard_results.keys():
+            benchmark_results[file] = benchmark_results.get(file, []) + shard_results[file]
+        question_answer_counts = add_question_counts(question_answer_counts, shard_question_answer_counts)
+    return benchmark_results, question_answer_counts
@@ -0,0 +1,462 @@
+import json
+import os
+import signal
+import subprocess
+import threading
+from collections import deque
+from arc_benchmark.constants import ARC_MODEL_SUBDIRECTORY, BATCH_INDEX_MARKER, CHECKPOINT_DIRECTORY, \
+    CONDA_ENVIRONMENT_NAME, ENTAILMENT_CACHE_FILE, ERROR, EXAM_SOLVER_FILEPATH, INDEX, INDICES, INPUT_FILE, \
+    JOB_TIMEOUT, OUTPUT, OUTPUTS, READY, RESULT_MARKER, RETRIEVAL_BATCH_SIZE, RETRIEVAL_CACHE_FILE, \
+    RETRIEVAL_CONCURRENCY, SOLVER_LOG_FILE, USE_SOLVER_SERVER
+
+# the lines of ARC-Solver output EXAM reads, everything else is only written to the solver log
+RESULT_LINE_MARKERS = (BATCH_INDEX_MARKER, RESULT_MARKER)
+# the number of lines at the end of the error output of a run that are kept to tell what made it fail
+ERROR_OUTPUT_LINES = 50
+
+
+class SolverServerError(Exception):
+    """ Raised when the ARC-Solver server fails to start or fails to run a job """
+
+
+class JobTimeoutError(Exception):
+    """ Raised when an ARC-Solver run takes longer than the configured job timeout and is stopped """
+
+
+class SolverRunError(Exception):
+    """ Raised when an ARC-Solver run finishes without printing any results """
+    def __init__(self, returncode, stderr):
+        super().__init__(f'the ARC-Solver run exited with return code {returncode} without printing any results')
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+def use_solver_server(config):
+    """ Whether ARC-Solver runs should go through a persistent solver server rather than a subprocess per index
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            bool: True if the solver server is enabled in the config
+    """
+    return USE_SOLVER_SERVER in config and bool(config[USE_SOLVER_SERVER])
+
+
+def use_retrieval_cache(config):
+    """ Whether the ARC-Solver should cache the hits it retrieves from Elasticsearch, so reruns on unchanged indices
+        skip the retrieval queries
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            bool: True if a retrieval cache file is set in the config
+    """
+    return RETRIEVAL_CACHE_FILE in config and bool(config[RETRIEVAL_CACHE_FILE])
+
+
+def use_entailment_cache(config):
+    """ Whether the ARC-Solver should cache its entailment predictions, so premise/hypothesis pairs already scored
+        by any earlier run are not scored again
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            bool: True if an entailment cache file is set in the config
+    """
+    return ENTAILMENT_CACHE_FILE in config and bool(config[ENTAILMENT_CACHE_FILE])
+
+
+def use_retrieval_options(config):
+    """ Whether the ARC-Solver should retrieve the hits of a question set in batched _msearch requests, otherwise it
+        searches every answer choice on its own like the stock ARC-Solver
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            bool: True if a retrieval batch size is set in the config
+    """
+    return RETRIEVAL_BATCH_SIZE in config and bool(config[RETRIEVAL_BATCH_SIZE])
+
+
+def get_retrieval_batch_size(config):
+    """ Returns the number of retrieval queries the ARC-Solver sends to Elasticsearch in one _msearch request,
+        defaulting to 64
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            int: the retrieval batch size
+    """
+    if RETRIEVAL_BATCH_SIZE not in config or not config[RETRIEVAL_BATCH_SIZE]:
+        return 64
+    return max(1, int(config[RETRIEVAL_BATCH_SIZE]))
+
+
+def get_retrieval_concurrency(config):
+    """ Returns the number of _msearch requests the ARC-Solver sends to Elasticsearch at the same time, defaulting to 4
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            int: the retrieval concurrency
+    """
+    if RETRIEVAL_CONCURRENCY not in config or not config[RETRIEVAL_CONCURRENCY]:
+        return 4
+    return max(1, int(config[RETRIEVAL_CONCURRENCY]))
+
+
+def get_job_timeout(config):
+    """ Returns the seconds a single ARC-Solver run may take before it is stopped, defaulting to no limit
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            int: the job timeout in seconds, None if runs are never stopped
+    """
+    if JOB_TIMEOUT not in config or not config[JOB_TIMEOUT]:
+        return None
+    return max(1, int(config[JOB_TIMEOUT]))
+
+
+def kill_process_group(process):
+    """ Kills a process started in its own session along with everything it started, conda run leaves the actual
+        ARC-Solver process running otherwise
+
+        Args:
+            process (subprocess.Popen): the process to kill
+    """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        process.kill()
+
+
+def get_solver_log_filepath(config):
+    """ Gets the file the output of ARC-Solver runs is streamed to, other than the results EXAM reads from it
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            str: the path to the solver log in the checkpoint directory, None if there is no checkpoint directory
+    """
+    if CHECKPOINT_DIRECTORY not in config or not config[CHECKPOINT_DIRECTORY]:
+        return None
+    return os.path.join(config[CHECKPOINT_DIRECTORY], SOLVER_LOG_FILE)
+
+
+def run_solver_command(command, config, job_count=1):
+    """ Runs an ARC-Solver command to completion, stopping it once it runs longer than the job timeout. The output is
+        read as it is printed: the result lines EXAM parses are kept, everything else is streamed to the solver log,
+        so a long, chatty run is never held in memory
+
+        Args:
+            command (list): the command to run
+            config (dict): config file specified properties to use in running the benchmark
+            job_count (int): optional, the number of indices the command answers, a batched run gets the job timeout
+                of each of them
+
+        Returns:
+            subprocess.CompletedProcess: the return code of the command, the result lines it printed as stdout and the
+                end of its error output as stderr
+
+        Raises:
+            JobTimeoutError: if the command did not finish within the job timeout
+    """
+    log_filepath = get_solver_log_filepath(config)
+    if log_filepath is not None:
+        os.makedirs(os.path.dirname(log_filepath) or '.', exist_ok=True)
+    log_lock = threading.Lock()
+    error_output = deque(maxlen=ERROR_OUTPUT_LINES)
+    result_lines = []
+    timed_out = threading.Event()
+    timeout = get_job_timeout(config)
+
+    with open(log_filepath if log_filepath is not None else os.devnull, 'a') as log_file:
+        def write_log(line):
+            with log_lock:
+                log_file.write(line)
+
+        def stream_errors():
+            for error_line in process.stderr:
+                write_log(error_line)
+                error_output.append(error_line)
+
+        def stop():
+            timed_out.set()
+            kill_process_group(process)
+
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+            start_new_session=True
+        )
+        error_thread = threading.Thread(target=stream_errors)
+        error_thread.start()
+        timer = None
+        if timeout is not None:
+            timeout *= job_count
+            timer = threading.Timer(timeout, stop)
+            timer.start()
+        try:
+            for line in process.stdout:
+                if line.startswith(RESULT_LINE_MARKERS):
+                    result_lines.append(line)
+                else:
+                    write_log(line)
+            error_thread.join()
+            process.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    if timed_out.is_set():
+        raise JobTimeoutError(f'the ARC-Solver run did not finish within {timeout} seconds')
+    return subprocess.CompletedProcess(command, process.returncode, ''.join(result_lines), ''.join(error_output))
+
+
+def get_cache_options(config):
+    """ Builds the command line options that point exam_solver.py to the configured cache files
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            list: the cache options to append to the exam_solver.py command, empty if no cache is configured
+    """
+    cache_options = []
+    if use_retrieval_cache(config):
+        cache_options += ['--hit-cache', f'{config[RETRIEVAL_CACHE_FILE]}']
+    if use_entailment_cache(config):
+        cache_options += ['--entailment-cache', f'{config[ENTAILMENT_CACHE_FILE]}']
+    return cache_options
+
+
+def get_retrieval_options(config):
+    """ Builds the command line options that set the batch size and concurrency of the ARC-Solver's retrieval
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            list: the retrieval options to append to the exam_solver.py command, empty if neither is configured
+    """
+    if not use_retrieval_options(config):
+        return []
+    return [
+        '--retrieval-batch-size',
+        f'{get_retrieval_batch_size(config)}',
+        '--retrieval-concurrency',
+        f'{get_retrieval_concurrency(config)}'
+    ]
+
+
+class SolverClient:
+    """ Client for a long-lived ARC-Solver process that loads the entailment model once and then runs
+        (question set file, index) jobs sent over its stdin, replying over its stdout
+    """
+    def __init__(self, arc_solver_directory, log_filepath, config):
+        """ Starts the ARC-Solver server process and waits until its model is loaded
+
+            Args:
+                arc_solver_directory (str): the directory to the ARC-Solver project, the server runs from there
+                log_filepath (str): the file the server's own output (progress bars, logging) is appended to
+                config (dict): config file specified properties to use in running the benchmark
+        """
+        self.arc_solver_directory = arc_solver_directory
+        self.log_filepath = log_filepath
+        self.config = config
+        self.log_file = None
+        self.process = None
+        self.timed_out = False
+        self.start()
+
+    def start(self):
+        """ Launches the server process in the ARC-Solver conda environment """
+        self.log_file = open(self.log_filepath, 'a')
+        command = [
+            'conda',
+            'run',
+            '--no-capture-output',
+            '-n',
+            f'{self.config[CONDA_ENVIRONMENT_NAME]}',
+            'python3.6',
+            f'{EXAM_SOLVER_FILEPATH}',
+            f'{self.config[ARC_MODEL_SUBDIRECTORY]}'
+        ]
+        self.process = subprocess.Popen(
+            command + get_cache_options(self.config) + get_retrieval_options(self.config),
+            cwd=self.arc_solver_directory,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=self.log_file,
+            universal_newlines=True,
+            bufsize=1,
+            start_new_session=True
+        )
+        try:
+            if not self.read_message().get(READY):
+                raise SolverServerError('the ARC-Solver server did not report that it was ready')
+        except BaseException:
+            # a server that never became ready, or a start interrupted by the user, would otherwise keep running in
+            # its own session with nothing left to stop it
+            kill_process_group(self.process)
+            self.process.wait()
+            self.process = None
+            self.log_file.close()
+            self.log_file = None
+            raise
+
+    def read_message(self):
+        """ Reads the next protocol message written by the server
+
+            Returns:
+                dict: the decoded message
+        """
+        line = self.process.stdout.readline()
+        if not line:
+            raise SolverServerError(f'the ARC-Solver server exited, see {self.log_filepath} for its output')
+        return json.loads(line)
+
+    def is_running(self):
+        """ Whether the server process is still alive
+
+            Returns:
+                bool: True if the server can accept jobs
+        """
+        return self.process is not None and self.process.poll() is None
+
+    def run(self, input_file, index):
+        """ Runs the ARC-Solver pipeline on a question set file with a particular index, restarting the server first
+            if it has died
+
+            Args:
+                input_file (str): the question set file, relative to the ARC-Solver project
+                index (str): the Elasticsearch index that has an article designed for the question set
+
+            Returns:
+                list: the lines printed by the scoring step of the ARC-Solver for the job
+        """
+        response = self.send_job({INPUT_FILE: input_file, INDEX: index})
+        return response[OUTPUT].split('\n')
+
+    def run_batch(self, input_file, indices):
+        """ Runs the ARC-Solver pipeline once on a question set file for several indices
+
+            Args:
+                input_file (str): the question set file, relative to the ARC-Solver project
+                indices (list): the Elasticsearch indices to answer the question set with
+
+            Returns:
+                dict: the lines printed by the scoring step by index, indices that failed are left out
+        """
+        response = self.send_job({INPUT_FILE: input_file, INDICES: list(indices)})
+        return {index: output.split('\n') for index, output in response[OUTPUTS].items()}
+
+    def send_job(self, job):
+        """ Sends a job to the server, restarting the server first if it has died, and waits for its response. A job
+            that runs longer than the job timeout kills the server, which is restarted for the next job
+
+            Args:
+                job (dict): the job to send
+
+            Returns:
+                dict: the response of the server
+
+            Raises:
+                JobTimeoutError: if the server did not answer within the job timeout
+        """
+        if not self.is_running():
+            self.close()
+            self.start()
+        self.process.stdin.write(json.dumps(job) + '\n')
+        self.process.stdin.flush()
+        timeout = get_job_timeout(self.config)
+        if timeout is None:
+            response = self.read_message()
+        else:
+            timeout *= len(job.get(INDICES, [job.get(INDEX)]))
+            self.timed_out = False
+            timer = threading.Timer(timeout, self.stop_job, [self.process])
+            timer.start()
+            try:
+                response = self.read_message()
+            except SolverServerError:
+                if self.timed_out:
+                    raise JobTimeoutError(f'the ARC-Solver server did not answer within {timeout} seconds')
+                raise
+            finally:
+                timer.cancel()
+        if ERROR in response:
+            raise SolverServerError(response[ERROR])
+        return response
+
+    def stop_job(self, process):
+        """ Kills the server in the middle of a job that ran past the job timeout
+
+            Args:
+                process (subprocess.Popen): the server process running the job
+        """
+        self.timed_out = True
+        kill_process_group(process)
+
+    def close(self):
+        """ Shuts the server down by closing its stdin and waits for it to exit """
+        if self.process is not None:
+            if self.process.stdin:
+                try:
+                    self.process.stdin.close()
+                except OSError:
+                    pass
+            try:
+                self.process.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process = None
+        if self.log_file is not None:
+            self.log_file.close()
+            self.log_file = None
+
+
+def start_solver_clients(arc_solver_directory, data_subdirectories, log_filepath, config):
+    """ Starts one solver server per data subdirectory when the solver server is enabled
+
+        Args:
+            arc_solver_directory (str): the directory to the ARC-Solver project
+            data_subdirectories (list): the data subdirectories that will each be served by their own server
+            log_filepath (str): the file the servers' own output is appended to
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            dict: the solver clients by data subdirectory, empty if the solver server is disabled
+    """
+    solver_clients = {}
+    if not use_solver_server(config):
+        return solver_clients
+    try:
+        for data_subdirectory in data_subdirectories:
+            solver_clients[data_subdirectory] = SolverClient(arc_solver_directory, log_filepath, config)
+    except BaseException:
+        # the servers started before the one that failed are not known to the caller yet, so stop them here
+        stop_solver_clients(solver_clients)
+        raise
+    return solver_clients
+
+
+def stop_solver_clients(solver_clients):
+    """ Shuts down every solver server that was started
+
+        Args:
+            solver_clients (dict): the solver clients by data subdirectory
+    """
+    for solver_client in solver_clients.values():
+        solver_client.close()
@@ -0,0 +1,83 @@
+import os
+from arc_benchmark.constants import GLOBAL_ID, JSON_EXTENSION
+from arc_benchmark.file_utils import add_question_counts, digest_questions, make_tqa_article
+from arc_benchmark.question_index import compact_lesson, load_lessons
+
+
+def get_question_filenames(filepath):
+    """ Lists the JSON question files at a filepath, the same way read_json_questions does
+
+        Args:
+            filepath (str): a path to a singular, or directory of, JSON question files
+
+        Returns:
+            list: the question files, in the order they are read
+    """
+    if os.path.isdir(filepath):
+        return [f'{filepath}/{filename}' for filename in sorted(os.listdir(filepath)) if JSON_EXTENSION in filename]
+    return [filepath if JSON_EXTENSION in filepath else f'{filepath}{JSON_EXTENSION}']
+
+
+class TqaDataset:
+    """ The selected lessons of one or more TQA question files, parsed once and shared by the extraction of the
+        question sets and the extraction of the TQA reference articles
+    """
+    def __init__(self, filepath, question_set_ids, index_directory=None):
+        """ Sets up the dataset, the question files are only read the first time a lesson is needed
+
+            Args:
+                filepath (str): a path to a singular, or directory of, JSON question files
+                question_set_ids (keysview): the ids of the lessons that will be used in the benchmark
+                index_directory (str): optional, the directory to keep an index of each question file in
+        """
+        self.filepath = filepath
+        self.question_set_ids = list(dict.fromkeys(question_set_ids))
+        self.index_directory = index_directory
+        self.lessons = None
+
+    def get_lessons(self):
+        """ Parses every question file once, keeping only the selected lessons and only the parts of them the
+            benchmark reads, so the full file contents can be freed right away
+
+            Returns:
+                dict: the selected lessons by the question file they were loaded from
+        """
+        if self.lessons is None:
+            selected_ids = set(self.question_set_ids)
+            self.lessons = {
+                filename: [
+                    compact_lesson(lesson)
+                    for lesson in load_lessons(filename, self.question_set_ids, self.index_directory)
+                    if lesson[GLOBAL_ID] in selected_ids
+                ]
+                for filename in get_question_filenames(self.filepath)
+            }
+        return self.lessons
+
+    def get_questions(self):
+        """ Extracts the questions of the selected lessons, see read_json_questions
+
+            Returns:
+                dict: all sets of grouped questions
+                dict: the total number of questions by the number of possible answers
+        """
+        all_questions = {}
+        total_question_answer_counts = {}
+        for lessons in self.get_lessons().values():
+            new_questions, new_question_answer_counts = digest_questions(lessons, self.question_set_ids)
+            all_questions = {
+                **all_questions,
+                **new_questions
+            }
+            total_question_answer_counts = add_question_counts(total_question_answer_counts, new_question_answer_counts)
+        return all_questions, total_question_answer_counts
+
+    def iterate_articles(self):
+        """ Builds the TQA reference article of each selected lesson as it is needed, see load_tqa_articles
+
+            Returns:
+                generator: the TQA articles to be stored into Elasticsearch
+        """
+        for filename, lessons in self.get_lessons().items():
+            for lesson in lessons:
+                yield make_tqa_article(lesson, os.path.basename(filename))
@@ -0,0 +1,162 @@
+import os
+import shutil
+import threading
+from collections import deque
+from queue import Queue
+from arc_benchmark.constants import ARC_DATA_FULL_WIPE_KEEP_FILES, ARC_DATA_SUBDIRECTORY, WORKER_COUNT, \
+    WORKER_DIRECTORY_SUFFIX
+
+
+def get_worker_count(config):
+    """ Returns the number of ARC-Solver workers that should run concurrently, defaulting to a single worker
+
+        Args:
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            int: the number of concurrent ARC-Solver workers
+    """
+    if WORKER_COUNT not in config or not config[WORKER_COUNT]:
+        return 1
+    return max(1, int(config[WORKER_COUNT]))
+
+
+def get_worker_subdirectory(worker_number, config):
+    """ Builds the private data subdirectory a worker uses in place of the shared ARC data subdirectory
+
+        Args:
+            worker_number (int): the number of the worker the subdirectory belongs to
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            str: the data subdirectory, relative to the ARC-Solver project, owned by the worker
+    """
+    return f'{config[ARC_DATA_SUBDIRECTORY].rstrip("/")}{WORKER_DIRECTORY_SUFFIX}{worker_number}'
+
+
+def create_worker_directories(arc_solver_directory, worker_count, config):
+    """ Creates a private copy of the ARC data subdirectory for each worker so concurrent ARC-Solver runs never share
+        a test set or intermediate files
+
+        Args:
+            arc_solver_directory (str): the directory to the ARC-Solver project
+            worker_count (int): the number of worker directories to create
+            config (dict): config file specified properties to use in running the benchmark
+
+        Returns:
+            list: the data subdirectories, relative to the ARC-Solver project, one per worker
+    """
+    worker_subdirectories = []
+    for worker_number in range(worker_count):
+        worker_subdirectory = get_worker_subdirectory(worker_number, config)
+        worker_directory = f'{arc_solver_directory}/{worker_subdirectory}'
+        if os.path.isdir(worker_directory):
+            shutil.rmtree(worker_directory)
+        os.mkdir(worker_directory)
+        for filename in ARC_DATA_FULL_WIPE_KEEP_FILES:
+            source_file = f'{arc_solver_directory}/{config[ARC_DATA_SUBDIRECTORY]}/{filename}'
+            if os.path.isfile(source_file):
+                shutil.copyfile(source_file, f'{worker_directory}/{filename}')
+        worker_subdirectories.append(worker_subdirectory)
+    return worker_subdirectories
+
+
+def remove_worker_directories(arc_solver_directory, worker_subdirectories):
+    """ Deletes the private worker copies of the ARC data subdirectory once a run is finished
+
+        Args:
+            arc_solver_directory (str): the directory to the ARC-Solver project
+            worker_subdirectories (list): the data subdirectories created for the workers
+    """
+    for worker_subdirectory in worker_subdirectories:
+        if os.path.isdir(f'{arc_solver_directory}/{worker_subdirectory}'):
+            shutil.rmtree(f'{arc_solver_directory}/{worker_subdirectory}')
+
+
+def schedule_jobs(jobs, job_costs, worker_count):
+    """ Deals jobs out to the workers longest first, each job going to the worker with the least work queued so far,
+        so the largest jobs start right away and the smallest are left to fill in the end of the run
+
+        Args:
+            jobs (list): the jobs to run
+            job_costs (list): the estimated cost of each job, such as the number of questions it answers
+            worker_count (int): the number of workers
+
+        Returns:
+            list: a deque of (job, cost) tuples per worker, largest first
+            list: the total cost queued for each worker
+    """
+    worker_queues = [deque() for _ in range(worker_count)]
+    queued_costs = [0] * worker_count
+    for job_number in sorted(range(len(jobs)), key=lambda job_number: -job_costs[job_number]):
+        worker_number = min(range(worker_count), key=lambda worker_number: queued_costs[worker_number])
+        worker_queues[worker_number].append((jobs[job_number], job_costs[job_number]))
+        queued_costs[worker_number] += job_costs[job_number]
+    return worker_queues, queued_costs
+
+
+def run_in_worker_pool(jobs, run_job, worker_subdirectories, job_costs=None):
+    """ Runs jobs concurrently, each worker owning one worker subdirectory so no two running jobs ever share one.
+        Jobs are dealt out longest first by schedule_jobs, and a worker that runs out of jobs steals the next job of
+        the worker with the most work still queued, so the end of a run is not spent waiting on a single backlog
+
+        Args:
+            jobs (list): the jobs to run, passed through untouched to run_job
+            run_job (function): called as run_job(job, worker_subdirectory) and returns the result of the job
+            worker_subdirectories (list): the data subdirectories available to the workers
+            job_costs (list): optional, the estimated cost of each job, every job costs the same by default
+
+        Returns:
+            generator: (job, result) tuples in the order the jobs complete
+    """
+    job_costs = job_costs if job_costs is not None else [1] * len(jobs)
+    worker_queues, queued_costs = schedule_jobs(jobs, job_costs, len(worker_subdirectories))
+    lock = threading.Lock()
+    stopped = threading.Event()
+    completed = Queue()
+
+    def take_job(worker_number):
+        with lock:
+            if stopped.is_set():
+                return None
+            queue_number = worker_number
+            if not worker_queues[queue_number]:
+                queue_number = max(
+                    range(len(worker_queues)),
+                    key=lambda number: (queued_costs[number], len(worker_queues[number]))
+                )
+                if not worker_queues[queue_number]:
+                    return None
+            job, cost = worker_queues[queue_number].popleft()
+            queued_costs[queue_number] -= cost
+            return job
+
+    def work(worker_number):
+        try:
+            job = take_job(worker_number)
+            while job is not None:
+                completed.put((True, job, run_job(job, worker_subdirectories[worker_number])))
+                job = take_job(worker_number)
+        except Exception as error:
+            stopped.set()
+            completed.put((False, error, None))
+        finally:
+            completed.put(None)
+
+    workers = [threading.Thread(target=work, args=(worker_number,)) for worker_number in range(len(worker_queues))]
+    for worker in workers:
+        worker.start()
+    try:
+        running_workers = len(workers)
+        while running_workers:
+            message = completed.get()
+            if message is None:
+                running_workers -= 1
+            elif not message[0]:
+                raise message[1]
+            else:
+                yield message[1], message[2]
+    finally:
+        stopped.set()
+        for worker in workers:
+            worker.join()
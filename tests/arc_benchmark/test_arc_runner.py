@@ -1,17 +1,20 @@
 import json
 import os
 import shutil
-import subprocess
+import tempfile
 from unittest import TestCase
 from unittest.mock import Mock, patch, call
 from arc_benchmark.constants import ARC_DATA_SMALL_WIPE_KEEP_FILES, ARC_DATA_FULL_WIPE_KEEP_FILES
 from arc_benchmark.arc_runner import clean_checkpoints, copy_test_set, run_arc_on_index, evaluate_articles, \
-    evaluate_arc_index
+    evaluate_arc_index, get_job_costs, get_question_set_jobs, group_jobs, run_arc_batch, run_arc_on_indices, \
+    run_arc_with_retries, split_batch_output
+from arc_benchmark.solver_client import JobTimeoutError, SolverRunError, SolverServerError
 
 fake_directory = 'fake_directory_dont_use'
 fake_response = 'unused text\n more unused text\n Metrics\n\n\n\nCorrect:1\nIncorrect:2\nUnanswered:3\n' \
-                'Addendum Results:\n{"0": "correct", "1": "incorrect", "2": "incorrect", "3": "unanswered", ' \
-                '"4": "unanswered", "5": "unanswered"}'
+                'EXAM Result: {"correct": 1, "incorrect": 2, "unanswered": 3, "individual_results": {"0": "correct", ' \
+                '"1": "incorrect", "2": "incorrect", "3": "unanswered", "4": "unanswered", "5": "unanswered"}}'
+fake_batch_response = 'EXAM Index: index1\n' + fake_response + '\nEXAM Index: index2\nnothing useful\n'
 test_set_filename = 'fake-test-set.jsonl'
 
 
@@ -68,7 +71,7 @@ class TestArcRunner(TestCase):
 
             shutil.rmtree(f'{os.getcwd()}/{fake_directory}')
 
-    @patch('subprocess.run')
+    @patch('arc_benchmark.arc_runner.run_solver_command')
     def test_run_arc_on_index_success(self, mock_run):
         mock_run.return_value = Mock(stdout=fake_response)
         config = {
@@ -103,26 +106,21 @@ class TestArcRunner(TestCase):
                 'fake_directory',
                 'fake_index'
             ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True
+            config
         )
 
-    @patch('subprocess.run')
+    @patch('arc_benchmark.arc_runner.run_solver_command')
     def test_run_arc_on_index_failure(self, mock_run):
-        mock_run.return_value = Mock(stdout='bongo', stderr='cat')
+        mock_run.return_value = Mock(stdout='bongo', stderr='cat', returncode=1)
         config = {
             'conda_environment_name': 'fake_environment',
             'arc_data_subdirectory': 'fake_subdirectory',
             'arc_model_subdirectory': 'fake_directory'
         }
-        with patch('sys.stdout') as mock_print:
-            results, individual_results = run_arc_on_index('fake_index', config)
-            self.assertEqual(
-                {},
-                results,
-                'if results cannot be extracted, it will return a blank results and print relevant output from the run'
-            )
+        with patch('sys.stdout'):
+            with self.assertRaises(SolverRunError, msg='if results cannot be extracted, it should raise') as context:
+                run_arc_on_index('fake_index', config)
+            self.assertEqual((1, 'cat'), (context.exception.returncode, context.exception.stderr))
             mock_run.assert_called_once_with(
                 [
                     'conda',
@@ -135,12 +133,243 @@ class TestArcRunner(TestCase):
                     'fake_directory',
                     'fake_index'
                 ],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True
+                config
+            )
+
+    @patch('arc_benchmark.arc_runner.run_solver_command')
+    def test_run_arc_on_index_solver_client(self, mock_run):
+        solver_client = Mock()
+        solver_client.run.return_value = fake_response.split('\n')
+        config = {
+            'conda_environment_name': 'fake_environment',
+            'arc_data_subdirectory': 'fake_subdirectory',
+            'arc_model_subdirectory': 'fake_directory'
+        }
+        results, individual_results = run_arc_on_index('fake_index', config, solver_client=solver_client)
+        self.assertEqual(
+            {'correct': 1, 'incorrect': 2, 'unanswered': 3},
+            results,
+            'it should parse the output the solver server returns'
+        )
+        self.assertEqual(6, len(individual_results))
+        solver_client.run.assert_called_once_with('fake_subdirectory/ARC-Challenge-Test.jsonl', 'fake_index')
+        mock_run.assert_not_called()
+
+    @patch('arc_benchmark.arc_runner.run_solver_command')
+    def test_run_arc_on_index_retrieval_cache(self, mock_run):
+        mock_run.return_value = Mock(stdout=fake_response)
+        config = {
+            'conda_environment_name': 'fake_environment',
+            'arc_data_subdirectory': 'fake_subdirectory',
+            'arc_model_subdirectory': 'fake_directory',
+            'retrieval_cache_file': 'data/retrieval-cache.sqlite'
+        }
+        run_arc_on_index('fake_index', config)
+        self.assertEqual(
+            ['fake_index', 'data/retrieval-cache.sqlite', 'none'],
+            mock_run.call_args[0][0][-3:],
+            'it should pass the retrieval cache file to the ARC-Solver after the index'
+        )
+        run_arc_on_indices(['index1', 'index2'], config)
+        self.assertEqual(
+            ['--hit-cache', 'data/retrieval-cache.sqlite'],
+            mock_run.call_args[0][0][-2:],
+            'it should pass the retrieval cache file to batched runs as an option'
+        )
+
+    @patch('arc_benchmark.arc_runner.run_solver_command')
+    def test_run_arc_on_index_entailment_cache(self, mock_run):
+        mock_run.return_value = Mock(stdout=fake_response)
+        config = {
+            'conda_environment_name': 'fake_environment',
+            'arc_data_subdirectory': 'fake_subdirectory',
+            'arc_model_subdirectory': 'fake_directory',
+            'entailment_cache_file': 'data/entailment-cache.sqlite'
+        }
+        run_arc_on_index('fake_index', config)
+        self.assertEqual(
+            ['fake_index', 'none', 'data/entailment-cache.sqlite'],
+            mock_run.call_args[0][0][-3:],
+            'it should disable the retrieval cache and pass the entailment cache file'
+        )
+        run_arc_on_indices(['index1', 'index2'], config)
+        self.assertEqual(
+            ['--entailment-cache', 'data/entailment-cache.sqlite'],
+            mock_run.call_args[0][0][-2:],
+            'it should pass the entailment cache file to batched runs as an option'
+        )
+
+    @patch('arc_benchmark.arc_runner.run_solver_command')
+    def test_run_arc_on_index_retrieval_options(self, mock_run):
+        mock_run.return_value = Mock(stdout=fake_response)
+        config = {
+            'conda_environment_name': 'fake_environment',
+            'arc_data_subdirectory': 'fake_subdirectory',
+            'arc_model_subdirectory': 'fake_directory',
+            'retrieval_batch_size': 16,
+            'retrieval_concurrency': 2
+        }
+        run_arc_on_index('fake_index', config)
+        self.assertEqual(
+            ['fake_index', 'none', 'none', '16', '2'],
+            mock_run.call_args[0][0][-5:],
+            'it should pass the retrieval batch size and concurrency after disabled caches'
+        )
+        run_arc_on_indices(['index1', 'index2'], config)
+        self.assertEqual(
+            ['--retrieval-batch-size', '16', '--retrieval-concurrency', '2'],
+            mock_run.call_args[0][0][-4:],
+            'it should pass the retrieval batch size and concurrency to batched runs as options'
+        )
+
+    def test_split_batch_output(self):
+        self.assertEqual(
+            {'index1': ['Metrics', 'Correct:1'], 'index2': ['', 'Correct:2']},
+            split_batch_output(['ignored', 'EXAM Index: index1', 'Metrics', 'Correct:1', 'EXAM Index: index2', '',
+                                'Correct:2']),
+            'it should split the output of a batched run by index, dropping anything before the first index'
+        )
+
+    @patch('arc_benchmark.arc_runner.run_solver_command')
+    def test_run_arc_on_indices(self, mock_run):
+        mock_run.return_value = Mock(stdout=fake_batch_response)
+        config = {
+            'conda_environment_name': 'fake_environment',
+            'arc_data_subdirectory': 'fake_subdirectory',
+            'arc_model_subdirectory': 'fake_directory'
+        }
+        index_results = run_arc_on_indices(['index1', 'index2'], config)
+        self.assertEqual({'correct': 1, 'incorrect': 2, 'unanswered': 3}, index_results['index1'][0])
+        self.assertEqual(
+            ({}, {}),
+            index_results['index2'],
+            'indices the batch printed no results for should have empty results'
+        )
+        mock_run.assert_called_once_with(
+            [
+                'conda',
+                'run',
+                '-n',
+                'fake_environment',
+                'python3.6',
+                'arc_solvers/processing/exam_solver.py',
+                'fake_directory',
+                '--batch',
+                'fake_subdirectory/ARC-Challenge-Test.jsonl',
+                'index1',
+                'index2'
+            ],
+            config,
+            2
+        )
+
+    def test_group_jobs(self):
+        jobs = [('index1', '1', 'a'), ('index2', '2', 'b'), ('index3', '1', 'a')]
+        self.assertEqual([[job] for job in jobs], group_jobs(jobs, {}), 'it should not group jobs by default')
+        self.assertEqual(
+            [[('index1', '1', 'a'), ('index3', '1', 'a')], [('index2', '2', 'b')]],
+            group_jobs(jobs, {'batch_indices': True}),
+            'it should group jobs by question set when runs are batched'
+        )
+
+    def test_get_job_costs(self):
+        with tempfile.TemporaryDirectory() as question_set_directory:
+            small_set = f'{question_set_directory}/small.jsonl'
+            large_set = f'{question_set_directory}/large.jsonl'
+            with open(small_set, 'w') as question_set_file:
+                question_set_file.write('{"id": "0"}\n{"id": "1"}\n')
+            with open(large_set, 'w') as question_set_file:
+                question_set_file.write('{"id": "0"}\n{"id": "1"}\n{"id": "2"}\n\n')
+            self.assertEqual(
+                [2, 6],
+                get_job_costs([[('index1', '1', small_set)], [('index1', '2', large_set), ('index2', '2', large_set)]]),
+                'it should count the questions answered by every job'
+            )
+
+    def test_get_question_set_jobs(self):
+        checkpoint_store = {('index1', '1'): {'index': 'index1', 'question_set': '1'}}
+        with tempfile.TemporaryDirectory() as benchmark_dir:
+            open(f'{benchmark_dir}/set_1.jsonl', 'w').close()
+            benchmark_set_filepaths = {'1': '/set_1.jsonl', '3': '/missing.jsonl'}
+            self.assertEqual(
+                (
+                    [('index2', '1', f'{benchmark_dir}/set_1.jsonl')],
+                    {('index1', '1'): {'index': 'index1', 'question_set': '1'}}
+                ),
+                get_question_set_jobs('1', ['index1', 'index2'], benchmark_set_filepaths, benchmark_dir,
+                                      checkpoint_store),
+                'it should only make jobs for the indices without checkpoints'
             )
+            with patch('sys.stdout'):
+                for question_set_id in ['2', '3']:
+                    self.assertEqual(
+                        ([], {}),
+                        get_question_set_jobs(question_set_id, ['index1'], benchmark_set_filepaths, benchmark_dir,
+                                              checkpoint_store),
+                        'it should skip question sets without a file'
+                    )
 
-    @patch('subprocess.run')
+    @patch('arc_benchmark.arc_runner.run_arc_on_indices')
+    def test_run_arc_batch(self, mock_run_arc_on_indices):
+        for error in [SolverRunError(1, 'failed'), SolverServerError('exited'), JobTimeoutError('timed out'),
+                      OSError('no conda'), ValueError('bad output')]:
+            mock_run_arc_on_indices.side_effect = error
+            with patch('sys.stdout'):
+                self.assertEqual({}, run_arc_batch(['index1', 'index2'], {}), 'it should fall back to single runs')
+        for error in [KeyError('index1'), KeyboardInterrupt()]:
+            mock_run_arc_on_indices.side_effect = error
+            with self.assertRaises(type(error), msg='it should not hide interrupts or coding errors'):
+                run_arc_batch(['index1', 'index2'], {})
+
+    @patch('arc_benchmark.arc_runner.run_arc_on_index', side_effect=JobTimeoutError('timed out'))
+    def test_run_arc_with_retries_timeout(self, mock_run_arc_on_index):
+        with patch('time.sleep') as mock_sleep, patch('sys.stdout'):
+            self.assertEqual(({}, {}), run_arc_with_retries('index1', {}))
+        mock_run_arc_on_index.assert_called_once()
+        mock_sleep.assert_not_called()
+
+    @patch('arc_benchmark.arc_runner.run_solver_command')
+    def test_evaluate_articles_batched(self, mock_run):
+        fake_directory_2 = 'fake_directory_2'
+        if os.path.isdir(f'{os.getcwd()}/{fake_directory}') or os.path.isdir(f'{os.getcwd()}/{fake_directory_2}'):
+            self.assertTrue(
+                False,
+                f'directory of {fake_directory} and {fake_directory_2} is already in use, dont use it >:('
+            )
+        else:
+            mock_run.side_effect = [Mock(stdout=fake_batch_response), Mock(stdout=fake_response)]
+            os.mkdir(f'{os.getcwd()}/{fake_directory}')
+            os.mkdir(f'{os.getcwd()}/{fake_directory_2}')
+            os.mkdir(f'{os.getcwd()}/{fake_directory_2}/fake_subdirectory')
+            open(f'{os.getcwd()}/{fake_directory}/{test_set_filename}', 'a').close()
+            config = {
+                'conda_environment_name': 'fake_environment',
+                'arc_data_subdirectory': 'fake_subdirectory',
+                'arc_model_subdirectory': 'fake_directory',
+                'checkpoint_directory': fake_directory,
+                'arc_checkpoint_file': 'checkpoint_file.jsonl',
+                'batch_indices': True
+            }
+            with patch('sys.stdout'):
+                results = evaluate_articles(
+                    {'index1': 'index_file', 'index2': 'index_file'},
+                    {'1': ['index1', 'index2']},
+                    {'1': f'/{fake_directory}/{test_set_filename}'},
+                    f'{os.getcwd()}/{fake_directory_2}',
+                    config
+                )
+            self.assertEqual(
+                ['index1', 'index2'],
+                [entry['index'] for entry in results['index_file']],
+                'it should use the batched results and rerun indices the batch did not answer on their own'
+            )
+            self.assertEqual('--batch', mock_run.call_args_list[0][0][0][7])
+            self.assertEqual('index2', mock_run.call_args_list[1][0][0][8])
+            self.assertEqual(2, mock_run.call_count)
+            shutil.rmtree(f'{os.getcwd()}/{fake_directory}')
+            shutil.rmtree(f'{os.getcwd()}/{fake_directory_2}')
+
+    @patch('arc_benchmark.arc_runner.run_solver_command')
     def test_evaluate_article(self, mock_run):
         fake_directory_2 = 'fake_directory_2'
         if os.path.isdir(f'{os.getcwd()}/{fake_directory}') or os.path.isdir(f'{os.getcwd()}/{fake_directory_2}'):
@@ -259,7 +488,7 @@ class TestArcRunner(TestCase):
             shutil.rmtree(f'{os.getcwd()}/{fake_directory}')
             shutil.rmtree(f'{os.getcwd()}/{fake_directory_2}')
 
-    @patch('subprocess.run')
+    @patch('arc_benchmark.arc_runner.run_solver_command')
     def test_evaluate_articles_failure(self, mock_run):
         fake_directory_2 = 'fake_directory_2'
         if os.path.isdir(f'{os.getcwd()}/{fake_directory}') or os.path.isdir(f'{os.getcwd()}/{fake_directory_2}'):
@@ -280,12 +509,13 @@ class TestArcRunner(TestCase):
                 'arc_data_subdirectory': 'fake_subdirectory',
                 'arc_model_subdirectory': 'fake_directory',
                 'checkpoint_directory': fake_directory,
-                'arc_checkpoint_file': checkpoint_filename
+                'arc_checkpoint_file': checkpoint_filename,
+                'dead_letter_file': 'dead_letters.jsonl'
             }
             index_files = {'index1': 'index_file'}
             question_set_indices = {'1': ['index1']}
             benchmark_set_filepaths = {'1': f'/{fake_directory}/{test_set_filename}'}
-            with patch('time.sleep', return_value=None) as mock_sleep:
+            with patch('time.sleep', return_value=None) as mock_sleep, patch('sys.stdout'):
                 results = evaluate_articles(
                     index_files,
                     question_set_indices,
@@ -298,12 +528,25 @@ class TestArcRunner(TestCase):
                     results,
                     'it should fail to get any results when retry attempts fail'
                 )
-                self.assertEqual(10, mock_sleep.call_count)
-                self.assertEqual(11, mock_run.call_count)
+                self.assertEqual(5, mock_sleep.call_count)
+                self.assertEqual(6, mock_run.call_count)
+                for retry, sleep_call in enumerate(mock_sleep.call_args_list):
+                    self.assertTrue(
+                        2 ** retry <= sleep_call[0][0] <= 2 ** (retry + 1),
+                        'it should back off exponentially with jitter'
+                    )
+            with open(f'{os.getcwd()}/{fake_directory}/dead_letters.jsonl') as dead_letter_file:
+                dead_letter = json.loads(dead_letter_file.read())
+            self.assertEqual(('index1', '1', 'unknown', 6), (
+                dead_letter['index'],
+                dead_letter['question_set'],
+                dead_letter['failure'],
+                dead_letter['attempts']
+            ), 'it should record the failed run in the dead-letter file')
             shutil.rmtree(f'{os.getcwd()}/{fake_directory}')
             shutil.rmtree(f'{os.getcwd()}/{fake_directory_2}')
 
-    @patch('subprocess.run')
+    @patch('arc_benchmark.arc_runner.run_solver_command')
     def test_evaluate_arc_index(self, mock_run):
         fake_directory_2 = 'fake_directory_2'
         if os.path.isdir(f'{os.getcwd()}/{fake_directory}') or os.path.isdir(f'{os.getcwd()}/{fake_directory_2}'):
@@ -431,3 +674,102 @@ class TestArcRunner(TestCase):
                 ])
                 shutil.rmtree(f'{os.getcwd()}/{fake_directory}')
                 shutil.rmtree(f'{os.getcwd()}/{fake_directory_2}')
+
+    @patch('arc_benchmark.arc_runner.run_solver_command')
+    def test_evaluate_articles_parallel(self, mock_run):
+        fake_directory_2 = 'fake_directory_2'
+        if os.path.isdir(f'{os.getcwd()}/{fake_directory}') or os.path.isdir(f'{os.getcwd()}/{fake_directory_2}'):
+            self.assertTrue(
+                False,
+                f'directory of {fake_directory} and {fake_directory_2} is already in use, dont use it >:('
+            )
+        else:
+            mock_run.return_value = Mock(stdout=fake_response)
+            os.mkdir(f'{os.getcwd()}/{fake_directory}')
+            os.mkdir(f'{os.getcwd()}/{fake_directory_2}')
+            os.mkdir(f'{os.getcwd()}/{fake_directory_2}/fake_subdirectory')
+            open(f'{os.getcwd()}/{fake_directory}/{test_set_filename}', 'a').close()
+            checkpoint_filename = 'checkpoint_file.jsonl'
+            config = {
+                'conda_environment_name': 'fake_environment',
+                'arc_data_subdirectory': 'fake_subdirectory',
+                'arc_model_subdirectory': 'fake_directory',
+                'checkpoint_directory': fake_directory,
+                'arc_checkpoint_file': checkpoint_filename,
+                'worker_count': 2
+            }
+            index_files = {'index1': 'index_file', 'index2': 'index_file', 'index3': 'other_file'}
+            question_set_indices = {'1': ['index1', 'index2'], '2': ['index3'], '3': ['In 3D']}
+            benchmark_set_filepaths = {
+                '1': f'/{fake_directory}/{test_set_filename}',
+                '2': f'/{fake_directory}/{test_set_filename}'
+            }
+            with patch('sys.stdout'):
+                results = evaluate_articles(
+                    index_files,
+                    question_set_indices,
+                    benchmark_set_filepaths,
+                    f'{os.getcwd()}/{fake_directory_2}',
+                    config
+                )
+            self.assertEqual(
+                [('index1', '1'), ('index2', '1')],
+                [(entry['index'], entry['question_set']) for entry in results['index_file']],
+                'it should keep the results of each index in job order'
+            )
+            self.assertEqual([('index3', '2')], [(entry['index'], entry['question_set']) for entry in
+                                                 results['other_file']])
+            self.assertEqual(3, mock_run.call_count)
+            solver_test_sets = sorted(run_call[0][0][6] for run_call in mock_run.call_args_list)
+            self.assertTrue(
+                all('fake_subdirectory-worker-' in test_set for test_set in solver_test_sets),
+                'every run should use a private worker copy of the data subdirectory'
+            )
+            self.assertEqual(
+                ['fake_subdirectory'],
+                os.listdir(f'{os.getcwd()}/{fake_directory_2}'),
+                'it should remove the worker directories once the run is over'
+            )
+            with open(f'{os.getcwd()}/{fake_directory}/{checkpoint_filename}') as checkpoint_file:
+                self.assertEqual(3, len(checkpoint_file.readlines()), 'it should checkpoint every successful run')
+            shutil.rmtree(f'{os.getcwd()}/{fake_directory}')
+            shutil.rmtree(f'{os.getcwd()}/{fake_directory_2}')
+
+    @patch('arc_benchmark.arc_runner.clean_checkpoints')
+    @patch('arc_benchmark.arc_runner.stop_solver_clients')
+    @patch('arc_benchmark.arc_runner.start_solver_clients')
+    @patch('arc_benchmark.arc_runner.open_checkpoint_store')
+    @patch('arc_benchmark.arc_runner.run_arc_jobs', side_effect=RuntimeError('solver crashed'))
+    def test_evaluate_sequentially_teardown(self, mock_run_arc_jobs, mock_open_checkpoint_store,
+                                            mock_start_solver_clients, mock_stop_solver_clients, _):
+        benchmark_dir = os.getcwd()
+        arc_solver_directory = tempfile.mkdtemp()
+        question_set_file, question_set_filepath = tempfile.mkstemp(dir=benchmark_dir)
+        os.close(question_set_file)
+        checkpoint_store = mock_open_checkpoint_store.return_value
+        checkpoint_store.__contains__ = Mock(return_value=False)
+        solver_clients = {'fake_subdirectory': Mock()}
+        mock_start_solver_clients.return_value = solver_clients
+        config = {'arc_data_subdirectory': 'fake_subdirectory', 'checkpoint_directory': 'checkpoints'}
+        question_set_filepaths = {'1': question_set_filepath[len(benchmark_dir):]}
+        try:
+            with patch('sys.stdout'):
+                with self.assertRaises(RuntimeError):
+                    evaluate_articles({'index1': 'index_file'}, {'1': ['index1']}, question_set_filepaths,
+                                      arc_solver_directory, config)
+                self.assertEqual(benchmark_dir, os.getcwd(), 'it should return to the benchmark directory')
+                mock_stop_solver_clients.assert_called_once_with(solver_clients)
+                checkpoint_store.close.assert_called_once_with()
+
+                mock_stop_solver_clients.reset_mock()
+                checkpoint_store.close.reset_mock()
+                with self.assertRaises(RuntimeError):
+                    evaluate_arc_index({}, {'1': ['arc_corpus']}, question_set_filepaths, arc_solver_directory,
+                                       {**config, 'arc_corpus_index': 'arc_corpus'})
+                self.assertEqual(benchmark_dir, os.getcwd())
+                mock_stop_solver_clients.assert_called_once_with(solver_clients)
+                checkpoint_store.close.assert_called_once_with()
+        finally:
+            os.chdir(benchmark_dir)
+            os.remove(question_set_filepath)
+            shutil.rmtree(arc_solver_directory)
@@ -1,6 +1,6 @@
 import os
 from unittest import TestCase
-from unittest.mock import Mock, call
+from unittest.mock import Mock, call, patch
 from arc_benchmark import article_archiver
 
 
@@ -142,6 +142,233 @@ class TestArticleArchiver(TestCase):
         mock_bulk.assert_not_called()
         create_mock.assert_not_called()
 
+    @patch('arc_benchmark.article_archiver.parallel_bulk')
+    def test_store_articles_concurrently(self, mock_parallel_bulk):
+        stored_documents = []
+        mock_parallel_bulk.side_effect = lambda es, documents, **kwargs: stored_documents.extend(documents) or []
+        es_mock = Mock(indices=Mock(exists=Mock(side_effect=lambda index: index == 'fake-article-2')))
+        mock_bulk = Mock(return_value=True)
+        fake_articles = [
+            {'text': 'one fake article. It has two lines', 'title': 'fake_article_1', 'id': 'manta', 'file': 'alpha'},
+            {'text': 'an article that already exists', 'title': 'fake_article_2', 'id': 'ray', 'file': 'beta'},
+            {'text': 'a third fake article', 'title': 'fake_article_3', 'id': 'ray', 'file': 'beta'}
+        ]
+        fake_config = {
+            'mapping': '{"settings": {"index": {"number_of_shards": 1}}}',
+            'index_thread_count': 2,
+            'index_chunk_size': 1
+        }
+        question_set_indices, index_files = article_archiver.store_articles(
+            iter(fake_articles),
+            es_mock,
+            mock_bulk,
+            fake_config
+        )
+        self.assertEqual(
+            {'manta': ['fake-article-1'], 'ray': ['fake-article-2', 'fake-article-3']},
+            question_set_indices
+        )
+        self.assertEqual({'fake-article-1': 'alpha', 'fake-article-2': 'beta', 'fake-article-3': 'beta'}, index_files)
+        es_mock.indices.create.assert_has_calls([
+            call(index='fake-article-1', ignore=400,
+                 body={'settings': {'index': {'number_of_shards': 1, 'refresh_interval': '-1'}}}),
+            call(index='fake-article-3', ignore=400,
+                 body={'settings': {'index': {'number_of_shards': 1, 'refresh_interval': '-1'}}})
+        ])
+        self.assertEqual(2, es_mock.indices.create.call_count, 'it should not recreate an existing index')
+        self.assertEqual(
+            ['fake-article-1', 'fake-article-1', 'fake-article-3'],
+            [document['_index'] for document in stored_documents],
+            'it should only store the documents of the indices it created'
+        )
+        self.assertEqual({'thread_count': 2, 'chunk_size': 1}, mock_parallel_bulk.call_args[1])
+        es_mock.indices.put_settings.assert_called_once_with(
+            index='fake-article-1,fake-article-3',
+            body={'index': {'refresh_interval': None}}
+        )
+        es_mock.indices.refresh.assert_called_once_with(index='fake-article-1,fake-article-3')
+        mock_bulk.assert_not_called()
+
+    @patch('arc_benchmark.article_archiver.parallel_bulk')
+    def test_store_articles_concurrently_failure(self, mock_parallel_bulk):
+        mock_parallel_bulk.side_effect = RuntimeError('bulk failure')
+        es_mock = Mock(indices=Mock(exists=Mock(return_value=False)))
+        fake_articles = [
+            {'text': 'one fake article. It has two lines', 'title': 'fake_article_1', 'id': 'manta', 'file': 'alpha'},
+            {'text': 'a second fake article', 'title': 'fake_article_2', 'id': 'ray', 'file': 'beta'}
+        ]
+        fake_config = {'mapping': '{}', 'index_thread_count': 2, 'index_chunk_size': 1}
+        with self.assertRaises(RuntimeError):
+            article_archiver.store_articles(iter(fake_articles), es_mock, Mock(), fake_config)
+        es_mock.indices.put_settings.assert_called_once_with(
+            index='fake-article-1,fake-article-2',
+            body={'index': {'refresh_interval': None}}
+        )
+        es_mock.indices.refresh.assert_called_once_with(index='fake-article-1,fake-article-2')
+
+    def test_store_articles_in_shared_index(self):
+        stored_documents = []
+        mock_bulk = Mock(side_effect=lambda es, documents, **kwargs: stored_documents.extend(documents))
+        es_mock = Mock()
+        es_mock.search.side_effect = [
+            {'aggregations': {'docId': {'buckets': [{'key': {'docId': 'fake-article-2'}}], 'after_key': {}}}}
+        ]
+        fake_articles = [
+            {'text': 'one fake article. It has two lines', 'title': 'fake_article_1', 'id': 'manta', 'file': 'alpha'},
+            {'text': 'an article that is already stored', 'title': 'fake_article_2', 'id': 'ray', 'file': 'beta'}
+        ]
+        fake_config = {'mapping': {}, 'shared_index': 'exam-articles'}
+        question_set_indices, index_files = article_archiver.store_articles(
+            iter(fake_articles),
+            es_mock,
+            mock_bulk,
+            fake_config
+        )
+        self.assertEqual(
+            {'manta': ['exam-articles/fake-article-1'], 'ray': ['exam-articles/fake-article-2']},
+            question_set_indices,
+            'it should refer to each article by the shared index and its name'
+        )
+        self.assertEqual(
+            {'exam-articles/fake-article-1': 'alpha', 'exam-articles/fake-article-2': 'beta'},
+            index_files
+        )
+        es_mock.indices.create.assert_called_once_with(index='exam-articles', ignore=400, body={})
+        self.assertEqual(
+            [
+                {
+                    '_index': 'exam-articles',
+                    '_type': '_doc',
+                    '_op_type': 'index',
+                    '_id': 'fake-article-1-0',
+                    '_routing': 'fake-article-1',
+                    '_source': {'text': 'one fake article', 'docId': 'fake-article-1', 'tags': ['alpha']}
+                },
+                {
+                    '_index': 'exam-articles',
+                    '_type': '_doc',
+                    '_op_type': 'index',
+                    '_id': 'fake-article-1-1',
+                    '_routing': 'fake-article-1',
+                    '_source': {'text': 'It has two lines', 'docId': 'fake-article-1', 'tags': ['alpha']}
+                }
+            ],
+            stored_documents,
+            'it should only store the sentences of articles not already in the shared index'
+        )
+        es_mock.indices.refresh.assert_called_once_with(index='exam-articles')
+
+    def test_store_articles_in_shared_index_failure(self):
+        mock_bulk = Mock(side_effect=RuntimeError('bulk failure'))
+        es_mock = Mock()
+        es_mock.search.return_value = {'aggregations': {'docId': {'buckets': []}}}
+        fake_articles = [
+            {'text': 'one fake article. It has two lines', 'title': 'fake_article_1', 'id': 'manta', 'file': 'alpha'}
+        ]
+        fake_config = {'mapping': {}, 'shared_index': 'exam-articles'}
+        with self.assertRaises(RuntimeError):
+            article_archiver.store_articles(iter(fake_articles), es_mock, mock_bulk, fake_config)
+        es_mock.indices.put_settings.assert_called_with(
+            index='exam-articles',
+            body={'index': {'refresh_interval': None}}
+        )
+        es_mock.indices.refresh.assert_called_once_with(index='exam-articles')
+
+    def test_get_stored_article_names(self):
+        es_mock = Mock()
+        es_mock.search.side_effect = [
+            {'aggregations': {'docId': {'buckets': [{'key': {'docId': 'a'}}] * 10000, 'after_key': {'docId': 'a'}}}},
+            {'aggregations': {'docId': {'buckets': [{'key': {'docId': 'b'}}]}}}
+        ]
+        self.assertEqual(
+            {'a', 'b'},
+            article_archiver.get_stored_article_names(es_mock, {'shared_index': 'exam-articles'}),
+            'it should page through every stored article'
+        )
+        self.assertEqual({'docId': 'a'}, es_mock.search.call_args[1]['body']['aggs']['docId']['composite']['after'])
+
+    @patch('arc_benchmark.article_archiver.store_json')
+    @patch('arc_benchmark.article_archiver.load_json')
+    @patch('os.makedirs')
+    def test_store_articles_reindexes_changed_articles(self, mock_makedirs, mock_load_json, mock_store_json):
+        unchanged_article = {'text': 'an unchanged article', 'title': 'fake_article_1', 'id': 'manta', 'file': 'alpha'}
+        changed_article = {'text': 'a rewritten article', 'title': 'fake_article_2', 'id': 'ray', 'file': 'beta'}
+        mock_load_json.return_value = {
+            'fake-article-1': article_archiver.get_article_hash(unchanged_article),
+            'fake-article-2': article_archiver.get_article_hash({'text': 'the original article'})
+        }
+        es_mock = Mock(indices=Mock(exists=Mock(return_value=True)))
+        mock_bulk = Mock(return_value=True)
+        fake_config = {'mapping': {}, 'checkpoint_directory': 'checkpoints', 'index_manifest_file': 'manifest.json'}
+        article_archiver.store_articles([unchanged_article, changed_article], es_mock, mock_bulk, fake_config)
+        es_mock.indices.delete.assert_called_once_with(index='fake-article-2', ignore=404)
+        es_mock.indices.create.assert_called_once_with(index='fake-article-2', ignore=400, body={})
+        self.assertEqual(1, mock_bulk.call_count, 'it should only re-index the article whose text changed')
+        mock_makedirs.assert_called_once_with('checkpoints', exist_ok=True)
+        mock_store_json.assert_called_once_with(
+            {
+                'fake-article-1': article_archiver.get_article_hash(unchanged_article),
+                'fake-article-2': article_archiver.get_article_hash(changed_article)
+            },
+            'manifest.json',
+            fake_config
+        )
+
+    def test_store_articles_in_shared_index_replaces_changed_articles(self):
+        es_mock = Mock()
+        es_mock.search.side_effect = [
+            {'aggregations': {'docId': {'buckets': [{'key': {'docId': 'fake-article-1'}}], 'after_key': {}}}}
+        ]
+        mock_bulk = Mock(side_effect=lambda es, documents, **kwargs: list(documents))
+        fake_article = {'text': 'a rewritten article', 'title': 'fake_article_1', 'id': 'manta', 'file': 'alpha'}
+        manifest = {'exam-articles/fake-article-1': 'an outdated hash'}
+        article_archiver.store_articles_in_shared_index(
+            [fake_article],
+            es_mock,
+            mock_bulk,
+            manifest,
+            {'mapping': {}, 'shared_index': 'exam-articles', 'index_manifest_file': 'manifest.json'}
+        )
+        es_mock.delete_by_query.assert_called_once_with(
+            index='exam-articles',
+            body={'query': {'term': {'docId': 'fake-article-1'}}},
+            routing='fake-article-1',
+            conflicts='proceed'
+        )
+        self.assertEqual(
+            {'exam-articles/fake-article-1': article_archiver.get_article_hash(fake_article)},
+            manifest,
+            'it should record the hash of the re-indexed article'
+        )
+
+    def test_is_article_changed(self):
+        article = {'text': 'a fake article'}
+        manifest = {'fake-article': article_archiver.get_article_hash(article)}
+        config = {'checkpoint_directory': 'checkpoints', 'index_manifest_file': 'manifest.json'}
+        self.assertFalse(article_archiver.is_article_changed('fake-article', article, manifest, config))
+        self.assertTrue(article_archiver.is_article_changed('fake-article', {'text': 'new text'}, manifest, config))
+        with patch('os.path.isfile', return_value=False) as mock_isfile:
+            self.assertFalse(
+                article_archiver.is_article_changed('other-article', article, manifest, config),
+                'it should seed the hash of articles stored before the manifest file was first written'
+            )
+        mock_isfile.assert_called_once_with('checkpoints/manifest.json')
+        with patch('os.path.isfile', return_value=True):
+            self.assertTrue(
+                article_archiver.is_article_changed('other-article', article, manifest, config),
+                'it should treat articles missing from an existing manifest as changed'
+            )
+        self.assertFalse(
+            article_archiver.is_article_changed('fake-article', {'text': 'new text'}, manifest, {}),
+            'it should never re-index without a manifest'
+        )
+
+    def test_get_index_thread_count_and_chunk_size(self):
+        self.assertEqual(1, article_archiver.get_index_thread_count({}), 'it should default to serial indexing')
+        self.assertEqual(4, article_archiver.get_index_thread_count({'index_thread_count': 4}))
+        self.assertEqual(500, article_archiver.get_index_chunk_size({}))
+        self.assertEqual(1000, article_archiver.get_index_chunk_size({'index_chunk_size': 1000}))
+
     def test_load_and_store_articles_success(self):
         create_mock = Mock(return_value=True)
         es_mock = Mock(indices=Mock(create=create_mock, exists=Mock(return_value=False)))
@@ -169,6 +396,23 @@ class TestArticleArchiver(TestCase):
         ])
         mock_bulk.assert_called()
 
+    def test_load_and_store_articles_in_shard(self):
+        es_mock = Mock(indices=Mock(create=Mock(return_value=True), exists=Mock(return_value=False)))
+        shards = [
+            article_archiver.load_and_store_articles(
+                'tests/data-files/articles/test_articles_1.jsonl',
+                es_mock,
+                Mock(return_value=True),
+                {'mapping': {}, 'shard': f'{shard}/2'}
+            )[0]
+            for shard in range(2)
+        ]
+        self.assertEqual(
+            [{'mnop': ['test-articles-1-full-metal-coding']}, {'efgh': ['test-articles-1-test-title']}],
+            shards,
+            'it should only store the articles of the question sets in the shard'
+        )
+
     def test_combined_indices(self):
         input_question_set_indices = {
             '1': ['asdf'],
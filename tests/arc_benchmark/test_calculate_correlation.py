@@ -0,0 +1,87 @@
+import json
+import shutil
+import tempfile
+import numpy as np
+from unittest import TestCase
+from unittest.mock import patch
+from scipy.stats import kendalltau, spearmanr
+from arc_benchmark.calculate_correlation import aggregate_correlations, bootstrap_confidence_interval, \
+    calculate_correlation, correlate_rankings, generate_randomized_rankings
+
+rankings = {
+    'first': {'ranking': [1, 2, 3, 4, 5, 6]},
+    'second': {'ranking': [2, 'tie', 5, 'tie'], 'ties': [[1, 3], [4, 6]]},
+    'third': {'ranking': ['tie', 6, 4], 'ties': [[5, 3, 2, 1]]}
+}
+
+
+class TestCalculateCorrelation(TestCase):
+    def test_generate_randomized_rankings(self):
+        rng = np.random.default_rng(0)
+        self.assertEqual([[1, 2, 3, 4, 5, 6]] * 3, generate_randomized_rankings(rankings['first'], 3, rng).tolist())
+
+        randomized_rankings = generate_randomized_rankings(rankings['second'], 200, rng)
+        self.assertEqual((200, 6), randomized_rankings.shape)
+        self.assertTrue((randomized_rankings[:, 0] == 2).all())
+        self.assertTrue((randomized_rankings[:, 3] == 5).all())
+        self.assertEqual({(1, 3), (3, 1)}, {tuple(row) for row in randomized_rankings[:, 1:3].tolist()})
+        self.assertEqual({(4, 6), (6, 4)}, {tuple(row) for row in randomized_rankings[:, 4:6].tolist()})
+
+    def test_correlate_rankings(self):
+        rng = np.random.default_rng(1)
+        randomized_rankings = {
+            name: generate_randomized_rankings(ranking, 20, rng) for name, ranking in rankings.items()
+        }
+        correlations = correlate_rankings(randomized_rankings)
+        self.assertEqual(6, len(correlations), 'it should correlate every pair of metrics with both statistics')
+        for (first_metric, second_metric, statistic), values in correlations.items():
+            correlate = kendalltau if statistic == 'kendall' else spearmanr
+            for run_index in range(20):
+                expected_correlation, _ = correlate(
+                    randomized_rankings[first_metric][run_index],
+                    randomized_rankings[second_metric][run_index]
+                )
+                self.assertAlmostEqual(expected_correlation, values[run_index], 10, 'it should match scipy')
+
+        with self.assertRaises(ValueError):
+            correlate_rankings({'first': np.zeros((2, 6)), 'second': np.zeros((2, 5))})
+
+    def test_bootstrap_confidence_interval(self):
+        rng = np.random.default_rng(2)
+        correlations = rng.normal(0.5, 0.1, 5000)
+        lower_bound, upper_bound = bootstrap_confidence_interval(correlations, rng)
+        self.assertLess(lower_bound, np.mean(correlations))
+        self.assertGreater(upper_bound, np.mean(correlations))
+        self.assertLess(upper_bound - lower_bound, 0.01, 'it should be about 4 standard errors wide')
+        lower_bound, upper_bound = bootstrap_confidence_interval(np.full(10, 0.3), rng, 10)
+        self.assertAlmostEqual(0.3, lower_bound, msg='it should not widen correlations that never change')
+        self.assertAlmostEqual(0.3, upper_bound)
+
+    def test_aggregate_correlations(self):
+        aggregated_correlations = aggregate_correlations({
+            ('first', 'second', 'kendall'): np.array([0.5, 0.7]),
+            ('first', 'second', 'spear'): np.array([0.6, 0.6])
+        }, np.random.default_rng(3))
+        self.assertEqual(["('first', 'second')"], list(aggregated_correlations.keys()))
+        correlation = aggregated_correlations["('first', 'second')"]
+        self.assertEqual(0.6, correlation['average_kendall'])
+        self.assertEqual(0.1, correlation['kendall_std_dev'])
+        self.assertTrue(0.5 <= correlation['kendall_ci_low'] <= correlation['kendall_ci_high'] <= 0.7)
+        self.assertEqual(0.6, correlation['spear_ci_low'])
+        self.assertEqual(0.6, correlation['spear_ci_high'])
+
+    def test_calculate_correlation(self):
+        results_directory = tempfile.mkdtemp()
+        try:
+            with patch('arc_benchmark.calculate_correlation.RESULTS_FILE', f'{results_directory}/results.json'):
+                aggregated_correlations = calculate_correlation(rankings, 100, seed=4)
+                self.assertEqual(aggregated_correlations, calculate_correlation(rankings, 100, seed=4),
+                                 'it should reproduce the results with the same seed')
+            with open(f'{results_directory}/results.json') as results_file:
+                self.assertEqual(aggregated_correlations, json.load(results_file))
+            self.assertEqual(
+                ["('first', 'second')", "('first', 'third')", "('second', 'third')"],
+                list(aggregated_correlations.keys())
+            )
+        finally:
+            shutil.rmtree(results_directory)
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import Counter
+from unittest import TestCase
+from unittest.mock import Mock, patch
+from arc_benchmark.calculate_rouge import RougeText, TokenCache, calculate_rouge, calculate_rouge_metrics, \
+    check_nltk_resources, get_algorithm_rouge_score, get_longest_common_subsequence, get_ngram_overlap, \
+    get_rouge_worker_count, get_token_cache_filepath, initialize_rouge_worker, score_algorithm_in_worker, \
+    score_algorithms_in_parallel, tokenize_reference_chapters
+
+
+def fake_clean_and_split(text, lemmatize):
+    return [lemmatize(word) for word in text.replace(',', '').split() if word not in ['the', 'a']]
+
+
+fake_lemmatizer = Mock()
+fake_lemmatizer.lemmatize.side_effect = lambda word: word.rstrip('s')
+
+
+def longest_common_subsequence(first, second):
+    previous_row = [0] * (len(second) + 1)
+    for first_token in first:
+        row = [0]
+        for position, second_token in enumerate(second):
+            if first_token == second_token:
+                row.append(previous_row[position] + 1)
+            else:
+                row.append(max(previous_row[position + 1], row[position]))
+        previous_row = row
+    return previous_row[-1]
+
+
+@patch('arc_benchmark.calculate_rouge.get_lemmatizer', Mock(return_value=fake_lemmatizer))
+@patch('arc_benchmark.calculate_rouge.clean_and_split', fake_clean_and_split)
+class TestCalculateRouge(TestCase):
+    def setUp(self):
+        self.checkpoint_directory = tempfile.mkdtemp()
+        self.config = {
+            'checkpoint_directory': self.checkpoint_directory,
+            'rouge_results_file': 'rouge_results.json',
+            'rouge_token_cache_file': 'rouge_token_cache.json',
+            'rouge_worker_count': 1
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.checkpoint_directory)
+
+    @patch('arc_benchmark.calculate_rouge.nltk.data.find')
+    def test_check_nltk_resources(self, mock_find):
+        check_nltk_resources()
+        mock_find.side_effect = [None, None, LookupError]
+        with self.assertRaisesRegex(LookupError, 'python -m nltk.downloader punkt$'):
+            check_nltk_resources()
+        mock_find.side_effect = LookupError
+        with self.assertRaisesRegex(LookupError, 'python -m nltk.downloader stopwords wordnet punkt'):
+            check_nltk_resources()
+
+    def test_get_rouge_worker_count(self):
+        self.assertEqual(os.cpu_count() or 1, get_rouge_worker_count({}), 'it should default to one per core')
+        self.assertEqual(os.cpu_count() or 1, get_rouge_worker_count({'rouge_worker_count': 0}))
+        self.assertEqual(3, get_rouge_worker_count({'rouge_worker_count': 3}))
+
+    def test_get_token_cache_filepath(self):
+        self.assertIsNone(get_token_cache_filepath({'checkpoint_directory': 'checkpoints'}))
+        self.assertEqual(
+            f'{self.checkpoint_directory}/rouge_token_cache.json',
+            get_token_cache_filepath(self.config)
+        )
+
+    def test_get_ngram_overlap(self):
+        self.assertEqual(2, get_ngram_overlap(Counter('aab'), Counter('abb')), 'it should clip repeated ngrams')
+        self.assertEqual(0, get_ngram_overlap(Counter('ab'), Counter('cd')))
+        self.assertEqual(3, get_ngram_overlap(Counter('abcc'), Counter('bccd')))
+
+    def test_get_longest_common_subsequence(self):
+        token_cache = TokenCache()
+        texts = ['cat dog bird cat fish', 'dog cat fish bird', 'tree', '', 'cat cat dog dog bird bird cat']
+        for first in texts:
+            for second in texts:
+                first_text, second_text = RougeText(first, token_cache), RougeText(second, token_cache)
+                self.assertEqual(
+                    longest_common_subsequence(first_text.token_ids, second_text.token_ids),
+                    get_longest_common_subsequence(first_text, second_text),
+                    f'it should match the dynamic programming result for "{first}" and "{second}"'
+                )
+
+    def test_calculate_rouge_metrics(self):
+        token_cache = TokenCache()
+        reference_text = RougeText('the cats eat fish, dogs eat cats', token_cache)
+        scores = calculate_rouge_metrics(RougeText('the cats eat fish, dogs eat cats', token_cache), reference_text)
+        for variant in ['rouge_1', 'rouge_2', 'rouge_l']:
+            self.assertEqual({'precision': 1.0, 'recall': 1.0, 'f1': 1.0}, scores[variant])
+
+        scores = calculate_rouge_metrics(RougeText('dogs eat fish', token_cache), reference_text)
+        self.assertEqual({'precision': 1.0, 'recall': 0.5, 'f1': 2 / 3}, scores['rouge_1'])
+        self.assertEqual(0.4, scores['rouge_2']['recall'], '"dog eat" and "eat fish" are 2 of the 5 bigrams')
+        self.assertEqual(2 / 3, scores['rouge_l']['precision'])
+
+        scores = calculate_rouge_metrics(RougeText('', token_cache), reference_text)
+        self.assertEqual({'precision': 0.0, 'recall': 0.0, 'f1': 0.0}, scores['rouge_1'], 'it should not divide by 0')
+
+    def test_token_cache(self):
+        lemmatizer = Mock()
+        lemmatizer.lemmatize.side_effect = lambda word: word.rstrip('s')
+        token_cache = TokenCache(max_lemmas=2)
+        with patch('arc_benchmark.calculate_rouge.get_lemmatizer', return_value=lemmatizer):
+            self.assertEqual('cat', token_cache.lemmatize('cats'))
+            self.assertEqual('cat', token_cache.lemmatize('cats'))
+            self.assertEqual(1, lemmatizer.lemmatize.call_count, 'it should lemmatize each word once')
+            token_cache.lemmatize('dogs')
+            token_cache.lemmatize('birds')
+            self.assertEqual(['dogs', 'birds'], list(token_cache.lemmas.keys()), 'it should drop the oldest lemma')
+
+            self.assertEqual([0, 1, 0], token_cache.get_token_ids('cats dogs cats'))
+            self.assertEqual([1, 2], token_cache.get_token_ids('dogs fish'))
+
+        snapshot_filepath = f'{self.checkpoint_directory}/rouge_token_cache.json'
+        token_cache.save(snapshot_filepath)
+        loaded_token_cache = TokenCache()
+        loaded_token_cache.load(snapshot_filepath)
+        self.assertEqual(token_cache.lemmas, loaded_token_cache.lemmas)
+        self.assertEqual(token_cache.documents, loaded_token_cache.documents)
+        with patch('arc_benchmark.calculate_rouge.clean_and_split') as mock_clean_and_split:
+            loaded_token_cache.clean_and_split('cats dogs cats')
+            mock_clean_and_split.assert_not_called()
+        self.assertFalse(os.path.isfile(f'{snapshot_filepath}.tmp'))
+
+        loaded_token_cache.load(f'{self.checkpoint_directory}/missing.json')
+        loaded_token_cache.save(None)
+
+        bounded_token_cache = TokenCache(max_documents=2)
+        bounded_token_cache.clean_and_split('cats')
+        bounded_token_cache.clean_and_split('dogs')
+        bounded_token_cache.clean_and_split('cats')
+        bounded_token_cache.clean_and_split('birds')
+        self.assertEqual(
+            [hashlib.sha1(text.encode('utf-8')).hexdigest() for text in ['cats', 'birds']],
+            list(bounded_token_cache.documents.keys()),
+            'it should drop the least recently used document'
+        )
+        bounded_token_cache.update({'lemmas': {}, 'documents': token_cache.documents})
+        self.assertEqual(2, len(bounded_token_cache.documents), 'it should bound the documents of a snapshot')
+
+    def test_get_algorithm_rouge_score(self):
+        token_cache = TokenCache()
+        reference_texts = tokenize_reference_chapters([
+            {'id': 'L_0001', 'text': 'cats eat fish'},
+            {'id': 'L_0002', 'text': 'dogs chase cats'}
+        ], token_cache)
+        self.assertEqual(['L_0001', 'L_0002'], list(reference_texts.keys()))
+        algorithm_results = get_algorithm_rouge_score([
+            {'id': 'L_0001', 'text': 'cats eat fish'},
+            {'id': 'L_0002', 'text': 'dogs chase birds'}
+        ], reference_texts, token_cache)
+        self.assertEqual(0.8333, algorithm_results['average_f1'])
+        self.assertEqual(0.1667, algorithm_results['f1_std_dev'])
+        self.assertEqual(0.75, algorithm_results['rouge_2_average_recall'])
+        self.assertEqual(0.8333, algorithm_results['rouge_l_average_precision'])
+
+    def test_score_algorithm_in_worker(self):
+        token_cache = TokenCache()
+        reference_texts = tokenize_reference_chapters([{'id': 'L_0001', 'text': 'cats eat fish'}], token_cache)
+        initialize_rouge_worker(reference_texts, token_cache)
+        algorithm_results, new_tokens = score_algorithm_in_worker('algorithm_1.jsonl', [
+            {'id': 'L_0001', 'text': 'cats eat fish'},
+            {'id': 'L_0001', 'text': 'dogs eat fish'}
+        ])
+        self.assertEqual('algorithm_1.jsonl', algorithm_results['file'])
+        self.assertEqual(['dogs'], list(new_tokens['lemmas'].keys()), 'it should only return lemmas it added')
+        self.assertEqual([['dog', 'eat', 'fish']], list(new_tokens['documents'].values()))
+
+    def test_score_algorithms_in_parallel(self):
+        algorithm_articles = {
+            'algorithm_1.jsonl': [
+                {'id': 'L_0001', 'text': 'cats eat fish'},
+                {'id': 'L_0002', 'text': 'dogs chase birds'}
+            ],
+            'algorithm_2.jsonl': [
+                {'id': 'L_0001', 'text': 'dogs eat fish'},
+                {'id': 'L_0002', 'text': 'dogs chase cats'}
+            ],
+            'algorithm_3.jsonl': [
+                {'id': 'L_0001', 'text': 'fish eat cats'},
+                {'id': 'L_0002', 'text': 'cats chase dogs'}
+            ]
+        }
+        token_cache = TokenCache()
+        reference_texts = tokenize_reference_chapters([
+            {'id': 'L_0001', 'text': 'cats eat fish'},
+            {'id': 'L_0002', 'text': 'dogs chase cats'}
+        ], token_cache)
+        # tokenize every article up front, so the scoring processes find them all in their copy of the token cache
+        # whichever way the platform starts processes
+        for articles in algorithm_articles.values():
+            for article in articles:
+                token_cache.clean_and_split(article['text'])
+
+        rouge_results = score_algorithms_in_parallel(algorithm_articles, reference_texts, token_cache, 2)
+        self.assertEqual(list(algorithm_articles.keys()), [results['file'] for results in rouge_results])
+        for results in rouge_results:
+            expected_results = get_algorithm_rouge_score(
+                algorithm_articles[results['file']],
+                reference_texts,
+                token_cache
+            )
+            expected_results['file'] = results['file']
+            self.assertEqual(expected_results, results, 'it should score like a single process')
+
+    @patch('arc_benchmark.calculate_rouge.check_nltk_resources')
+    @patch('arc_benchmark.calculate_rouge.load_tqa_articles')
+    @patch('arc_benchmark.calculate_rouge.read_jsonl_articles')
+    def test_calculate_rouge(self, mock_read_articles, mock_load_tqa_articles, mock_check_nltk_resources):
+        mock_read_articles.return_value = [
+            {'file': 'algorithm_1.jsonl', 'id': 'L_0001', 'text': 'cats eat fish'},
+            {'file': 'algorithm_1.jsonl', 'id': 'L_0002', 'text': 'dogs chase cats'},
+            {'file': 'algorithm_2.jsonl', 'id': 'L_0001', 'text': 'dogs eat fish'},
+            {'file': 'algorithm_2.jsonl', 'id': 'L_0002', 'text': 'dogs chase cats'}
+        ]
+        mock_load_tqa_articles.return_value = [
+            {'id': 'L_0001', 'text': 'cats eat fish'},
+            {'id': 'L_0002', 'text': 'dogs chase cats'}
+        ]
+
+        rouge_results = calculate_rouge('articles', 'tqa_v1_train.json', self.config)
+        mock_check_nltk_resources.assert_called_once_with()
+        self.assertEqual('tqa_v1_train.json', mock_load_tqa_articles.call_args[0][1]['question_directory'])
+        self.assertEqual(['algorithm_1.jsonl', 'algorithm_2.jsonl'], [results['file'] for results in rouge_results])
+        self.assertEqual(1.0, rouge_results[0]['average_f1'])
+        with open(f'{self.checkpoint_directory}/rouge_results.json') as results_file:
+            self.assertEqual(rouge_results, json.load(results_file))
+        with open(f'{self.checkpoint_directory}/rouge_token_cache.json') as token_cache_file:
+            self.assertEqual(3, len(json.load(token_cache_file)['documents']), 'it should keep each distinct text')
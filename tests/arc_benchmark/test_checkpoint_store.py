@@ -0,0 +1,80 @@
+import json
+import shutil
+import tempfile
+from unittest import TestCase
+from arc_benchmark.checkpoint_store import JsonlCheckpointStore, SqliteCheckpointStore, decode_individual_results, \
+    encode_individual_results, open_checkpoint_store, use_checkpoint_database
+
+results_entry = {
+    'index': 'fake-article',
+    'question_set': 'L_0001',
+    'results': {'correct': 1, 'incorrect': 1, 'unanswered': 1},
+    'individual_results': {'0': 'correct', '1': 'incorrect', '2': 'unanswered'}
+}
+
+
+class TestCheckpointStore(TestCase):
+    def setUp(self):
+        self.checkpoint_directory = tempfile.mkdtemp()
+        self.config = {
+            'checkpoint_directory': self.checkpoint_directory,
+            'arc_checkpoint_file': 'checkpoints.jsonl',
+            'checkpoint_database_file': 'checkpoints.sqlite'
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.checkpoint_directory)
+
+    def test_use_checkpoint_database(self):
+        self.assertFalse(use_checkpoint_database({}), 'it should default to the JSONL checkpoint file')
+        self.assertFalse(use_checkpoint_database({'checkpoint_database_file': ''}))
+        self.assertTrue(use_checkpoint_database(self.config))
+
+    def test_open_checkpoint_store(self):
+        checkpoint_store = open_checkpoint_store(self.config)
+        self.assertIsInstance(checkpoint_store, SqliteCheckpointStore)
+        checkpoint_store.close()
+        checkpoint_store = open_checkpoint_store({**self.config, 'checkpoint_database_file': None})
+        self.assertIsInstance(checkpoint_store, JsonlCheckpointStore)
+        checkpoint_store.close()
+
+    def test_encode_individual_results(self):
+        self.assertEqual((None, bytes([0, 1, 2])), encode_individual_results(results_entry['individual_results']))
+        self.assertEqual(
+            ('["3", "1"]', bytes([2, 0])),
+            encode_individual_results({'3': 'unanswered', '1': 'correct'}),
+            'it should keep question ids that are not numbered in order'
+        )
+        self.assertEqual((None, None), encode_individual_results({'0': 'skipped'}))
+        self.assertEqual(
+            {'3': 'unanswered', '1': 'correct'},
+            decode_individual_results('["3", "1"]', bytes([2, 0]))
+        )
+
+    def test_write_and_reopen(self):
+        checkpoint_store = SqliteCheckpointStore(self.config)
+        self.assertEqual(('delete',), checkpoint_store.connection.execute('PRAGMA journal_mode').fetchone(),
+                         'it should not use WAL, which needs shared memory between the processes using the database')
+        self.assertFalse(('fake-article', 'L_0001') in checkpoint_store)
+        checkpoint_store.write(results_entry)
+        checkpoint_store.write({**results_entry, 'index': 'other-article', 'individual_results': {'0': 'skipped'}})
+        checkpoint_store.close()
+
+        checkpoint_store = SqliteCheckpointStore(self.config)
+        self.assertTrue(('fake-article', 'L_0001') in checkpoint_store, 'it should keep runs across restarts')
+        self.assertEqual(results_entry, checkpoint_store[('fake-article', 'L_0001')])
+        self.assertEqual({'0': 'skipped'}, checkpoint_store[('other-article', 'L_0001')]['individual_results'])
+        with self.assertRaises(KeyError):
+            checkpoint_store[('missing', 'L_0001')]
+        checkpoint_store.close()
+
+    def test_imports_jsonl_checkpoints(self):
+        with open(f'{self.checkpoint_directory}/checkpoints.jsonl', 'w') as checkpoint_file:
+            checkpoint_file.write(json.dumps(results_entry) + '\n')
+        checkpoint_store = SqliteCheckpointStore(self.config)
+        self.assertEqual(
+            results_entry,
+            checkpoint_store[('fake-article', 'L_0001')],
+            'it should import the runs of an existing JSONL checkpoint file'
+        )
+        checkpoint_store.close()
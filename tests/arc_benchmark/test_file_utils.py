@@ -1,13 +1,27 @@
 import json
 import os
+import multiprocessing
 import shutil
+import tempfile
+import types
 from unittest import TestCase
 from arc_benchmark.file_utils import process_article_line, process_article, read_jsonl_articles, retrieve_questions, \
-    read_json_questions, create_or_load_arc_checkpoint, load_json, store_json
+    read_json_questions, create_or_load_arc_checkpoint, load_json, store_json, iterate_jsonl_articles, \
+    get_parse_worker_count, append_checkpoint_line
 
 fake_directory = '/fake_directory_dont_use'
 
 
+def append_checkpoint_lines(config, process_number):
+    checkpoint_file, _ = create_or_load_arc_checkpoint(config)
+    for line_number in range(50):
+        append_checkpoint_line(
+            checkpoint_file,
+            json.dumps({'index': f'{process_number}-{line_number}', 'question_set': '1', 'padding': 'x' * 5000})
+        )
+    checkpoint_file.close()
+
+
 class TestLoadFiles(TestCase):
     def test_process_article_line(self):
         test_line = '{"squid": "lol:asdf", "title": "boop", "paragraphs": [{"para_body": [{"text": "fake"},' \
@@ -97,6 +111,32 @@ class TestLoadFiles(TestCase):
             'It should load in a directory of files given a directory filepath'
         )
 
+    def test_iterate_jsonl_articles(self):
+        articles = iterate_jsonl_articles('tests/data-files/articles')
+        self.assertIsInstance(articles, types.GeneratorType, 'It should stream the articles rather than list them')
+        self.assertEqual(
+            'test_articles_1-test-title',
+            next(articles)['title'],
+            'It should yield the first article of the first file before reading the rest'
+        )
+        self.assertEqual(
+            read_jsonl_articles('tests/data-files/articles')[1:],
+            list(articles),
+            'It should yield the same articles, in the same order, as reading them all at once'
+        )
+
+    def test_iterate_jsonl_articles_in_parallel(self):
+        self.assertEqual(
+            read_jsonl_articles('tests/data-files/articles'),
+            list(iterate_jsonl_articles('tests/data-files/articles', parse_worker_count=2)),
+            'It should parse the files in a process pool without changing the order of the articles'
+        )
+
+    def test_get_parse_worker_count(self):
+        self.assertEqual(1, get_parse_worker_count({}), 'It should default to parsing in the current process')
+        self.assertEqual(1, get_parse_worker_count({'parse_worker_count': None}))
+        self.assertEqual(4, get_parse_worker_count({'parse_worker_count': 4}))
+
     def test_retrieve_questions(self):
         expected_questions = {
             'abcd': [
@@ -465,6 +505,36 @@ class TestLoadFiles(TestCase):
 
             shutil.rmtree(f'{os.getcwd()}/{fake_directory}')
 
+    def test_append_checkpoint_line_after_crash(self):
+        checkpoint_directory = tempfile.mkdtemp()
+        config = {'checkpoint_directory': checkpoint_directory, 'arc_checkpoint_file': 'checkpoints.jsonl'}
+        with open(f'{checkpoint_directory}/checkpoints.jsonl', 'w') as checkpoint_file:
+            checkpoint_file.write(json.dumps({'index': 'a', 'question_set': '1'}) + '\n{"index": "b", "quest')
+
+        checkpoint_file, completed_entries = create_or_load_arc_checkpoint(config)
+        self.assertEqual([('a', '1')], list(completed_entries.keys()), 'it should skip a line torn by a crash')
+        append_checkpoint_line(checkpoint_file, json.dumps({'index': 'c', 'question_set': '1'}))
+        checkpoint_file.close()
+
+        checkpoint_file, completed_entries = create_or_load_arc_checkpoint(config)
+        checkpoint_file.close()
+        self.assertEqual(
+            [('a', '1'), ('c', '1')],
+            list(completed_entries.keys()),
+            'it should not glue a new line onto a torn line'
+        )
+        shutil.rmtree(checkpoint_directory)
+
+    def test_append_checkpoint_line_from_several_processes(self):
+        checkpoint_directory = tempfile.mkdtemp()
+        config = {'checkpoint_directory': checkpoint_directory, 'arc_checkpoint_file': 'checkpoints.jsonl'}
+        with multiprocessing.Pool(4) as pool:
+            pool.starmap(append_checkpoint_lines, [(config, process_number) for process_number in range(4)])
+        checkpoint_file, completed_entries = create_or_load_arc_checkpoint(config)
+        checkpoint_file.close()
+        self.assertEqual(200, len(completed_entries), 'it should keep every line written by every process')
+        shutil.rmtree(checkpoint_directory)
+
     def test_load_json_no_results(self):
         if os.path.isdir(f'{os.getcwd()}{fake_directory}'):
             self.assertTrue(False, f'directory of {fake_directory} is already in use, dont use it >:(')
@@ -0,0 +1,67 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from arc_benchmark import question_index
+from arc_benchmark.file_utils import load_tqa_articles, read_json_questions
+
+
+class TestQuestionIndex(TestCase):
+    def setUp(self):
+        self.index_directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.index_directory)
+
+    def test_get_question_index_directory(self):
+        self.assertIsNone(question_index.get_question_index_directory({}), 'it should default to full parsing')
+        self.assertIsNone(question_index.get_question_index_directory({'question_index_directory': ''}))
+        self.assertEqual('index', question_index.get_question_index_directory({'question_index_directory': 'index'}))
+
+    def test_read_json_questions_through_index(self):
+        question_set_ids = ['abcd', 'efgh', 'ijkl', 'mnop']
+        self.assertEqual(
+            read_json_questions('tests/data-files/questions', question_set_ids),
+            read_json_questions('tests/data-files/questions', question_set_ids, self.index_directory),
+            'it should load the same questions through the index as from the full question files'
+        )
+        self.assertEqual(
+            ['test_questions_1.json.index.sqlite', 'test_questions_2.json.index.sqlite'],
+            sorted(os.listdir(self.index_directory))
+        )
+
+    def test_load_tqa_articles_through_index(self):
+        config = {'question_directory': 'tests/data-files/articles/test_tqa.json'}
+        self.assertEqual(
+            load_tqa_articles({'manta': []}, config),
+            load_tqa_articles({'manta': []}, {**config, 'question_index_directory': self.index_directory})
+        )
+
+    def test_load_indexed_lessons_rebuilds_stale_index(self):
+        filename = f'{self.index_directory}/questions.json'
+        lessons = [
+            {'globalID': 'a', 'lessonName': 'first', 'questions': {'nonDiagramQuestions': {}, 'diagramQuestions': {}}},
+            {'globalID': 'b', 'lessonName': 'second', 'questions': {'nonDiagramQuestions': {}}}
+        ]
+        with open(filename, 'w') as question_file:
+            json.dump(lessons, question_file)
+        self.assertEqual(
+            [{'globalID': 'b', 'lessonName': 'second', 'questions': {'nonDiagramQuestions': {}}}],
+            question_index.load_indexed_lessons(filename, ['b', 'missing'], self.index_directory),
+            'it should only load the selected lessons'
+        )
+        self.assertEqual(
+            [{'globalID': 'a', 'lessonName': 'first', 'questions': {'nonDiagramQuestions': {}}}],
+            question_index.load_indexed_lessons(filename, ['a'], self.index_directory),
+            'it should leave the diagram questions out of the index'
+        )
+
+        lessons[1]['lessonName'] = 'renamed'
+        with open(filename, 'w') as question_file:
+            json.dump(lessons, question_file)
+        self.assertEqual(
+            'renamed',
+            question_index.load_indexed_lessons(filename, ['b'], self.index_directory)[0]['lessonName'],
+            'it should rebuild the index when the question file changes'
+        )
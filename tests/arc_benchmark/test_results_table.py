@@ -0,0 +1,54 @@
+import numpy as np
+from unittest import TestCase
+from arc_benchmark.results_table import ResultsTable, sum_by_group
+
+
+class TestResultsTable(TestCase):
+    def test_sum_by_group(self):
+        codes = np.array([0, 1, 0])
+        self.assertEqual([4.0, 2.0], sum_by_group(codes, np.array([1, 2, 3]), 2).tolist())
+        self.assertEqual(
+            [[4.0, 40.0], [2.0, 20.0], [0.0, 0.0]],
+            sum_by_group(codes, np.array([[1, 10], [2, 20], [3, 30]]), 3).tolist(),
+            'it should sum each column by group'
+        )
+
+    def test_from_benchmark_results(self):
+        results_table = ResultsTable.from_benchmark_results({
+            'file1': [
+                {
+                    'question_set': 'b',
+                    'results': {'correct': 1, 'incorrect': 1, 'unanswered': 0},
+                    'individual_results': {'0': 'correct', '1': 'incorrect'}
+                },
+                {'question_set': 'a', 'results': {}, 'individual_results': {}}
+            ],
+            'file2': [
+                {
+                    'question_set': 'b',
+                    'results': {'correct': 0, 'incorrect': 1, 'unanswered': 1},
+                    'individual_results': {'0': 'unanswered', '1': 'incorrect'}
+                }
+            ]
+        })
+        self.assertEqual(['file1', 'file2'], results_table.file_labels)
+        self.assertEqual(['b', 'a'], results_table.question_set_labels, 'it should keep the order of the results')
+        self.assertEqual([0, 0, 1], results_table.file_codes.tolist())
+        self.assertEqual([0, 1, 0], results_table.question_set_codes.tolist())
+        self.assertEqual([[1, 1, 0], [0, 0, 0], [0, 1, 1]], results_table.outcome_counts.tolist())
+        self.assertEqual([True, False, True], results_table.answered.tolist(), 'it should mark runs without results')
+        self.assertEqual([('b', '0'), ('b', '1')], results_table.question_labels)
+        self.assertEqual(
+            [[1, 0, 1], [0, 2, 0]],
+            results_table.count_question_outcomes().tolist(),
+            'it should count the outcomes of each question across articles'
+        )
+
+    def test_from_question_set_results(self):
+        results_table = ResultsTable.from_question_set_results({
+            '1': [{'results': {'correct': 1, 'incorrect': 2, 'unanswered': 3}}],
+            '2': [{'results': {'correct': 2, 'incorrect': 3, 'unanswered': 4}}]
+        })
+        self.assertEqual(['1', '2'], results_table.question_set_labels)
+        self.assertEqual([0, 1], results_table.question_set_codes.tolist())
+        self.assertEqual((0, 3), results_table.count_question_outcomes().shape)
@@ -0,0 +1,102 @@
+import shutil
+import tempfile
+from unittest import TestCase
+from unittest.mock import Mock, patch
+from arc_benchmark.retry_policy import JobFailedError, classify_failure, get_backoff_delay, get_retry_count, \
+    is_transient, load_dead_letters, record_dead_letter, report_dead_letters, run_with_retries
+from arc_benchmark.solver_client import JobTimeoutError, SolverRunError
+
+
+class TestRetryPolicy(TestCase):
+    def setUp(self):
+        self.checkpoint_directory = tempfile.mkdtemp()
+        self.config = {'checkpoint_directory': self.checkpoint_directory, 'dead_letter_file': 'dead_letters.jsonl'}
+
+    def tearDown(self):
+        shutil.rmtree(self.checkpoint_directory)
+
+    def test_get_retry_count(self):
+        self.assertEqual(5, get_retry_count({}), 'it should default to 5 retries')
+        self.assertEqual(0, get_retry_count({'retry_count': 0}), 'it should allow turning retries off')
+
+    def test_get_backoff_delay(self):
+        config = {'retry_delay': 2, 'max_retry_delay': 10}
+        for retry, delay in enumerate([2, 4, 8, 10, 10]):
+            for _ in range(20):
+                self.assertTrue(
+                    delay / 2 <= get_backoff_delay(retry, config) <= delay,
+                    'it should double the delay up to the maximum, keeping at least half of it'
+                )
+
+    def test_classify_failure(self):
+        self.assertEqual('timeout', classify_failure(JobTimeoutError('too slow'))[0])
+        self.assertEqual('out_of_memory', classify_failure(SolverRunError(-9, ''))[0])
+        self.assertEqual('out_of_memory', classify_failure(SolverRunError(1, 'RuntimeError: CUDA out of memory'))[0])
+        self.assertEqual(
+            'elasticsearch_overload',
+            classify_failure(SolverRunError(1, 'TransportError(429, \'es_rejected_execution_exception\')'))[0]
+        )
+        self.assertEqual(
+            'bad_input',
+            classify_failure(SolverRunError(1, 'NotFoundError(404, \'index_not_found_exception\')'))[0]
+        )
+        self.assertEqual('bad_input', classify_failure(FileNotFoundError('ARC-Challenge-Test.jsonl'))[0])
+        self.assertEqual('unknown', classify_failure(Exception('failed to run pipeline'))[0])
+        self.assertEqual('x' * 2000, classify_failure(SolverRunError(1, 'y' + 'x' * 2000))[1],
+                         'it should only keep the end of the error output')
+
+    def test_is_transient(self):
+        self.assertTrue(is_transient('elasticsearch_overload'))
+        self.assertTrue(is_transient('unknown'))
+        self.assertFalse(is_transient('bad_input'))
+        self.assertFalse(is_transient('timeout'))
+
+    @patch('time.sleep')
+    def test_run_with_retries(self, mock_sleep):
+        run = Mock(side_effect=[SolverRunError(1, 'ConnectionTimeout'), SolverRunError(137, ''), 'results'])
+        with patch('sys.stdout'):
+            self.assertEqual('results', run_with_retries(run, {}), 'it should retry transient failures')
+        self.assertEqual(3, run.call_count)
+        self.assertEqual(2, mock_sleep.call_count)
+
+    @patch('time.sleep')
+    def test_run_with_retries_permanent_failure(self, mock_sleep):
+        run = Mock(side_effect=SolverRunError(1, 'index_not_found_exception'))
+        with self.assertRaises(JobFailedError) as context:
+            run_with_retries(run, {})
+        self.assertEqual(('bad_input', 1), (context.exception.failure, context.exception.attempts))
+        run.assert_called_once()
+        mock_sleep.assert_not_called()
+
+    @patch('time.sleep')
+    def test_run_with_retries_exhausted(self, mock_sleep):
+        run = Mock(side_effect=SolverRunError(1, 'es_rejected_execution_exception'))
+        with patch('sys.stdout'), self.assertRaises(JobFailedError) as context:
+            run_with_retries(run, {'retry_count': 2})
+        self.assertEqual(('elasticsearch_overload', 3), (context.exception.failure, context.exception.attempts))
+        self.assertEqual(2, mock_sleep.call_count)
+
+    def test_dead_letters(self):
+        self.assertEqual({}, load_dead_letters(self.config))
+        record_dead_letter('index1', 'L_0001', JobFailedError('unknown', 'first', 6), self.config)
+        record_dead_letter('index2', 'L_0001', JobFailedError('bad_input', 'missing', 1), self.config)
+        record_dead_letter('index1', 'L_0001', JobFailedError('timeout', 'second', 1), self.config)
+        dead_letters = load_dead_letters(self.config)
+        self.assertEqual(
+            [('index1', 'L_0001'), ('index2', 'L_0001')],
+            sorted(dead_letters.keys())
+        )
+        self.assertEqual(
+            {'index': 'index1', 'question_set': 'L_0001', 'failure': 'timeout', 'attempts': 1, 'message': 'second'},
+            dead_letters[('index1', 'L_0001')],
+            'it should keep the latest failure of a run'
+        )
+        with patch('builtins.print') as mock_print:
+            report_dead_letters({('index2', 'L_0001')}, self.config)
+        mock_print.assert_called_once_with('1 runs from the dead-letter file dead_letters.jsonl are queued again')
+
+    def test_dead_letters_disabled(self):
+        config = {'checkpoint_directory': self.checkpoint_directory}
+        record_dead_letter('index1', 'L_0001', JobFailedError('unknown', 'first', 6), config)
+        self.assertEqual({}, load_dead_letters(config))
+        self.assertEqual({}, load_dead_letters({**self.config, 'dead_letter_file': 'missing.jsonl'}))
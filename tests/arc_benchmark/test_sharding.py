@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from arc_benchmark.file_utils import store_json
+from arc_benchmark.sharding import find_shard_directories, get_shard, get_shard_directory, is_in_shard, \
+    merge_shard_results, parse_shard
+
+
+class TestSharding(TestCase):
+    def setUp(self):
+        self.checkpoint_directory = tempfile.mkdtemp()
+        self.config = {'checkpoint_directory': self.checkpoint_directory, 'arc_results_file': 'arc_results.json'}
+
+    def tearDown(self):
+        shutil.rmtree(self.checkpoint_directory)
+
+    def store_shard(self, shard, benchmark_results, question_answer_counts):
+        shard_directory = get_shard_directory(self.checkpoint_directory, shard)
+        os.makedirs(shard_directory)
+        shard_config = {**self.config, 'checkpoint_directory': shard_directory}
+        store_json(benchmark_results, 'arc_results.json', shard_config)
+        if question_answer_counts is not None:
+            store_json(question_answer_counts, 'question_answer_counts.json', shard_config)
+
+    def test_parse_shard(self):
+        self.assertEqual((0, 4), parse_shard('0/4'))
+        self.assertEqual((3, 4), parse_shard(' 3 / 4 '))
+        for shard in ['4/4', '1/0', '-1/4', '1', 'a/b', '']:
+            with self.assertRaises(ValueError, msg=f'it should reject {shard}'):
+                parse_shard(shard)
+
+    def test_get_shard(self):
+        self.assertIsNone(get_shard({}), 'it should default to running every question set')
+        self.assertIsNone(get_shard({'shard': ''}))
+        self.assertEqual((1, 2), get_shard({'shard': '1/2'}))
+
+    def test_is_in_shard(self):
+        question_set_ids = [f'L_{number:04}' for number in range(200)]
+        shard_count = 3
+        for question_set_id in question_set_ids:
+            self.assertEqual(
+                1,
+                sum(is_in_shard(question_set_id, (shard, shard_count)) for shard in range(shard_count)),
+                'every question set should belong to exactly one shard'
+            )
+        self.assertTrue(
+            all(
+                any(is_in_shard(question_set_id, (shard, shard_count)) for question_set_id in question_set_ids)
+                for shard in range(shard_count)
+            ),
+            'every shard should get question sets'
+        )
+
+    def test_find_shard_directories(self):
+        with self.assertRaises(ValueError, msg='it should fail without any shards'):
+            find_shard_directories(self.checkpoint_directory)
+        os.makedirs(get_shard_directory(self.checkpoint_directory, (1, 2)))
+        with self.assertRaises(ValueError, msg='it should fail on a missing shard'):
+            find_shard_directories(self.checkpoint_directory)
+        os.makedirs(get_shard_directory(self.checkpoint_directory, (0, 2)))
+        self.assertEqual(
+            [f'{self.checkpoint_directory}/shard-0-of-2', f'{self.checkpoint_directory}/shard-1-of-2'],
+            find_shard_directories(self.checkpoint_directory)
+        )
+        os.makedirs(get_shard_directory(self.checkpoint_directory, (0, 3)))
+        with self.assertRaises(ValueError, msg='it should fail on shards of different runs'):
+            find_shard_directories(self.checkpoint_directory)
+
+    def test_merge_shard_results(self):
+        first_entry = {'index': 'article-1', 'question_set': 'L_0001', 'results': {'correct': 1}}
+        second_entry = {'index': 'article-2', 'question_set': 'L_0002', 'results': {'incorrect': 1}}
+        third_entry = {'index': 'article-3', 'question_set': 'L_0003', 'results': {'unanswered': 1}}
+        self.store_shard((0, 2), {'articles.jsonl': [first_entry], 'tqa': [third_entry]}, {'4': 1})
+        self.store_shard((1, 2), {'articles.jsonl': [second_entry]}, {'4': 2, '3': 1})
+        self.assertEqual(
+            ({'articles.jsonl': [first_entry, second_entry], 'tqa': [third_entry]}, {'4': 3, '3': 1}),
+            merge_shard_results(self.config)
+        )
+
+    def test_merge_unfinished_shard(self):
+        self.store_shard((0, 2), {}, {})
+        self.store_shard((1, 2), {}, None)
+        with self.assertRaises(ValueError, msg='it should not merge a shard that has not finished'):
+            merge_shard_results(self.config)
@@ -0,0 +1,195 @@
+import io
+import json
+import subprocess
+import tempfile
+from unittest import TestCase
+from unittest.mock import Mock, patch
+from arc_benchmark.solver_client import JobTimeoutError, SolverClient, SolverServerError, get_cache_options, \
+    get_job_timeout, get_retrieval_options, run_solver_command, start_solver_clients, stop_solver_clients, \
+    use_entailment_cache, use_retrieval_cache, use_retrieval_options, use_solver_server
+
+config = {
+    'conda_environment_name': 'fake_environment',
+    'arc_model_subdirectory': 'fake_model_directory',
+    'use_solver_server': True
+}
+
+
+def fake_server(responses):
+    process = Mock(stdin=io.StringIO(), stdout=io.StringIO(''.join(f'{json.dumps(r)}\n' for r in responses)))
+    process.poll.return_value = None
+    return process
+
+
+class TestSolverClient(TestCase):
+    def test_use_solver_server(self):
+        self.assertFalse(use_solver_server({}), 'it should default to a subprocess per index')
+        self.assertFalse(use_solver_server({'use_solver_server': False}))
+        self.assertTrue(use_solver_server({'use_solver_server': True}))
+
+    def test_use_retrieval_cache(self):
+        self.assertFalse(use_retrieval_cache({}), 'it should default to not caching retrieved hits')
+        self.assertFalse(use_retrieval_cache({'retrieval_cache_file': None}))
+        self.assertTrue(use_retrieval_cache({'retrieval_cache_file': 'data/retrieval-cache.sqlite'}))
+
+    def test_use_entailment_cache(self):
+        self.assertFalse(use_entailment_cache({}), 'it should default to not caching entailment predictions')
+        self.assertFalse(use_entailment_cache({'entailment_cache_file': ''}))
+        self.assertTrue(use_entailment_cache({'entailment_cache_file': 'data/entailment-cache.sqlite'}))
+
+    def test_get_cache_options(self):
+        self.assertEqual([], get_cache_options({}))
+        self.assertEqual(
+            ['--hit-cache', 'data/retrieval-cache.sqlite', '--entailment-cache', 'data/entailment-cache.sqlite'],
+            get_cache_options({
+                'retrieval_cache_file': 'data/retrieval-cache.sqlite',
+                'entailment_cache_file': 'data/entailment-cache.sqlite'
+            })
+        )
+
+    def test_get_retrieval_options(self):
+        self.assertFalse(use_retrieval_options({}), 'it should default to searching every answer choice on its own')
+        self.assertEqual([], get_retrieval_options({'retrieval_batch_size': 0, 'retrieval_concurrency': None}))
+        self.assertEqual([], get_retrieval_options({'retrieval_concurrency': 8}), 'it should only batch with a size')
+        self.assertEqual(
+            ['--retrieval-batch-size', '32', '--retrieval-concurrency', '4'],
+            get_retrieval_options({'retrieval_batch_size': 32}),
+            'it should fill in the default concurrency when only the batch size is set'
+        )
+
+    def test_get_job_timeout(self):
+        self.assertIsNone(get_job_timeout({}), 'it should default to never stopping a run')
+        self.assertIsNone(get_job_timeout({'job_timeout': 0}))
+        self.assertEqual(600, get_job_timeout({'job_timeout': 600}))
+
+    def test_run_solver_command(self):
+        with tempfile.TemporaryDirectory() as checkpoint_directory:
+            run_results = run_solver_command(
+                ['sh', '-c', 'echo progress; echo "EXAM Result: {}"; echo warning >&2; exit 3'],
+                {'checkpoint_directory': checkpoint_directory}
+            )
+            self.assertEqual('EXAM Result: {}\n', run_results.stdout, 'it should only keep the result lines')
+            self.assertEqual('warning\n', run_results.stderr)
+            self.assertEqual(3, run_results.returncode)
+            with open(f'{checkpoint_directory}/arc_solver.log') as log_file:
+                self.assertEqual(
+                    ['progress\n', 'warning\n'],
+                    sorted(log_file.readlines()),
+                    'it should stream everything else to the solver log'
+                )
+        self.assertEqual('EXAM Result: {}\n', run_solver_command(['echo', 'EXAM Result: {}'], {}).stdout)
+        with self.assertRaises(JobTimeoutError, msg='it should stop a command that runs past the job timeout'):
+            run_solver_command(['sh', '-c', 'sleep 30'], {'job_timeout': 1})
+
+    @patch('builtins.open')
+    @patch('subprocess.Popen')
+    def test_start_with_retrieval_cache(self, mock_popen, mock_open):
+        mock_popen.return_value = fake_server([{'ready': True}])
+        SolverClient('arc_directory', 'solver.log', {**config, 'retrieval_cache_file': 'data/retrieval-cache.sqlite'})
+        self.assertEqual(
+            ['--hit-cache', 'data/retrieval-cache.sqlite'],
+            mock_popen.call_args[0][0][-2:],
+            'it should start the server with the retrieval cache file'
+        )
+
+    @patch('builtins.open')
+    @patch('subprocess.Popen')
+    def test_run(self, mock_popen, mock_open):
+        process = fake_server([{'ready': True}, {'index': 'fake_index', 'output': 'Metrics\nCorrect: 1'}])
+        mock_popen.return_value = process
+        solver_client = SolverClient('arc_directory', 'solver.log', config)
+        mock_popen.assert_called_once_with(
+            [
+                'conda',
+                'run',
+                '--no-capture-output',
+                '-n',
+                'fake_environment',
+                'python3.6',
+                'arc_solvers/processing/exam_solver.py',
+                'fake_model_directory'
+            ],
+            cwd='arc_directory',
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=mock_open.return_value,
+            universal_newlines=True,
+            bufsize=1,
+            start_new_session=True
+        )
+        self.assertEqual(
+            ['Metrics', 'Correct: 1'],
+            solver_client.run('data/ARC-Challenge-Test.jsonl', 'fake_index'),
+            'it should return the output of the scoring step split into lines'
+        )
+        self.assertEqual(
+            {'input_file': 'data/ARC-Challenge-Test.jsonl', 'index': 'fake_index'},
+            json.loads(process.stdin.getvalue()),
+            'it should send the job to the server as a single JSON line'
+        )
+
+    @patch('builtins.open')
+    @patch('subprocess.Popen')
+    def test_run_batch(self, mock_popen, mock_open):
+        process = fake_server([{'ready': True}, {'outputs': {'index1': 'a\nb'}, 'errors': {'index2': 'Traceback'}}])
+        mock_popen.return_value = process
+        solver_client = SolverClient('arc_directory', 'solver.log', config)
+        self.assertEqual(
+            {'index1': ['a', 'b']},
+            solver_client.run_batch('data/ARC-Challenge-Test.jsonl', ('index1', 'index2')),
+            'it should return the output of every index the server answered'
+        )
+        self.assertEqual(
+            {'input_file': 'data/ARC-Challenge-Test.jsonl', 'indices': ['index1', 'index2']},
+            json.loads(process.stdin.getvalue())
+        )
+
+    @patch('builtins.open')
+    @patch('subprocess.Popen')
+    def test_run_error(self, mock_popen, mock_open):
+        mock_popen.return_value = fake_server([{'ready': True}, {'index': 'fake_index', 'error': 'Traceback'}])
+        solver_client = SolverClient('arc_directory', 'solver.log', config)
+        with self.assertRaises(SolverServerError):
+            solver_client.run('data/ARC-Challenge-Test.jsonl', 'fake_index')
+
+    @patch('builtins.open')
+    @patch('subprocess.Popen')
+    def test_start_failure(self, mock_popen, mock_open):
+        mock_popen.return_value = fake_server([])
+        with patch('arc_benchmark.solver_client.kill_process_group') as mock_kill_process_group:
+            with self.assertRaises(SolverServerError, msg='it should fail if the server exits before it is ready'):
+                SolverClient('arc_directory', 'solver.log', config)
+            mock_kill_process_group.assert_called_once_with(mock_popen.return_value)
+            mock_open.return_value.close.assert_called_once_with()
+
+            mock_popen.return_value = fake_server([{'ready': False}])
+            with self.assertRaises(SolverServerError, msg='it should fail if the server does not report it is ready'):
+                SolverClient('arc_directory', 'solver.log', config)
+            self.assertEqual(2, mock_kill_process_group.call_count, 'it should not leave the server running')
+
+    @patch('builtins.open')
+    @patch('subprocess.Popen')
+    def test_run_restarts_dead_server(self, mock_popen, mock_open):
+        dead_process = fake_server([{'ready': True}])
+        dead_process.poll.return_value = 1
+        mock_popen.side_effect = [
+            dead_process,
+            fake_server([{'ready': True}, {'index': 'fake_index', 'output': 'done'}])
+        ]
+        solver_client = SolverClient('arc_directory', 'solver.log', config)
+        self.assertEqual(['done'], solver_client.run('data/ARC-Challenge-Test.jsonl', 'fake_index'))
+        self.assertEqual(2, mock_popen.call_count, 'it should restart the server when it has died')
+
+    @patch('arc_benchmark.solver_client.SolverClient')
+    def test_start_and_stop_solver_clients(self, mock_solver_client):
+        self.assertEqual({}, start_solver_clients('arc_directory', ['data'], 'solver.log', {}))
+        solver_clients = start_solver_clients('arc_directory', ['data-0', 'data-1'], 'solver.log', config)
+        self.assertEqual(['data-0', 'data-1'], list(solver_clients.keys()), 'it should start a server per directory')
+        stop_solver_clients(solver_clients)
+        self.assertEqual(2, mock_solver_client.return_value.close.call_count)
+
+        started_client = Mock()
+        mock_solver_client.side_effect = [started_client, SolverServerError('exited')]
+        with self.assertRaises(SolverServerError):
+            start_solver_clients('arc_directory', ['data-0', 'data-1'], 'solver.log', config)
+        started_client.close.assert_called_once_with()
@@ -0,0 +1,46 @@
+from unittest import TestCase
+from unittest.mock import patch
+from arc_benchmark import question_index
+from arc_benchmark.file_utils import load_tqa_articles, read_json_questions
+from arc_benchmark.tqa_dataset import TqaDataset, get_question_filenames
+
+
+class TestTqaDataset(TestCase):
+    def test_get_question_filenames(self):
+        self.assertEqual(
+            ['tests/data-files/questions/test_questions_1.json', 'tests/data-files/questions/test_questions_2.json'],
+            get_question_filenames('tests/data-files/questions')
+        )
+        self.assertEqual(
+            ['tests/data-files/questions/test_questions_1.json'],
+            get_question_filenames('tests/data-files/questions/test_questions_1')
+        )
+
+    def test_get_questions(self):
+        question_set_ids = ['abcd', 'efgh', 'ijkl', 'mnop']
+        self.assertEqual(
+            read_json_questions('tests/data-files/questions', question_set_ids),
+            TqaDataset('tests/data-files/questions', question_set_ids).get_questions(),
+            'it should extract the same questions as read_json_questions'
+        )
+
+    def test_iterate_articles(self):
+        filepath = 'tests/data-files/articles/test_tqa.json'
+        self.assertEqual(
+            load_tqa_articles({'manta': []}, {'question_directory': filepath}),
+            list(TqaDataset(filepath, ['manta']).iterate_articles()),
+            'it should build the same articles as load_tqa_articles'
+        )
+
+    @patch('arc_benchmark.tqa_dataset.load_lessons', side_effect=question_index.load_lessons)
+    def test_parses_question_files_once(self, mock_load_lessons):
+        tqa_dataset = TqaDataset('tests/data-files/questions', ['abcd', 'ijkl'])
+        mock_load_lessons.assert_not_called()
+        tqa_dataset.get_questions()
+        tqa_dataset.get_questions()
+        self.assertEqual(2, mock_load_lessons.call_count, 'it should only parse each question file once')
+        self.assertEqual(
+            ['abcd', 'ijkl'],
+            [lesson['globalID'] for lessons in tqa_dataset.get_lessons().values() for lesson in lessons],
+            'it should only keep the selected lessons'
+        )
@@ -0,0 +1,110 @@
+import os
+import shutil
+import threading
+import time
+from unittest import TestCase
+from arc_benchmark.worker_pool import create_worker_directories, get_worker_count, get_worker_subdirectory, \
+    remove_worker_directories, run_in_worker_pool, schedule_jobs
+
+fake_directory = 'fake_directory_dont_use'
+
+
+class TestWorkerPool(TestCase):
+    def test_get_worker_count(self):
+        self.assertEqual(1, get_worker_count({}), 'it should default to a single worker')
+        self.assertEqual(1, get_worker_count({'worker_count': None}))
+        self.assertEqual(1, get_worker_count({'worker_count': 0}))
+        self.assertEqual(4, get_worker_count({'worker_count': 4}), 'it should use the configured worker count')
+
+    def test_get_worker_subdirectory(self):
+        self.assertEqual(
+            'data/ARC-Challenge-worker-2',
+            get_worker_subdirectory(2, {'arc_data_subdirectory': 'data/ARC-Challenge/'}),
+            'it should place the worker directory beside the ARC data subdirectory'
+        )
+
+    def test_create_and_remove_worker_directories(self):
+        if os.path.isdir(f'{os.getcwd()}/{fake_directory}'):
+            self.assertTrue(False, f'directory of {fake_directory} is already in use, dont use it >:(')
+        else:
+            os.mkdir(f'{os.getcwd()}/{fake_directory}')
+            os.mkdir(f'{os.getcwd()}/{fake_directory}/data')
+            open(f'{os.getcwd()}/{fake_directory}/data/ARC-Challenge-Dev.jsonl', 'a').close()
+            open(f'{os.getcwd()}/{fake_directory}/data/ARC-Challenge-Test.jsonl', 'a').close()
+            config = {'arc_data_subdirectory': 'data'}
+            worker_subdirectories = create_worker_directories(f'{os.getcwd()}/{fake_directory}', 2, config)
+            self.assertEqual(['data-worker-0', 'data-worker-1'], worker_subdirectories)
+            for worker_subdirectory in worker_subdirectories:
+                self.assertEqual(
+                    ['ARC-Challenge-Dev.jsonl'],
+                    os.listdir(f'{os.getcwd()}/{fake_directory}/{worker_subdirectory}'),
+                    'it should copy the files the ARC-Solver needs but not the shared test set'
+                )
+
+            remove_worker_directories(f'{os.getcwd()}/{fake_directory}', worker_subdirectories)
+            self.assertEqual(
+                ['data'],
+                os.listdir(f'{os.getcwd()}/{fake_directory}'),
+                'it should remove every worker directory'
+            )
+            shutil.rmtree(f'{os.getcwd()}/{fake_directory}')
+
+    def test_run_in_worker_pool(self):
+        lock = threading.Lock()
+        subdirectories_in_use = set()
+        overlapping_runs = []
+
+        def fake_run_job(job, worker_subdirectory):
+            with lock:
+                if worker_subdirectory in subdirectories_in_use:
+                    overlapping_runs.append(job)
+                subdirectories_in_use.add(worker_subdirectory)
+            time.sleep(.001)
+            with lock:
+                subdirectories_in_use.remove(worker_subdirectory)
+            return job * 2
+
+        results = dict(run_in_worker_pool(list(range(20)), fake_run_job, ['worker-0', 'worker-1', 'worker-2']))
+        self.assertEqual({job: job * 2 for job in range(20)}, results, 'it should return the result of every job')
+        self.assertEqual([], overlapping_runs, 'it should never hand the same subdirectory to two running jobs')
+
+    def test_schedule_jobs(self):
+        worker_queues, queued_costs = schedule_jobs(['a', 'b', 'c', 'd', 'e'], [5, 60, 20, 30, 10], 2)
+        self.assertEqual(
+            [[('b', 60), ('a', 5)], [('d', 30), ('c', 20), ('e', 10)]],
+            [list(worker_queue) for worker_queue in worker_queues],
+            'it should deal the largest jobs out first, each to the worker with the least work queued'
+        )
+        self.assertEqual([65, 60], queued_costs)
+
+    def test_run_in_worker_pool_steals_jobs(self):
+        others_finished = threading.Event()
+        lock = threading.Lock()
+        job_subdirectories = {}
+
+        def fake_run_job(job, worker_subdirectory):
+            with lock:
+                job_subdirectories[job] = worker_subdirectory
+                if len(job_subdirectories) == 4 and job != 0:
+                    others_finished.set()
+            if job == 0:
+                others_finished.wait(5)
+            return job
+
+        results = dict(run_in_worker_pool([0, 1, 2, 3], fake_run_job, ['worker-0', 'worker-1'], [1, 1, 1, 1]))
+        self.assertEqual({0: 0, 1: 1, 2: 2, 3: 3}, results)
+        self.assertTrue(others_finished.is_set())
+        self.assertEqual(
+            {0: 'worker-0', 1: 'worker-1', 2: 'worker-1', 3: 'worker-1'},
+            job_subdirectories,
+            'the idle worker should steal the job queued behind the long running one'
+        )
+
+    def test_run_in_worker_pool_failure(self):
+        def fake_run_job(job, worker_subdirectory):
+            if job == 3:
+                raise ValueError('failed job')
+            return job
+
+        with self.assertRaises(ValueError, msg='it should raise the error of a failed job'):
+            list(run_in_worker_pool(list(range(10)), fake_run_job, ['worker-0', 'worker-1']))